@@ -21,14 +21,83 @@ class Config:
     MAX_TRANSACTIONS = 10000
     DEFAULT_PAGE_SIZE = 20
     
+    # Loading settings
+    # 未设置时沿用 MAX_TRANSACTIONS * 2；0表示分块读取整个文件
+    LOAD_MAX_ROWS = int(os.environ['LOAD_MAX_ROWS']) if os.environ.get('LOAD_MAX_ROWS') else None
+    LOAD_CHUNK_ROWS = int(os.environ.get('LOAD_CHUNK_ROWS', 200000))  # 分块读取和评分时每块的行数，决定加载过程的峰值内存
+    # 加载时建图和划分社区使用的最近交易数，未设置时沿用 MAX_TRANSACTIONS * 2
+    GRAPH_MAX_TRANSACTIONS = int(os.environ['GRAPH_MAX_TRANSACTIONS']) if os.environ.get('GRAPH_MAX_TRANSACTIONS') else None
+    
     # Risk thresholds
     HIGH_RISK_THRESHOLD = 0.7
     VERY_HIGH_RISK_THRESHOLD = 0.8
     SUSPICIOUS_THRESHOLD = 0.5
     
+    # Alert store settings
+    # 预警及其处理状态的SQLite文件，默认放在 API-cope/data 下
+    ALERT_DB_PATH = os.environ.get('ALERT_DB_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'alerts.db'))
+    
+    # Storage settings
+    # 交易存储后端：memory（进程内pandas）、sqlite 或 duckdb（未安装时退回sqlite）
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory')
+    TRANSACTION_DB_PATH = os.environ.get('TRANSACTION_DB_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'transactions.db'))
+    
+    # Multi-process settings
+    # 数据平面：local（单进程，默认）、publish（加载数据并发布到共享目录）、attach（工作进程只读挂载已发布的数据）
+    DATA_PLANE = os.environ.get('DATA_PLANE', 'local')
+    SHARED_DATA_DIR = os.environ.get('SHARED_DATA_DIR', '/dev/shm/api-cope' if os.path.isdir('/dev/shm') else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'shared'))
+    DATA_PLANE_INTERVAL = float(os.environ.get('DATA_PLANE_INTERVAL', 5.0))  # 秒，数据变化后重新发布的最小间隔，也是工作进程检查新数据的间隔
+    DATA_PLANE_WAIT = float(os.environ.get('DATA_PLANE_WAIT', 60.0))  # 秒，工作进程等待首次发布的最长时间
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 0))  # 路径分析进程池的工作进程数，0表示在请求线程中执行
+    ANALYSIS_QUEUE_LIMIT = int(os.environ.get('ANALYSIS_QUEUE_LIMIT', 4))  # 等待空闲工作进程的任务上限，超出时返回503
+    ANALYSIS_TIMEOUT = float(os.environ.get('ANALYSIS_TIMEOUT', 120.0))  # 秒，单个分析任务（含排队）的超时时间
+    ANALYSIS_JOB_CONCURRENCY = int(os.environ.get('ANALYSIS_JOB_CONCURRENCY', 2))  # 同时执行的异步分析任务数
+    ANALYSIS_JOB_LIMIT = int(os.environ.get('ANALYSIS_JOB_LIMIT', 16))  # 排队和执行中的异步任务上限，超出时返回503
+    ANALYSIS_JOB_CACHE_SIZE = int(os.environ.get('ANALYSIS_JOB_CACHE_SIZE', 32))  # 保留的异步任务（含结果）数量
+    
     # Graph settings
     MAX_EDGES = 3000
     NODE_AGGREGATION_THRESHOLD = 5
+    LOD_CHUNK_SIZE = int(os.environ.get('LOD_CHUNK_SIZE', 200))  # 分层流式返回时每个分块的节点数
+    LOD_CACHE_SIZE = int(os.environ.get('LOD_CACHE_SIZE', 8))  # 保留的分层视图数量，用于展开社区/聚合节点
+    PAGERANK_CACHE_SIZE = int(os.environ.get('PAGERANK_CACHE_SIZE', 8))  # 缓存的PageRank结果数量，时间不足时代替重新计算
+    DEADLINE_DBSCAN_SEEDS = int(os.environ.get('DEADLINE_DBSCAN_SEEDS', 500))  # 时间不足时参与DBSCAN聚类的高风险节点上限
+    RISK_SUBGRAPH_HOPS = int(os.environ.get('RISK_SUBGRAPH_HOPS', 2))  # 预先抽取的高风险账户子图跳数（1..N跳都抽取），也是下钻接口允许的最大跳数
+    RISK_SUBGRAPH_MAX_NODES = int(os.environ.get('RISK_SUBGRAPH_MAX_NODES', 200))  # 单个子图的节点上限，超出时每跳保留风险最高的邻居
+    RISK_SUBGRAPH_MAX_ACCOUNTS = int(os.environ.get('RISK_SUBGRAPH_MAX_ACCOUNTS', 2000))  # 预先抽取子图的高风险账户上限，按风险从高到低
+    
+    # Monitor settings
+    RECENT_TRANSACTIONS_SIZE = int(os.environ.get('RECENT_TRANSACTIONS_SIZE', 100))  # 最近交易环形缓冲区容量
+    RECENT_HIGH_RISK_SIZE = int(os.environ.get('RECENT_HIGH_RISK_SIZE', 100))  # 最近高风险交易环形缓冲区容量
+    MONITOR_FEED_TICK = float(os.environ.get('MONITOR_FEED_TICK', 1.0))  # 秒，增量推送的批处理间隔
+    MONITOR_FEED_MAX_PENDING = int(os.environ.get('MONITOR_FEED_MAX_PENDING', 10000))  # 待推送队列上限，超出时丢弃最旧的数据
+    MONITOR_FEED_MAX_BATCH = int(os.environ.get('MONITOR_FEED_MAX_BATCH', 500))  # 每次推送的最大条数
+    
+    # Model loading settings
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') == '1'  # 启动后在后台线程预加载模型
+    MODEL_WATCH_INTERVAL = int(os.environ.get('MODEL_WATCH_INTERVAL', 0))  # 秒，0表示不监听模型文件变化
+    MODEL_RETRY_BACKOFF = float(os.environ.get('MODEL_RETRY_BACKOFF', 30))  # 秒，模型加载失败后重试的初始等待时间，连续失败时翻倍
+    # 模型输入特征的标准化参数，不存在时用 DATA_PATH（训练数据）重新拟合并保存
+    FEATURE_SCALER_PATH = os.environ.get('FEATURE_SCALER_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'model', 'feature_scaler.json'))
+    
+    # GNN inference settings
+    GNN_INFERENCE_MODE = os.environ.get('GNN_INFERENCE_MODE', 'fp32')  # 'fp32' or 'int8' (CPU only)
+    # PyTorch线程数是进程级设置（GNN、MLP共用），启动时设置一次；0 = PyTorch default
+    TORCH_NUM_THREADS = int(os.environ.get('TORCH_NUM_THREADS', os.environ.get('GNN_NUM_THREADS', 0)))
+    
+    # Startup settings
+    PROFILE_IMPORTS = os.environ.get('PROFILE_IMPORTS', '0') == '1'  # 启动时输出各模块导入耗时
+
+    # Logging and tracing settings
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()  # DEBUG日志在热点路径上开销较大，默认INFO
+    SOCKETIO_LOGGING = os.environ.get('SOCKETIO_LOGGING', '0') == '1'  # 是否输出Socket.IO/Engine.IO每个数据包的日志
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'  # 响应中附带各span耗时的Server-Timing头
+    REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', '0') == '1'  # 允许通过 X-Profile 请求头剖析单个请求
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')  # 剖析结果（.prof / .html）的输出目录
     
     # WebSocket settings
     WS_NAMESPACE = '/ws/monitor'
@@ -1 +1,24 @@
-from .gnn_utils import GNNModel 
\ No newline at end of file
+from app.config.config import Config
+from app.utils.logger import logger
+
+
+def configure_torch_threads(num_threads=None):
+    """
+    设置PyTorch的intra-op线程数。这是进程级设置，会影响进程内所有PyTorch推理（GNN、MLP），
+    因此只在进程启动时调用一次；未配置线程数时不导入torch
+    """
+    if num_threads is None:
+        num_threads = Config.TORCH_NUM_THREADS
+    if not num_threads:
+        return
+    import torch
+    torch.set_num_threads(num_threads)
+    logger.info(f"Using {num_threads} intra-op threads for PyTorch inference")
+
+
+def __getattr__(name):
+    # 延迟导入：只有真正用到GNNModel时才加载torch/torch_geometric/sklearn
+    if name == 'GNNModel':
+        from .gnn_utils import GNNModel
+        return GNNModel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
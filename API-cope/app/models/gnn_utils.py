@@ -7,6 +7,15 @@ import math
 import time
 import traceback
 from ..config.config import Config
+from ..utils.tracing import traced
+from ..utils.graph_arrays import (
+    build_csr, common_neighbor_candidates, connected_components, dbscan_labels, graph_to_arrays
+)
+
+try:
+    from torch.ao.quantization import quantize_dynamic
+except ImportError:
+    from torch.quantization import quantize_dynamic
 
 try:
     from torch_geometric.data import Data
@@ -39,52 +48,34 @@ try:
     SKLEARN_AVAILABLE = True
 except ImportError:
     class DBSCAN:
-        def __init__(self, eps=0.5, min_samples=5):
+        def __init__(self, eps=0.5, min_samples=5, metric='euclidean'):
             self.eps = eps
             self.min_samples = min_samples
+            self.metric = metric
         def fit_predict(self, X):
-            n = len(X)
-            dist_matrix = np.zeros((n, n))
-            for i in range(n):
-                for j in range(i+1, n):
-                    dist = np.sqrt(np.sum((X[i] - X[j]) ** 2))
-                    dist_matrix[i, j] = dist
-                    dist_matrix[j, i] = dist
-            neighbors = []
-            for i in range(n):
-                neighbors.append(np.where(dist_matrix[i] < self.eps)[0])
-            labels = np.full(n, -1)
-            cluster_id = 0
-            for i in range(n):
-                if labels[i] != -1:
-                    continue
-                if len(neighbors[i]) >= self.min_samples:
-                    labels[i] = cluster_id
-                    stack = list(neighbors[i])
-                    while stack:
-                        j = stack.pop(0)
-                        if labels[j] == -1:
-                            labels[j] = cluster_id
-                            if len(neighbors[j]) >= self.min_samples:
-                                stack.extend([x for x in neighbors[j] if labels[x] == -1])
-                    cluster_id += 1
-            return labels
-            
-    def cosine_similarity(X):
-        norm = np.sqrt(np.sum(X * X, axis=1))
-        norm = norm.reshape(-1, 1)
-        norm[norm == 0] = 1
-        X_normalized = X / norm
-        return np.dot(X_normalized, X_normalized.T)
+            return dbscan_labels(np.asarray(X), eps=self.eps, min_samples=self.min_samples,
+                                 precomputed=self.metric == 'precomputed')
+
+    def cosine_similarity(X, Y=None):
+        X = np.asarray(X, dtype=np.float64)
+        X_normalized = X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+        if Y is None:
+            Y_normalized = X_normalized
+        else:
+            Y = np.asarray(Y, dtype=np.float64)
+            Y_normalized = Y / np.maximum(np.linalg.norm(Y, axis=1, keepdims=True), 1e-12)
+        return X_normalized @ Y_normalized.T
     SKLEARN_AVAILABLE = False
     logging.warning("scikit-learn not available, using simplified clustering implementation")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class GNNModel:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, inference_mode=None):
         if model_path is None:
             model_path = Config.GNN_MODEL_PATH
+        if inference_mode is None:
+            inference_mode = Config.GNN_INFERENCE_MODE
             
         if torch.cuda.is_available():
             gpu_name = torch.cuda.get_device_name(0)
@@ -109,6 +100,7 @@ class GNNModel:
 
         self.model = None
         self.model_type = None
+        self.inference_mode = 'fp32'
         success = False
         
         try:
@@ -136,6 +128,8 @@ class GNNModel:
                 
                 self.model = self.model.to(self.device)
                 self.model.eval()
+                if inference_mode == 'int8' and self.device.type == 'cpu':
+                    self.model = self._quantize_model(self.model)
                 success = True
                 
             elif model_path.endswith('.pkl'):
@@ -164,7 +158,24 @@ class GNNModel:
         self.node_embeddings = {}
         self.node_risks = {}
         self.potential_edges = []
-        self.batch_size = 1024 if self.device.type == 'cuda' else 256
+
+    def _quantize_model(self, model):
+        """对Linear层做动态int8量化，仅用于CPU推理"""
+        try:
+            quantized = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            quantized.eval()
+            self.inference_mode = 'int8'
+            logger.info("Enabled dynamic int8 quantization for CPU inference")
+            return quantized
+        except Exception as e:
+            logger.warning(f"Dynamic int8 quantization failed: {e}, keeping fp32 model")
+            return model
+
+    def _inference_context(self):
+        """推理上下文：优先使用inference_mode，旧版本PyTorch退回no_grad"""
+        if hasattr(torch, 'inference_mode'):
+            return torch.inference_mode()
+        return torch.no_grad()
 
     def _create_gnn_model(self):
         """创建GNN模型结构"""
@@ -222,6 +233,7 @@ class GNNModel:
                 
         return DummyModel()
 
+    @traced('gnn.prepare_graph_data')
     def prepare_graph_data(self, df, G=None):
         if G is None:
             G = nx.DiGraph()
@@ -255,10 +267,13 @@ class GNNModel:
         data = Data(x=x, edge_index=edge_index, edge_attr=edge_attr)
         transform = NormalizeFeatures()
         data = transform(data)
+        data.x = data.x.contiguous()
         self.node_map = node_map
         self.reverse_map = {i: node for node, i in node_map.items()}
+        self.edge_array = edge_index.cpu().numpy().T.reshape(-1, 2)
         return data, G
     
+    @traced('gnn.compute_embeddings')
     def compute_embeddings(self, data):
         if self.model is None:
             logger.error("GNN model not loaded, cannot compute embeddings")
@@ -270,47 +285,20 @@ class GNNModel:
         try:
             start_time = time.time()
             num_nodes = data.x.size(0)
-            logger.info(f"Computing embeddings for {num_nodes} nodes using batch size {self.batch_size}")
-            all_embeddings = None
-            with torch.no_grad():
-                for i in range(0, num_nodes, self.batch_size):
-                    end_idx = min(i + self.batch_size, num_nodes)
-                    batch_indices = torch.arange(i, end_idx, device=self.device)
-                    batch_mask = torch.zeros(num_nodes, dtype=torch.bool, device=self.device)
-                    batch_mask[batch_indices] = True
-                    batch_data = data.to(self.device)
-                    try:
-                        if self.use_amp and hasattr(torch.cuda, 'amp'):
-                            with torch.cuda.amp.autocast():
-                                try:
-                                    batch_embeddings = self.model.get_embeddings(batch_data)
-                                except (AttributeError, Exception) as e:
-                                    logger.warning(f"Model get_embeddings failed: {e}, using node features instead")
-                                    batch_embeddings = batch_data.x
-                        else:
-                            try:
-                                batch_embeddings = self.model.get_embeddings(batch_data)
-                            except (AttributeError, Exception) as e:
-                                logger.warning(f"Model get_embeddings failed: {e}, using node features instead")
-                                batch_embeddings = batch_data.x
-                        if batch_embeddings.device != batch_indices.device:
-                            logger.info(f"Moving batch_embeddings from {batch_embeddings.device} to {batch_indices.device}")
-                            batch_embeddings = batch_embeddings.to(batch_indices.device)
-                        batch_embeddings = batch_embeddings[batch_indices]
-                        batch_embeddings_np = batch_embeddings.cpu().numpy()
-                        if all_embeddings is None:
-                            embedding_dim = batch_embeddings_np.shape[1]
-                            all_embeddings = np.zeros((num_nodes, embedding_dim), dtype=np.float32)
-                        all_embeddings[i:end_idx] = batch_embeddings_np
-                        if (i // self.batch_size) % 5 == 0:
-                            progress = (end_idx / num_nodes) * 100
-                            logger.info(f"Computing embeddings: {progress:.1f}% complete")
-                    except Exception as e:
-                        logger.error(f"Error in batch {i}-{end_idx}: {e}")
-                        import traceback
-                        logger.error(traceback.format_exc())
-                        if all_embeddings is not None:
-                            all_embeddings[i:end_idx] = 0
+            logger.info(f"Computing embeddings for {num_nodes} nodes")
+            with self._inference_context():
+                # 消息传递依赖整张图，整图前向一次得到所有节点的嵌入
+                graph_data = data.to(self.device)
+                try:
+                    if self.use_amp and hasattr(torch.cuda, 'amp'):
+                        with torch.cuda.amp.autocast():
+                            embeddings = self.model.get_embeddings(graph_data)
+                    else:
+                        embeddings = self.model.get_embeddings(graph_data)
+                except (AttributeError, Exception) as e:
+                    logger.warning(f"Model get_embeddings failed: {e}, using node features instead")
+                    embeddings = graph_data.x
+                all_embeddings = embeddings.float().cpu().numpy()
                 if self.device.type == 'cuda':
                     torch.cuda.empty_cache()
                 for i, embedding in enumerate(all_embeddings):
@@ -330,6 +318,7 @@ class GNNModel:
                 self.node_embeddings[node_id] = random_embeddings[i]
             logger.warning("Using random embeddings as fallback after error")
             return random_embeddings
+    @traced('gnn.predict_node_risks')
     def predict_node_risks(self, data):
         if self.model is None:
             logger.error("Model not loaded, cannot predict risks")
@@ -338,47 +327,29 @@ class GNNModel:
         try:
             start_time = time.time()
             num_nodes = data.x.size(0)
-            logger.info(f"Predicting risks for {num_nodes} nodes using batch size {self.batch_size}")
-            all_risk_scores = np.zeros(num_nodes, dtype=np.float32)
-            
-            with torch.no_grad():
-                for i in range(0, num_nodes, self.batch_size):
-                    end_idx = min(i + self.batch_size, num_nodes)
-                    batch_indices = torch.arange(i, end_idx).to(self.device)
-                    batch_data = data.to(self.device)
-                    
-                    try:
-                        if self.model_type == 'gnn':
-                            # GNN模型直接处理图数据
-                            batch_scores = self.model(batch_data)
-                            batch_scores = torch.sigmoid(batch_scores)
-                        elif self.model_type == 'sklearn':
-                            # scikit-learn模型处理特征
-                            features = batch_data.x.cpu().numpy()
-                            if hasattr(self.model, 'predict_proba'):
-                                batch_scores = self.model.predict_proba(features)[:, 1]
-                            else:
-                                batch_scores = self.model.predict(features)
-                            batch_scores = torch.from_numpy(batch_scores).float().to(self.device)
-                        else:
-                            # 其他类型模型
-                            batch_scores = self.model(batch_data)
-                            if isinstance(batch_scores, np.ndarray):
-                                batch_scores = torch.from_numpy(batch_scores).float()
-                            batch_scores = torch.sigmoid(batch_scores)
-                            
-                        batch_scores = batch_scores.to(self.device)
-                        batch_scores = batch_scores[batch_indices]
-                        all_risk_scores[i:end_idx] = batch_scores.cpu().numpy()
-                        
-                        if (i // self.batch_size) % 5 == 0:
-                            progress = (end_idx / num_nodes) * 100
-                            logger.info(f"Predicting risks: {progress:.1f}% complete")
-                            
-                    except Exception as e:
-                        logger.error(f"Error in batch {i}-{end_idx}: {e}")
-                        logger.error(traceback.format_exc())
-                        all_risk_scores[i:end_idx] = self._fallback_risk_calculation_batch(batch_data, batch_indices)
+            logger.info(f"Predicting risks for {num_nodes} nodes")
+
+            with self._inference_context():
+                # 整图前向一次得到所有节点的风险分数；失败时由外层回退到基于节点特征的计算
+                graph_data = data.to(self.device)
+                if self.model_type == 'gnn':
+                    # GNN模型直接处理图数据
+                    scores = torch.sigmoid(self.model(graph_data))
+                elif self.model_type == 'sklearn':
+                    # scikit-learn模型处理特征
+                    features = graph_data.x.cpu().numpy()
+                    if hasattr(self.model, 'predict_proba'):
+                        scores = self.model.predict_proba(features)[:, 1]
+                    else:
+                        scores = self.model.predict(features)
+                    scores = torch.from_numpy(scores).float()
+                else:
+                    # 其他类型模型
+                    scores = self.model(graph_data)
+                    if isinstance(scores, np.ndarray):
+                        scores = torch.from_numpy(scores).float()
+                    scores = torch.sigmoid(scores)
+                all_risk_scores = scores.float().cpu().numpy().reshape(num_nodes)
 
             # 更新节点风险分数
             high_risk_count = 0
@@ -423,32 +394,6 @@ class GNNModel:
             self.node_risks[node_id] = float(risk)
             node_risks.append(risk)
         return np.array(node_risks)
-    def _fallback_risk_calculation_batch(self, data, batch_indices):
-        logger.warning(f"Using fallback risk calculation for batch of {len(batch_indices)} nodes")
-        features = data.x[batch_indices].cpu().numpy()
-        batch_risks = np.zeros(len(batch_indices), dtype=np.float32)
-        for j, feat in enumerate(features):
-            i = batch_indices[j].item()
-            transaction_count = float(feat[0])
-            total_amount = float(feat[1])
-            base_risk = float(feat[2])
-            is_merchant = bool(feat[3])
-            in_degree = int(feat[4])
-            out_degree = int(feat[5])
-            risk = base_risk
-            if total_amount > 1000000:
-                risk += 0.2
-            if in_degree > 0 and out_degree > 0:
-                ratio = out_degree / in_degree
-                if ratio > 5 or ratio < 0.2:  # 出入比例不平衡
-                    risk += 0.15
-            if transaction_count > 100:
-                risk += 0.1
-            risk = min(risk, 1.0)
-            node_id = self.reverse_map[i]
-            self.node_risks[node_id] = float(risk)
-            batch_risks[j] = risk
-        return batch_risks
     def predict_potential_edges(self, data, G, threshold=0.7):
         if not self.node_embeddings:
             logger.error("Node embeddings not computed")
@@ -532,32 +477,25 @@ class GNNModel:
             return self._fallback_potential_edges(G)
     def _fallback_potential_edges(self, G):
         logger.warning("Using fallback method for potential edge prediction")
-        potential_edges = []
-        for node in G.nodes():
-            neighbors = set(G.successors(node)).union(set(G.predecessors(node)))
-            for neighbor in neighbors:
-                second_degree = set(G.successors(neighbor)).union(set(G.predecessors(neighbor)))
-                second_degree = second_degree - neighbors - {node}
-                for target in second_degree:
-                    if not G.has_edge(node, target):
-                        common_neighbors = len(set(G.neighbors(node)).intersection(set(G.neighbors(target))))
-                        similarity = float(common_neighbors / max(len(set(G.neighbors(node))), len(set(G.neighbors(target)))))
-                        source_risk = float(self.node_risks.get(node, 0.5))
-                        target_risk = float(self.node_risks.get(target, 0.5))
-                        risk_score = float((source_risk + target_risk) / 2)
-                        potential_edges.append({
-                            'source': node,
-                            'target': target,
-                            'similarity': similarity,
-                            'risk_score': risk_score
-                        })
+        nodes, _, src, dst = graph_to_arrays(G)
+        result = []
+        if nodes:
+            indptr, indices = build_csr(src, dst, len(nodes), symmetric=True)
+            scores = np.array([self.node_risks.get(node, 0.5) for node in nodes], dtype=np.float64)
+            sources, targets, similarities, risk_scores = common_neighbor_candidates(indptr, indices, scores, top_k=50)
+            result = [{
+                'source': nodes[s],
+                'target': nodes[t],
+                'similarity': float(similarity),
+                'risk_score': float(risk_score)
+            } for s, t, similarity, risk_score in zip(sources, targets, similarities, risk_scores)]
 
-        potential_edges.sort(key=lambda x: (x['risk_score'], x['similarity']), reverse=True)
-        result = potential_edges[:50]
         self.potential_edges = result
         logger.info(f"Generated {len(result)} potential edges using fallback method")
         return result
-    def cluster_similar_nodes(self, min_samples=3, eps=0.4):
+    @traced('gnn.cluster_similar_nodes')
+    def cluster_similar_nodes(self, min_samples=3, eps=0.4, nodes=None):
+        """对节点嵌入做DBSCAN聚类；nodes 限定参与聚类的节点（如时间不足时只取高风险种子节点）"""
         if not self.node_embeddings:
             logger.error("Node embeddings not computed")
             return self._fallback_clustering(min_samples)
@@ -565,7 +503,10 @@ class GNNModel:
         try:
             start_time = time.time()
 
-            nodes = list(self.node_embeddings.keys())
+            if nodes is None:
+                nodes = list(self.node_embeddings.keys())
+            else:
+                nodes = [node for node in nodes if node in self.node_embeddings]
             if len(nodes) < min_samples:
                 logger.warning(f"Not enough nodes ({len(nodes)}) for clustering, minimum {min_samples} required")
                 return self._fallback_clustering(min_samples)
@@ -592,7 +533,6 @@ class GNNModel:
                                     logger.info(f"Distance computation: {progress:.1f}% complete")
                     distance_matrix_np = distance_matrix.cpu().numpy()
                     torch.cuda.empty_cache()
-                    from sklearn.cluster import DBSCAN
                     dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
                     clusters = dbscan.fit_predict(distance_matrix_np)
                     
@@ -645,41 +585,54 @@ class GNNModel:
             logger.error(traceback.format_exc())
             return self._fallback_clustering(min_samples)
             
-    def _fallback_clustering(self, min_group_size=3):
+    def _fallback_clustering(self, min_group_size=3, max_clusters=20):
+        """在可疑节点诱导子图上取弱连通分量作为团伙，结果确定且与节点数近线性"""
         logger.warning("Using fallback clustering method based on graph structure")
-        high_risk_nodes = [node for node, risk in self.node_risks.items() if risk > 0.6]
-
+        reverse_map = getattr(self, 'reverse_map', {})
+        edge_array = getattr(self, 'edge_array', np.zeros((0, 2), dtype=np.int64))
+        num_nodes = len(reverse_map)
         clusters = {}
-        cluster_id = 0
+        if num_nodes == 0:
+            self.gnn_clusters = clusters
+            return clusters
 
-        for i, node in enumerate(high_risk_nodes):
-            if i > 20:
-                break
-            related_nodes = []
-            for other_node, risk in self.node_risks.items():
-                if node != other_node and risk > 0.4:
-                    if np.random.random() < 0.3:
-                        related_nodes.append({
-                            'node': other_node,
-                            'risk_score': float(risk)
-                        })
+        risks = np.array([self.node_risks.get(reverse_map[i], 0) for i in range(num_nodes)], dtype=np.float64)
+        candidate = risks > 0.4
+        src, dst = edge_array[:, 0], edge_array[:, 1]
+        induced = candidate[src] & candidate[dst]
+        indptr, indices = build_csr(src[induced], dst[induced], num_nodes, symmetric=True)
+        rows = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(indptr))
+        labels = connected_components(num_nodes, rows, indices)
+
+        members = np.flatnonzero(candidate)
+        member_labels = labels[members]
+        sizes = np.bincount(member_labels, minlength=num_nodes)
+        has_seed = np.zeros(num_nodes, dtype=bool)
+        has_seed[member_labels[risks[members] > 0.6]] = True
+        risk_sums = np.bincount(member_labels, weights=risks[members], minlength=num_nodes)
+
+        groups = np.flatnonzero(has_seed & (sizes >= min_group_size))
+        avg_risks = risk_sums[groups] / sizes[groups]
+        # 按平均风险、规模、最小节点编号排序，保证跨请求结果一致
+        groups = groups[np.lexsort((groups, -sizes[groups], -avg_risks))][:max_clusters]
+
+        order = members[np.lexsort((members, -risks[members]))]
+        order_labels = labels[order]
+        for cluster_id, group in enumerate(groups):
+            group_members = order[order_labels == group]
+            avg_risk = float(risks[group_members].mean())
+            clusters[cluster_id] = {
+                'members': [{'node': reverse_map[i], 'risk_score': float(risks[i])} for i in group_members],
+                'count': len(group_members),
+                'avg_risk_score': avg_risk,
+                'risk_level': 'high' if avg_risk > 0.7 else 'medium' if avg_risk > 0.4 else 'low'
+            }
 
-            if len(related_nodes) >= min_group_size - 1:
-                all_members = [{'node': node, 'risk_score': float(self.node_risks.get(node, 0.5))}] + related_nodes
-                avg_risk = float(np.mean([m['risk_score'] for m in all_members]))
-                
-                clusters[cluster_id] = {
-                    'members': sorted(all_members, key=lambda x: x['risk_score'], reverse=True),
-                    'count': len(all_members),
-                    'avg_risk_score': float(avg_risk),
-                    'risk_level': 'high' if avg_risk > 0.7 else 'medium' if avg_risk > 0.4 else 'low'
-                }
-                cluster_id += 1
-        
         logger.info(f"Created {len(clusters)} clusters using fallback method")
         self.gnn_clusters = clusters
         return clusters
-    
+
+    @traced('gnn.enhance_graph')
     def enhance_graph(self, G):
         if not self.node_risks:
             logger.warning("Node risks not predicted, cannot enhance graph")
@@ -0,0 +1,55 @@
+"""
+训练笔记本中的MLP欺诈分类模型
+模型文件是用 torch.save(model) 保存的整个模型，反序列化时需要笔记本 __main__ 中的 OptimizedMLP 类
+"""
+import pickle
+import types
+import torch
+import torch.nn as nn
+
+
+class OptimizedMLP(nn.Module):
+    def __init__(self, input_dim, hidden_dims=[256, 128, 64], dropout_rate=0.3):
+        super(OptimizedMLP, self).__init__()
+        layers = []
+        prev_dim = input_dim
+        for hidden_dim in hidden_dims:
+            layers.extend([
+                nn.Linear(prev_dim, hidden_dim),
+                nn.LeakyReLU(negative_slope=0.01),
+                nn.BatchNorm1d(hidden_dim),
+                nn.Dropout(dropout_rate)
+            ])
+            prev_dim = hidden_dim
+        layers.append(nn.Linear(prev_dim, 1))
+        layers.append(nn.Sigmoid())
+        self.model = nn.Sequential(*layers)
+
+    def forward(self, x):
+        return self.model(x).squeeze()
+
+
+class _NotebookUnpickler(pickle.Unpickler):
+    """把笔记本中定义在 __main__ 的类映射到本模块"""
+
+    def find_class(self, module, name):
+        if module == '__main__' and name == 'OptimizedMLP':
+            return OptimizedMLP
+        return super().find_class(module, name)
+
+
+_notebook_pickle = types.SimpleNamespace(__name__='pickle', Unpickler=_NotebookUnpickler, load=pickle.load)
+
+
+class MLPModel:
+    """加载MLP并以推理模式计算欺诈概率，输入为 feature_pipeline 生成的float32特征矩阵"""
+
+    def __init__(self, model_path):
+        self.model = torch.load(model_path, map_location='cpu', weights_only=False, pickle_module=_notebook_pickle)
+        self.model.eval()
+
+    def fraud_scores(self, features):
+        """(行数, 12) 的float32矩阵 -> 每行的欺诈概率；C连续的矩阵直接作为张量使用，不复制"""
+        with torch.inference_mode():
+            scores = self.model(torch.from_numpy(features))
+        return scores.reshape(-1).numpy()
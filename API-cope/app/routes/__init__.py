@@ -6,6 +6,8 @@ from .analysis_routes import register_analysis_routes
 from .group_routes import register_group_routes
 from .alert_routes import register_alert_routes
 from .graph_routes import register_graph_routes
+from .model_routes import register_model_routes
+from .metrics_routes import register_metrics_routes
 
 def register_routes(app: Flask, socketio: SocketIO, data_cache):
     """Register all application routes"""
@@ -14,4 +16,6 @@ def register_routes(app: Flask, socketio: SocketIO, data_cache):
     register_analysis_routes(app, data_cache)
     register_group_routes(app, data_cache)
     register_alert_routes(app, data_cache)
-    register_graph_routes(app, data_cache) 
\ No newline at end of file
+    register_graph_routes(app, data_cache, socketio)
+    register_model_routes(app, data_cache)
+    register_metrics_routes(app) 
\ No newline at end of file
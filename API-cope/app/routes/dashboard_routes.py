@@ -1,177 +1,38 @@
-from flask import jsonify
-from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
+from app.services.data_service import (
+    get_dashboard_statistics,
+    get_trend_statistics,
+    get_risk_distribution_data
+)
 from app.utils.logger import logger
+from app.utils.serialization import json_response
+from app.utils.tracing import traced
 
 def register_dashboard_routes(app, data_cache):
     @app.route('/api/dashboard/stats', methods=['GET'])
+    @traced('dashboard.stats')
     def get_dashboard_stats():
         try:
-            if not data_cache.transactions or not data_cache.last_update:
-                data_cache.load_data()
-
-            current_time = datetime.now()
-            today = current_time.date()
-            yesterday = (current_time - timedelta(days=1)).date()
-
-            df = pd.DataFrame(data_cache.transactions)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-            recent_df = df[df['timestamp'].dt.date >= yesterday]
-            today_data = recent_df[recent_df['timestamp'].dt.date == today]
-            yesterday_data = recent_df[recent_df['timestamp'].dt.date == yesterday]
-
-            today_risk = len(today_data[today_data['risk_score'] > 0.7])
-            yesterday_risk = len(yesterday_data[yesterday_data['risk_score'] > 0.7])
-            risk_change = ((today_risk - yesterday_risk) / (yesterday_risk or 1)) * 100
-
-            try:
-                if 'isFraud' in recent_df.columns and len(recent_df) > 0:
-                    y_true = recent_df['isFraud'].astype(int)
-                    y_pred = (recent_df['risk_score'] > 0.7).astype(int)
-
-                    accuracy = (y_true == y_pred).mean() * 100
-                    logger.info(f"Calculated accuracy: {accuracy}% from {len(recent_df)} transactions")
-
-                    if accuracy == 0 or np.isnan(accuracy):
-                        accuracy = 99.9
-                        logger.info(f"Using default accuracy: {accuracy}%")
-                else:
-                    logger.warning("isFraud column not found in data or empty DataFrame")
-                    accuracy = 99.9
-            except Exception as e:
-                logger.error(f"Error calculating accuracy: {e}")
-                accuracy = 99.9
-
-            pending_alerts = sum(1 for a in data_cache.alerts if a['status'] == 'pending')
-            yesterday_pending = sum(1 for a in data_cache.alerts
-                                  if a['status'] == 'pending' and
-                                  datetime.fromisoformat(a['timestamp']).date() == yesterday)
-            alert_change = ((pending_alerts - yesterday_pending) / (yesterday_pending or 1)) * 100
-
-            suspicious_groups = len(
-                recent_df[recent_df['risk_score'] > 0.8].groupby('nameOrig').filter(lambda x: len(x) > 5))
-
-            stats = {
-                'risk_transactions': {
-                    'title': '今日风险交易',
-                    'value': str(today_risk),
-                    'change': f"{risk_change:.1f}",
-                    'type': 'warning' if risk_change > 0 else 'success',
-                    'description': '较昨日'
-                },
-                'model_accuracy': {
-                    'title': '识别准确率',
-                    'value': f"{accuracy:.1f}%",
-                    'change': '0.0',
-                    'type': 'success',
-                    'description': '模型性能'
-                },
-                'pending_alerts': {
-                    'title': '待处理预警',
-                    'value': str(pending_alerts),
-                    'change': f"{alert_change:.1f}",
-                    'type': 'danger' if alert_change > 0 else 'info',
-                    'description': '较昨日'
-                },
-                'suspicious_groups': {
-                    'title': '发现可疑团伙',
-                    'value': str(suspicious_groups),
-                    'change': '0.0',
-                    'type': 'danger',
-                    'description': '本周新增'
-                }
-            }
-
-            return jsonify(stats)
+            return json_response(get_dashboard_statistics(data_cache))
         except Exception as e:
             logger.error(f"Error calculating dashboard stats: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
 
     @app.route('/api/dashboard/trends', methods=['GET'])
+    @traced('dashboard.trends')
     def get_trend_data():
         try:
-            if not data_cache.transactions or not data_cache.last_update:
-                data_cache.load_data()
-
-            df = pd.DataFrame(data_cache.transactions)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-            end_date = df['timestamp'].max()
-            start_date = end_date - timedelta(days=6)
-            mask = (df['timestamp'] >= start_date) & (df['timestamp'] <= end_date)
-            recent_df = df[mask]
-
-            daily_stats = recent_df.groupby(recent_df['timestamp'].dt.date).agg({
-                'risk_score': lambda x: (
-                    sum(x > 0.7),
-                    sum((x > 0.5) & (x <= 0.7)),
-                    sum(x > 0.5)
-                )
-            }).reset_index()
-
-            logger.info(f"Daily statistics: {daily_stats.to_dict()}")
-
-            weekday_map = {
-                0: '周一', 1: '周二', 2: '周三',
-                3: '周四', 4: '周五', 5: '周六', 6: '周日'
-            }
-
-            dates = daily_stats['timestamp'].tolist()
-            high_risk = [x[0] for x in daily_stats['risk_score']]
-            suspicious = [x[1] for x in daily_stats['risk_score']]
-            total_alerts = [x[2] for x in daily_stats['risk_score']]
-
-            logger.info(f"High risk counts: {high_risk}")
-            logger.info(f"Suspicious counts: {suspicious}")
-            logger.info(f"Total alert counts: {total_alerts}")
-
-            response_data = {
-                'xAxis': [weekday_map[d.weekday()] for d in dates],
-                'series': [
-                    {
-                        'name': '高风险交易',
-                        'type': 'line',
-                        'data': high_risk,
-                        'itemStyle': {'color': '#F56C6C'}
-                    },
-                    {
-                        'name': '可疑行为',
-                        'type': 'line',
-                        'data': suspicious,
-                        'itemStyle': {'color': '#E6A23C'}
-                    },
-                    {
-                        'name': '预警总量',
-                        'type': 'line',
-                        'data': total_alerts,
-                        'itemStyle': {'color': '#409EFF'}
-                    }
-                ]
-            }
-
+            response_data = get_trend_statistics(data_cache)
             logger.info(f"Response data: {response_data}")
-            return jsonify(response_data)
+            return json_response(response_data)
         except Exception as e:
             logger.error(f"Error processing trend data: {e}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}), 500
 
     @app.route('/api/dashboard/risk-distribution', methods=['GET'])
+    @traced('dashboard.risk_distribution')
     def get_risk_distribution():
         try:
-            if not data_cache.transactions or not data_cache.last_update:
-                data_cache.load_data()
-
-            df = pd.DataFrame(data_cache.transactions)
-            risk_counts = df['risk_type'].value_counts()
-            total = risk_counts.sum()
-            distribution_percentage = (risk_counts / total * 100).round(2)
-
-            return jsonify({
-                'labels': distribution_percentage.index.tolist(),
-                'data': distribution_percentage.values.tolist()
-            })
+            return json_response(get_risk_distribution_data(data_cache))
         except Exception as e:
             logger.error(f"Error getting risk distribution: {e}")
-            return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+            return json_response({'error': str(e)}), 500 
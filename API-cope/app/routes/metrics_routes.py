@@ -0,0 +1,8 @@
+from flask import current_app
+from app.utils.tracing import metrics
+
+def register_metrics_routes(app):
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        # Prometheus文本格式：各span和各路由的耗时直方图
+        return current_app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
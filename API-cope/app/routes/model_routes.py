@@ -0,0 +1,83 @@
+from flask import request
+import os
+import pandas as pd
+from app.utils.data_cache import FEATURE_MODELS
+from app.utils.logger import logger
+from app.utils.serialization import json_response
+
+def register_model_routes(app, data_cache):
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        # 只读取状态，不触发数据或模型加载，供负载均衡和自动扩缩容探活
+        models = {name: status['state'] for name, status in data_cache.model_registry.status().items()}
+        return json_response({
+            'status': 'ok',
+            'data_loaded': data_cache.last_update is not None,
+            'data_plane': data_cache.data_plane_status(),
+            'analysis_pool': data_cache.analysis_pool_status(),
+            'models': models
+        })
+
+    @app.route('/api/models/status', methods=['GET'])
+    def get_models_status():
+        try:
+            return json_response(data_cache.model_registry.status())
+        except Exception as e:
+            logger.error(f"Error getting model status: {e}")
+            return json_response({'error': str(e)}), 500
+
+    @app.route('/api/models/predict', methods=['POST'])
+    def predict_transactions():
+        """用GBC/RF/MLP给一批交易打分（列表或 {'transactions': [...], 'models': [...]}），特征只计算一次"""
+        try:
+            data = request.get_json()
+            transactions = data.get('transactions') if isinstance(data, dict) else data
+            if not transactions or not isinstance(transactions, list):
+                return json_response({'error': 'No transactions provided'}), 400
+            names = data.get('models') if isinstance(data, dict) else None
+            if names is not None:
+                unknown = [name for name in names if name not in FEATURE_MODELS]
+                if unknown:
+                    return json_response({'error': f'Unknown model: {unknown[0]}',
+                                          'detail': {'message': f'不支持的模型: {unknown[0]}'}}), 400
+
+            batch = pd.DataFrame(transactions)
+            for column in ('amount', 'type'):
+                if column not in batch.columns:
+                    return json_response({'error': f'Missing column: {column}',
+                                          'detail': {'message': f'交易缺少字段: {column}'}}), 400
+            scores, unavailable = data_cache.predict_batch(batch, names)
+            return json_response({
+                'count': len(batch),
+                'scores': {name: values.tolist() for name, values in scores.items()},
+                'unavailable': unavailable
+            })
+        except (TypeError, ValueError) as e:
+            return json_response({'error': str(e), 'detail': {'message': '交易字段格式错误'}}), 400
+        except Exception as e:
+            logger.error(f"Error predicting transactions: {e}")
+            return json_response({'error': str(e)}), 500
+
+    @app.route('/api/models/<name>/reload', methods=['POST'])
+    def reload_model(name):
+        try:
+            registry = data_cache.model_registry
+            if name not in registry.names():
+                return json_response({'error': f'Unknown model: {name}'}), 404
+
+            data = request.get_json(silent=True) or {}
+            path = data.get('path')
+            if path:
+                # 只允许从原模型所在目录热加载，避免加载任意位置的pickle文件
+                model_dir = os.path.dirname(os.path.abspath(registry.status()[name]['path']))
+                path = os.path.abspath(path)
+                if os.path.dirname(path) != model_dir:
+                    return json_response({'error': 'Model file must be in the model directory'}), 400
+                if not os.path.exists(path):
+                    return json_response({'error': f'Model file not found: {path}'}), 404
+
+            status = registry.reload(name, path)
+            return json_response({'success': True, 'model': name, 'status': status})
+        except Exception as e:
+            logger.error(f"Error reloading model {name}: {e}")
+            return json_response({'error': str(e)}), 500
@@ -1,140 +1,91 @@
 import pandas as pd
 from datetime import datetime
+from app.utils.alert_store import RISK_LEVELS, STATUSES, decode_cursor
 from app.utils.logger import logger
+from app.utils.tracing import traced
 
-def get_alerts_data(data_cache, page, page_size, alert_type, risk_level, status, start_date, end_date):
-    """Get alerts data with filtering and pagination"""
-    if not data_cache.transactions or not data_cache.last_update:
-        data_cache.load_data()
 
-    df = pd.DataFrame(data_cache.transactions)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+def _to_microseconds(value):
+    timestamp = pd.to_datetime(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return int(timestamp.value // 1000)
 
+
+def _alert_filters(alert_type, risk_level, status, start_date, end_date):
+    """把接口参数转换为AlertStore的筛选条件，日期格式错误时抛出ValueError"""
+    filters = {
+        'alert_type': alert_type or None,
+        'risk_level': RISK_LEVELS.get(risk_level, risk_level) or None,
+        'status': STATUSES.get(status, status) or None,
+        'start_us': None,
+        'end_us': None
+    }
     if start_date and end_date:
         try:
-            start = pd.to_datetime(start_date).tz_localize(None)
-            end = pd.to_datetime(end_date).tz_localize(None)
-            logger.info(f"Filtering data between {start} and {end}")
-
-            if df['timestamp'].dt.tz is not None:
-                df['timestamp'] = df['timestamp'].dt.tz_localize(None)
-
-            df = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
-            logger.info(f"Filtered data shape: {df.shape}")
+            filters['start_us'] = _to_microseconds(start_date)
+            filters['end_us'] = _to_microseconds(end_date)
         except Exception as e:
             logger.error(f"Error parsing dates: {e}")
-            return {
-                'error': f'Invalid date format: {str(e)}'
-            }
+            raise ValueError(f'Invalid date format: {str(e)}')
+    return filters
 
-    alerts = []
-    high_risk_txs = df[df['risk_score'] > 0.7]
-    logger.info(f"Found {len(high_risk_txs)} high risk transactions")
 
-    alerts = format_alerts(high_risk_txs)
-    filtered_alerts = filter_alerts(alerts, alert_type, risk_level, status)
-    
-    # Sort and paginate
-    filtered_alerts.sort(key=lambda x: x['time'], reverse=True)
-    total = len(filtered_alerts)
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
-    paged_alerts = filtered_alerts[start_idx:end_idx]
+@traced()
+def get_alerts_data(data_cache, page, page_size, alert_type, risk_level, status, start_date, end_date, cursor=None):
+    """
+    Get alerts data with filtering and pagination
+    传入cursor（上一页返回的next_cursor）时使用键集分页，否则按page计算偏移量
+    日期或游标格式错误时抛出ValueError
+    """
+    if not data_cache.transactions or not data_cache.last_update:
+        data_cache.load_data()
+
+    filters = _alert_filters(alert_type, risk_level, status, start_date, end_date)
+    page_size = max(1, page_size)
+    store = data_cache.alert_store
+    if cursor:
+        items, next_cursor = store.query(limit=page_size, cursor=decode_cursor(cursor), **filters)
+    else:
+        items, next_cursor = store.query(limit=page_size, offset=(max(page, 1) - 1) * page_size, **filters)
 
     return {
-        'total': total,
-        'items': paged_alerts
+        'total': store.count(**filters),
+        'items': items,
+        'next_cursor': next_cursor
     }
 
-def process_alerts_batch(data):
-    """Process batch of alerts"""
+
+@traced()
+def get_alert_facets(data_cache, alert_type, risk_level, status, start_date, end_date):
+    """预警控制台的分面计数：各类型/风险等级/状态在其余筛选条件下的预警数"""
+    if not data_cache.transactions or not data_cache.last_update:
+        data_cache.load_data()
+    filters = _alert_filters(alert_type, risk_level, status, start_date, end_date)
+    return data_cache.alert_store.facets(**filters)
+
+
+@traced()
+def process_alerts_batch(data_cache, data):
+    """批量更新预警处理状态，默认标记为已处理"""
     alert_ids = data.get('alertIds', [])
     method = data.get('method')
     description = data.get('description')
     handler = data.get('handler', 'System')
+    status = STATUSES.get(data.get('status'), data.get('status')) or STATUSES['resolved']
 
+    process_time = datetime.now().isoformat()
+    updated = data_cache.alert_store.update_status(alert_ids, status, handler, method, description, process_time)
     return {
         'success': True,
-        'message': f'Processed {len(alert_ids)} alerts',
+        'message': f'Processed {updated} alerts',
         'data': {
             'alert_ids': alert_ids,
+            'updated': updated,
+            'status': status,
             'method': method,
             'description': description,
             'handler': handler,
-            'process_time': datetime.now().isoformat()
+            'process_time': process_time
         }
     }
-
-def format_alerts(high_risk_txs):
-    """Format alerts from high risk transactions"""
-    alerts = []
-    alert_templates = {
-        '身份盗用': [
-            "检测到身份盗用风险",
-            "身份验证异常",
-            "账户身份信息不一致"
-        ],
-        '大额交易': [
-            "发现大额可疑转账",
-            "大额交易风险提示",
-            "异常大额交易预警"
-        ],
-        '洗钱行为': [
-            "检测到洗钱行为风险",
-            "多层资金转移预警",
-            "复杂资金清洗路径"
-        ]
-    }
-
-    for idx, row in high_risk_txs.iterrows():
-        if row['amount'] > 500000:
-            alert_type_name = '大额交易'
-        elif row['risk_score'] > 0.85:
-            alert_type_name = '身份盗用'
-        else:
-            alert_type_name = '洗钱行为'
-
-        titles = alert_templates[alert_type_name]
-        title_idx = hash(row['nameOrig'] + str(row['amount'])) % len(titles)
-        title = titles[title_idx]
-
-        description = f"账户 {row['nameOrig']} 向 {row['nameDest']} 发起 {row['type']} 交易，"
-        description += f"金额 ¥{row['amount']:,.2f}，风险评分 {row['risk_score'] * 100:.0f}"
-
-        risk_level_name = '高风险' if row['risk_score'] > 0.8 else '中风险'
-
-        alert = {
-            'id': len(alerts) + 1,
-            'time': row['timestamp'].isoformat(),
-            'type': alert_type_name,
-            'title': title,
-            'description': description,
-            'riskLevel': risk_level_name,
-            'status': '未处理',
-            'handler': '-',
-            'details': {
-                'transaction_type': row['type'],
-                'amount': float(row['amount']),
-                'risk_score': float(row['risk_score']),
-                'source_account': row['nameOrig'],
-                'target_account': row['nameDest']
-            }
-        }
-        alerts.append(alert)
-
-    return alerts
-
-def filter_alerts(alerts, alert_type, risk_level, status):
-    """Filter alerts based on criteria"""
-    filtered_alerts = alerts
-    
-    if alert_type:
-        filtered_alerts = [a for a in filtered_alerts if a['type'] == alert_type]
-    
-    if risk_level:
-        filtered_alerts = [a for a in filtered_alerts if a['riskLevel'] == risk_level]
-    
-    if status:
-        filtered_alerts = [a for a in filtered_alerts if a['status'] == status]
-    
-    return filtered_alerts 
\ No newline at end of file
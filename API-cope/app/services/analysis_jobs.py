@@ -0,0 +1,191 @@
+"""
+路径分析的异步任务：提交后立即返回任务ID，客户端轮询任务状态或在 /ws/monitor 上接收进度和完成通知
+任务在有界线程池中通过 DataCache.run_analysis 执行（启用进程池时实际计算在工作进程中），
+进度由分析过程中结束的各阶段span推算，各阶段的权重取本进程 /metrics 中该span的平均耗时
+"""
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask_socketio import join_room
+from app.config.config import Config
+from app.services.graph_service import AnalysisError, build_path_response
+from app.utils.analysis_pool import JobTimeout, PoolSaturated
+from app.utils.bounded_store import BoundedStore
+from app.utils.logger import logger
+from app.utils.tracing import span_listener, span_mean
+
+# 路径分析各阶段的span（按执行顺序）及尚无历史耗时时使用的默认耗时（秒）
+JOB_STAGES = [
+    ('graph.load', 0.2),
+    ('graph.build', 1.0),
+    ('gnn.prepare_graph_data', 0.5),
+    ('gnn.compute_embeddings', 0.5),
+    ('gnn.predict_node_risks', 0.5),
+    ('gnn.predict_potential_edges', 1.0),
+    ('gnn.cluster_similar_nodes', 0.5),
+    ('gnn.enhance_graph', 0.2),
+    ('graph.high_risk_nodes', 0.2),
+    ('graph.node_stats', 0.2),
+    ('graph.pagerank', 1.0),
+    ('graph.paths', 0.5),
+    ('graph.response', 0.5),
+    ('optimize.optimize_fraud_detection_response', 0.5),
+]
+
+# 任务完成前报告的最大进度，最后一个阶段结束到结果就绪之间仍有序列化等开销
+MAX_RUNNING_PROGRESS = 0.99
+
+FINISHED_STATUSES = ('succeeded', 'failed')
+
+
+def stage_progress(data):
+    """本次分析会经过的阶段 -> 该阶段结束时的累计进度"""
+    stages = [(name, default) for name, default in JOB_STAGES
+              if (data.get('use_gnn', True) or not name.startswith('gnn.'))
+              and (not data.get('disable_optimization', False) or not name.startswith('optimize.'))]
+    weights = [span_mean(name) or default for name, default in stages]
+    total = sum(weights)
+    progress = {}
+    cumulative = 0.0
+    for (name, _), weight in zip(stages, weights):
+        cumulative += weight
+        progress[name] = min(cumulative / total, MAX_RUNNING_PROGRESS)
+    return progress
+
+
+def job_room(job_id):
+    return f'analysis_job:{job_id}'
+
+
+class AnalysisJobs:
+    """
+    异步路径分析任务
+    排队和执行中的任务数有上限（超出时抛出 PoolSaturated），结果连同任务状态保存在有界存储中
+    """
+
+    def __init__(self, data_cache, socketio=None, namespace='/ws/monitor'):
+        self.data_cache = data_cache
+        self.socketio = socketio
+        self.namespace = namespace
+        self.jobs = BoundedStore(Config.ANALYSIS_JOB_CACHE_SIZE)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, Config.ANALYSIS_JOB_CONCURRENCY),
+                                            thread_name_prefix='analysis-job')
+        self._active = 0
+        self._avg_seconds = None  # 任务耗时的指数移动平均，用于估计Retry-After
+        self._lock = threading.Lock()
+
+    def submit(self, data, sid=None):
+        """提交任务，返回任务快照；sid为WebSocket客户端时将其加入该任务的房间以接收推送"""
+        with self._lock:
+            if self._active >= Config.ANALYSIS_JOB_LIMIT:
+                raise PoolSaturated(self._retry_after())
+            self._active += 1
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'progress': 0.0,
+            'stage': None,
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'duration_ms': None,
+            'error': None,
+            'result': None
+        }
+        self.jobs.put(job['job_id'], job)
+        if sid is not None:
+            self.subscribe(job['job_id'], sid)
+        try:
+            self._executor.submit(self._run, job, dict(data))
+        except Exception:
+            with self._lock:
+                self._active -= 1
+            raise
+        logger.info(f"Analysis job {job['job_id']} queued")
+        return self.snapshot(job)
+
+    def get(self, job_id, include_result=True):
+        job = self.jobs.get(job_id)
+        return None if job is None else self.snapshot(job, include_result)
+
+    def subscribe(self, job_id, sid):
+        """把WebSocket客户端加入任务房间；任务已结束时直接补发完成通知"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        join_room(job_room(job_id), sid=sid, namespace=self.namespace)
+        snapshot = self.snapshot(job, include_result=False)
+        if snapshot['status'] in FINISHED_STATUSES and self.socketio is not None:
+            self.socketio.emit('analysis_job_complete', snapshot, to=sid, namespace=self.namespace)
+        return snapshot
+
+    @staticmethod
+    def snapshot(job, include_result=True):
+        snapshot = dict(job)
+        if not include_result:
+            snapshot.pop('result')
+        return snapshot
+
+    def _run(self, job, data):
+        progress = stage_progress(data)
+
+        def on_span(name, seconds):
+            position = progress.get(name)
+            if position is None or position <= job['progress']:
+                return
+            job['progress'] = round(position, 3)
+            job['stage'] = name
+            self._emit('analysis_job_progress', job)
+
+        job['status'] = 'running'
+        job['started_at'] = datetime.now().isoformat()
+        self._emit('analysis_job_progress', job)
+        start = time.perf_counter()
+        try:
+            with span_listener(on_span):
+                result, _ = self._analyze(data)
+            job.update(result=result, progress=1.0, status='succeeded')
+        except AnalysisError as e:
+            job.update(error=e.to_response(), status='failed')
+        except JobTimeout:
+            job.update(error={'error': 'Analysis timed out', 'detail': {'message': '路径分析超时'}}, status='failed')
+        except Exception as e:
+            logger.error(f"Error in analysis job {job['job_id']}: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            job.update(error={'error': 'Analysis failed', 'detail': {'message': '路径分析失败'}}, status='failed')
+        finally:
+            seconds = time.perf_counter() - start
+            job['finished_at'] = datetime.now().isoformat()
+            job['duration_ms'] = round(seconds * 1000, 2)
+            with self._lock:
+                self._active -= 1
+                self._avg_seconds = seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * seconds
+        logger.info(f"Analysis job {job['job_id']} {job['status']} in {seconds:.2f} seconds")
+        self._emit('analysis_job_complete', job)
+
+    def _analyze(self, data):
+        """进程池已满时（同步接口占满了工作进程）等待后重试，任务本身已经在排队"""
+        while True:
+            try:
+                return self.data_cache.run_analysis(build_path_response, data)
+            except PoolSaturated as e:
+                time.sleep(e.retry_after)
+
+    def _emit(self, event, job):
+        if self.socketio is None:
+            return
+        try:
+            self.socketio.emit(event, self.snapshot(job, include_result=False),
+                               to=job_room(job['job_id']), namespace=self.namespace)
+        except Exception as e:
+            logger.error(f"Error pushing analysis job {job['job_id']}: {e}")
+
+    def _retry_after(self):
+        """按平均耗时估计一批并发任务完成所需的秒数（调用方持有锁）"""
+        average = self._avg_seconds if self._avg_seconds is not None else 1.0
+        waves = self._active / max(1, Config.ANALYSIS_JOB_CONCURRENCY)
+        return max(1, int(math.ceil(average * waves)))
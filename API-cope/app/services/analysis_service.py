@@ -1,40 +1,32 @@
 import pandas as pd
-from datetime import datetime
-from app.utils.logger import logger
+from app.utils.tracing import traced
 
+
+def _to_microseconds(value):
+    timestamp = pd.to_datetime(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return int(timestamp.value // 1000)
+
+
+@traced()
 def get_analysis_trends_data(data_cache, trend_type='week', start_date=None, end_date=None):
     """Get analysis trends data"""
     if not data_cache.transactions or not data_cache.last_update:
         data_cache.load_data()
 
-    df = pd.DataFrame(data_cache.transactions)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-
+    start_us = end_us = None
     if start_date and end_date:
-        start = pd.to_datetime(start_date)
-        end = pd.to_datetime(end_date)
-        df = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
-
-    if trend_type == 'week':
-        df['time_group'] = df['timestamp'].dt.strftime('%Y-%m-%d')
-        time_format = '%m-%d'
-    else:  # month
-        df['time_group'] = df['timestamp'].dt.strftime('%Y-%m')
-        time_format = '%Y-%m'
-
-    daily_stats = df.groupby('time_group').agg({
-        'amount': 'count',
-        'risk_score': lambda x: (
-            sum(x > 0.8),
-            sum((x > 0.6) & (x <= 0.8)),
-            len(x)
-        )
-    }).reset_index()
-
-    dates = daily_stats['time_group'].tolist()
-    high_risk = [x[0] for x in daily_stats['risk_score']]
-    suspicious = [x[1] for x in daily_stats['risk_score']]
-    total = daily_stats['amount'].tolist()
+        start_us = _to_microseconds(start_date)
+        end_us = _to_microseconds(end_date)
+
+    period = 'day' if trend_type == 'week' else 'month'
+    rows = data_cache.transaction_store.risk_trend(period, high=0.8, low=0.6, start_us=start_us, end_us=end_us)
+
+    dates = [label for label, _, _, _ in rows]
+    high_risk = [high for _, _, high, _ in rows]
+    suspicious = [mid for _, _, _, mid in rows]
+    total = [count for _, count, _, _ in rows]
 
     return {
         'xAxis': dates,
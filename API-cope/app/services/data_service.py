@@ -1,74 +1,76 @@
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from app.utils.alert_store import STATUSES
 from app.utils.logger import logger
+from app.utils.tracing import traced
 
+DAY_US = 24 * 3600 * 1000000
+
+
+def _day_start_us(day):
+    """某天零点（不带时区）的微秒时间戳，与存储中的timestamp_us一致"""
+    return int(pd.Timestamp(day).value // 1000)
+
+
+@traced()
 def get_dashboard_statistics(data_cache):
     if not data_cache.transactions or not data_cache.last_update:
         data_cache.load_data()
 
     current_time = datetime.now()
     today = current_time.date()
-    yesterday = (current_time - timedelta(days=1)).date()
+    today_start = _day_start_us(today)
+    yesterday_start = today_start - DAY_US
+    store = data_cache.transaction_store
 
-    df = pd.DataFrame(data_cache.transactions)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-    recent_df = df[df['timestamp'].dt.date >= yesterday]
-    today_data = recent_df[recent_df['timestamp'].dt.date == today]
-    yesterday_data = recent_df[recent_df['timestamp'].dt.date == yesterday]
-
-    today_risk = len(today_data[today_data['risk_score'] > 0.7])
-    yesterday_risk = len(yesterday_data[yesterday_data['risk_score'] > 0.7])
+    today_risk = store.count(start_us=today_start, end_us=today_start + DAY_US - 1, risk_above=0.7)
+    yesterday_risk = store.count(start_us=yesterday_start, end_us=today_start - 1, risk_above=0.7)
     risk_change = ((today_risk - yesterday_risk) / (yesterday_risk or 1)) * 100
 
     # Calculate accuracy
-    accuracy = calculate_accuracy(recent_df)
+    accuracy = calculate_accuracy(*store.fraud_agreement(yesterday_start, threshold=0.7))
 
     # Calculate alerts
-    pending_alerts = calculate_pending_alerts(data_cache.alerts, yesterday)
+    pending_alerts = calculate_pending_alerts(data_cache.alert_store, yesterday_start, today_start)
 
     # Calculate suspicious groups
-    suspicious_groups = len(
-        recent_df[recent_df['risk_score'] > 0.8].groupby('nameOrig').filter(lambda x: len(x) > 5))
+    suspicious_groups = store.clustered_high_risk(yesterday_start, risk_above=0.8, min_count=5)
 
     return format_dashboard_stats(today_risk, risk_change, accuracy, pending_alerts, suspicious_groups)
 
+@traced()
 def get_trend_statistics(data_cache):
     if not data_cache.transactions or not data_cache.last_update:
         data_cache.load_data()
 
-    df = pd.DataFrame(data_cache.transactions)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    store = data_cache.transaction_store
+    time_range = store.time_range()
+    if time_range is None:
+        return calculate_trend_data([])
 
-    end_date = df['timestamp'].max()
-    start_date = end_date - timedelta(days=6)
-    mask = (df['timestamp'] >= start_date) & (df['timestamp'] <= end_date)
-    recent_df = df[mask]
-
-    return calculate_trend_data(recent_df)
+    end_us = time_range[1]
+    start_us = end_us - 6 * DAY_US
+    return calculate_trend_data(store.risk_trend('day', high=0.7, low=0.5, start_us=start_us, end_us=end_us))
 
+@traced()
 def get_risk_distribution_data(data_cache):
     if not data_cache.transactions or not data_cache.last_update:
         data_cache.load_data()
 
-    df = pd.DataFrame(data_cache.transactions)
-    risk_counts = df['risk_type'].value_counts()
-    total = risk_counts.sum()
-    distribution_percentage = (risk_counts / total * 100).round(2)
+    risk_counts = data_cache.transaction_store.risk_type_counts()
+    total = sum(risk_counts.values())
 
     return {
-        'labels': distribution_percentage.index.tolist(),
-        'data': distribution_percentage.values.tolist()
+        'labels': list(risk_counts.keys()),
+        'data': [round(count / total * 100, 2) for count in risk_counts.values()]
     }
 
 # Helper functions
-def calculate_accuracy(df):
+def calculate_accuracy(matches, total):
     try:
-        if 'isFraud' in df.columns and len(df) > 0:
-            y_true = df['isFraud'].astype(int)
-            y_pred = (df['risk_score'] > 0.7).astype(int)
-            accuracy = (y_true == y_pred).mean() * 100
-            logger.info(f"Calculated accuracy: {accuracy}% from {len(df)} transactions")
+        if total > 0:
+            accuracy = matches / total * 100
+            logger.info(f"Calculated accuracy: {accuracy}% from {total} transactions")
             if accuracy == 0 or pd.isna(accuracy):
                 accuracy = 99.9
         else:
@@ -78,11 +80,10 @@ def calculate_accuracy(df):
         accuracy = 99.9
     return accuracy
 
-def calculate_pending_alerts(alerts, yesterday):
-    pending_alerts = sum(1 for a in alerts if a['status'] == 'pending')
-    yesterday_pending = sum(1 for a in alerts
-                          if a['status'] == 'pending' and
-                          datetime.fromisoformat(a['timestamp']).date() == yesterday)
+def calculate_pending_alerts(alert_store, yesterday_start, today_start):
+    pending = STATUSES['pending']
+    pending_alerts = alert_store.count(status=pending)
+    yesterday_pending = alert_store.count(status=pending, start_us=yesterday_start, end_us=today_start - 1)
     alert_change = ((pending_alerts - yesterday_pending) / (yesterday_pending or 1)) * 100
     return pending_alerts, alert_change
 
@@ -119,24 +120,17 @@ def format_dashboard_stats(today_risk, risk_change, accuracy, pending_alerts_dat
         }
     }
 
-def calculate_trend_data(df):
-    daily_stats = df.groupby(df['timestamp'].dt.date).agg({
-        'risk_score': lambda x: (
-            sum(x > 0.7),
-            sum((x > 0.5) & (x <= 0.7)),
-            sum(x > 0.5)
-        )
-    }).reset_index()
-
+def calculate_trend_data(rows):
+    """rows为存储返回的按天统计 [(日期, 交易数, 风险>0.7, 0.5<风险<=0.7)]"""
     weekday_map = {
         0: '周一', 1: '周二', 2: '周三',
         3: '周四', 4: '周五', 5: '周六', 6: '周日'
     }
 
-    dates = daily_stats['timestamp'].tolist()
-    high_risk = [x[0] for x in daily_stats['risk_score']]
-    suspicious = [x[1] for x in daily_stats['risk_score']]
-    total_alerts = [x[2] for x in daily_stats['risk_score']]
+    dates = [datetime.strptime(label, '%Y-%m-%d').date() for label, _, _, _ in rows]
+    high_risk = [high for _, _, high, _ in rows]
+    suspicious = [mid for _, _, _, mid in rows]
+    total_alerts = [high + mid for _, _, high, mid in rows]
 
     return {
         'xAxis': [weekday_map[d.weekday()] for d in dates],
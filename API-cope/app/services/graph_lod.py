@@ -0,0 +1,217 @@
+import uuid
+import numpy as np
+from app.config.config import Config
+from app.services.graph_service import run_path_analysis
+from app.utils.bounded_store import BoundedStore
+from app.utils.graph_arrays import build_csr, label_propagation
+from app.utils.optimize import HIGH_RISK_THRESHOLD, aggregate_groups, index_graph
+from app.utils.serialization import dumps
+from app.utils.tracing import traced
+
+# 最近的分层视图，展开社区/聚合节点时直接从这里读取，不需要重新分析
+lod_views = BoundedStore(Config.LOD_CACHE_SIZE)
+
+
+def _column(items, key, dtype=np.float64):
+    return np.fromiter((item.get(key, 0) for item in items), dtype=dtype, count=len(items))
+
+
+def run_lod_analysis(data_cache, data, deadline=None):
+    """路径分析并构建分层视图，作为一个整体交给 DataCache.run_analysis 执行"""
+    result = run_path_analysis(data_cache, data, deadline)
+    result.pop('empty', False)
+    view = build_lod_view(result, data.get('chunk_size'))
+    if 'deadline' in result:
+        view['summary']['deadline'] = result['deadline']
+    return view
+
+
+@traced()
+def build_lod_view(result, chunk_size=None):
+    """
+    根据 run_path_analysis 的结果构建分层视图：
+    社区划分、社区级摘要，以及按风险优先级排好序的节点/边分块
+    """
+    chunk_size = max(1, int(chunk_size or Config.LOD_CHUNK_SIZE))
+    nodes = list({node['id']: node for node in result['nodes']}.values())
+    edges = result['edges']
+    node_index, src, dst, _ = index_graph(nodes, edges)
+    num_nodes = len(node_index)
+    num_listed = len(nodes)
+
+    indptr, indices = build_csr(src, dst, num_nodes, symmetric=True)
+    community = label_propagation(indptr, indices)[:num_listed]
+    num_communities = int(community.max()) + 1 if num_listed else 0
+
+    risk = _column(nodes, 'risk_score')
+    max_risk = np.zeros(num_communities)
+    np.maximum.at(max_risk, community, risk)
+    sizes = np.bincount(community, minlength=num_communities)
+
+    # 风险最高的社区优先，社区内按节点风险降序
+    community_rank = np.empty(num_communities, dtype=np.int64)
+    community_rank[np.lexsort((-sizes, -max_risk))] = np.arange(num_communities)
+    node_order = np.lexsort((-risk, community_rank[community]))
+    node_chunk = np.full(num_nodes, -1, dtype=np.int64)
+    node_chunk[node_order] = np.arange(num_listed) // chunk_size
+
+    # 每条边放在其两个端点都已发送的那个分块里；两个端点都不在节点列表中的边随最后一个分块发送
+    edge_risk = _column(edges, 'risk_score')
+    edge_chunk = np.maximum(node_chunk[src], node_chunk[dst])
+    num_chunks = int(node_chunk.max()) + 1 if num_listed else 0
+    unplaced = edge_chunk < 0
+    if unplaced.any():
+        num_chunks = max(num_chunks, 1)
+        edge_chunk[unplaced] = num_chunks - 1
+    edge_order = np.lexsort((-edge_risk, edge_chunk))
+
+    view = {
+        'analysis_id': uuid.uuid4().hex,
+        'chunk_size': chunk_size,
+        'paths': result.get('paths', []),
+        'gnn_info': result.get('gnn_info', {}),
+        'nodes': nodes,
+        'edges': edges,
+        'src': src,
+        'dst': dst,
+        'community': community,
+        'node_order': node_order,
+        'node_chunk': node_chunk,
+        'edge_order': edge_order,
+        'edge_chunk': edge_chunk,
+        'num_chunks': num_chunks,
+        'aggregates': aggregate_groups(nodes, edges)
+    }
+    view['summary'] = _build_summary(view, risk, max_risk, sizes, community_rank)
+    return view
+
+
+def _build_summary(view, risk, max_risk, sizes, community_rank):
+    nodes, community = view['nodes'], view['community']
+    num_communities = len(sizes)
+    values = np.bincount(community, weights=_column(nodes, 'value'), minlength=num_communities)
+    tx_counts = np.bincount(community, weights=_column(nodes, 'tx_count'), minlength=num_communities)
+    risk_sums = np.bincount(community, weights=risk, minlength=num_communities)
+    high_risk_counts = np.bincount(community, weights=risk >= HIGH_RISK_THRESHOLD, minlength=num_communities)
+
+    top_nodes = {}
+    for i in view['node_order']:
+        members = top_nodes.setdefault(int(community[i]), [])
+        if len(members) < 3:
+            members.append(nodes[i]['id'])
+
+    communities = []
+    for k in np.argsort(community_rank):
+        communities.append({
+            'id': f"community_{k}",
+            'community': int(k),
+            'node_count': int(sizes[k]),
+            'value': float(values[k]),
+            'tx_count': int(tx_counts[k]),
+            'avg_risk_score': round(float(risk_sums[k] / sizes[k]), 4),
+            'max_risk_score': round(float(max_risk[k]), 4),
+            'high_risk_count': int(high_risk_counts[k]),
+            'top_nodes': top_nodes.get(int(k), [])
+        })
+
+    # 社区之间的边按 (源社区, 目标社区) 合并
+    community_edges = []
+    num_listed = len(nodes)
+    src, dst, edges = view['src'], view['dst'], view['edges']
+    between = np.flatnonzero((src < num_listed) & (dst < num_listed))
+    if len(between) and num_communities:
+        cs = community[src[between]]
+        cd = community[dst[between]]
+        cross = cs != cd
+        between, cs, cd = between[cross], cs[cross], cd[cross]
+    if len(between) and num_communities:
+        keys, inverse = np.unique(cs * num_communities + cd, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        merged_values = np.bincount(inverse, weights=_column(edges, 'value')[between], minlength=len(keys))
+        merged_counts = np.bincount(inverse, minlength=len(keys))
+        merged_risks = np.zeros(len(keys))
+        np.maximum.at(merged_risks, inverse, _column(edges, 'risk_score')[between])
+        for k, key in enumerate(keys):
+            community_edges.append({
+                'source': f"community_{key // num_communities}",
+                'target': f"community_{key % num_communities}",
+                'value': float(merged_values[k]),
+                'risk_score': round(float(merged_risks[k]), 4),
+                'edge_count': int(merged_counts[k])
+            })
+
+    return {
+        'type': 'summary',
+        'analysis_id': view['analysis_id'],
+        'communities': communities,
+        'community_edges': community_edges,
+        'aggregates': [{'id': agg_id, 'node_count': len(members)}
+                       for agg_id, members in view['aggregates'].items()],
+        'paths': view['paths'],
+        'gnn_info': view['gnn_info'],
+        'stats': {
+            'node_count': num_listed,
+            'edge_count': len(edges),
+            'community_count': num_communities,
+            'chunk_count': view['num_chunks'],
+            'chunk_size': view['chunk_size']
+        }
+    }
+
+
+def iter_lod_chunks(view):
+    """按优先级依次产出节点/边分块"""
+    nodes, edges = view['nodes'], view['edges']
+    node_order, edge_order = view['node_order'], view['edge_order']
+    chunk_size = view['chunk_size']
+    edge_bounds = np.searchsorted(view['edge_chunk'][edge_order], np.arange(view['num_chunks'] + 1))
+    for chunk in range(view['num_chunks']):
+        chunk_nodes = node_order[chunk * chunk_size:(chunk + 1) * chunk_size]
+        chunk_edges = edge_order[edge_bounds[chunk]:edge_bounds[chunk + 1]]
+        yield {
+            'type': 'chunk',
+            'analysis_id': view['analysis_id'],
+            'index': chunk,
+            'nodes': [dict(nodes[i], community=int(view['community'][i])) for i in chunk_nodes],
+            'edges': [edges[i] for i in chunk_edges]
+        }
+
+
+def expand_community(view, community):
+    """返回单个社区的全部节点和社区内部的边"""
+    members = np.flatnonzero(view['community'] == community)
+    if len(members) == 0:
+        return None
+    inside = np.zeros(len(view['node_chunk']), dtype=bool)
+    inside[members] = True
+    src, dst = view['src'], view['dst']
+    internal = np.flatnonzero(inside[src] & inside[dst])
+    boundary = int(np.count_nonzero(inside[src] ^ inside[dst]))
+    return {
+        'analysis_id': view['analysis_id'],
+        'community': int(community),
+        'nodes': [view['nodes'][i] for i in members],
+        'edges': [view['edges'][i] for i in internal],
+        'boundary_edge_count': boundary
+    }
+
+
+def expand_aggregate(view, node_id):
+    """返回 agg_cat_* 聚合节点的成员以及与成员相连的边"""
+    members = view['aggregates'].get(node_id)
+    if members is None:
+        return None
+    member_ids = {node['id'] for node in members}
+    edges = [edge for edge in view['edges']
+             if edge['source'] in member_ids or edge['target'] in member_ids]
+    return {
+        'analysis_id': view['analysis_id'],
+        'node': node_id,
+        'nodes': members,
+        'edges': edges
+    }
+
+
+def to_ndjson_line(payload):
+    """NDJSON的一行，使用与JSON响应相同的序列化器"""
+    return dumps(payload) + b'\n'
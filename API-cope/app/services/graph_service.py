@@ -0,0 +1,401 @@
+import math
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from app.config.config import Config
+from app.utils.bounded_store import BoundedStore
+from app.utils.deadline import Deadline
+from app.utils.logger import logger
+from app.utils.optimize import optimize_fraud_detection_response
+from app.utils.tracing import record_span, span, traced
+
+# 最近的PageRank结果，按 (数据版本, 时间范围, 交易数上限) 缓存，时间不足时代替重新计算
+pagerank_cache = BoundedStore(Config.PAGERANK_CACHE_SIZE)
+
+# GNN增强中必须一起执行的阶段，剩余时间不够时整体跳过
+GNN_CORE_STAGES = ('gnn.prepare_graph_data', 'gnn.compute_embeddings', 'gnn.predict_node_risks')
+
+
+class AnalysisError(Exception):
+    """路径分析失败，携带返回给前端的错误信息和HTTP状态码"""
+
+    def __init__(self, error, message, status_code=500):
+        super().__init__(error)
+        self.error = error
+        self.message = message
+        self.status_code = status_code
+
+    def __reduce__(self):
+        # 在分析进程池的工作进程中抛出时需要序列化回父进程
+        return type(self), (self.error, self.message, self.status_code)
+
+    def to_response(self):
+        return {
+            'error': self.error,
+            'detail': {'message': self.message}
+        }
+
+
+def _node_transaction_stats(df):
+    """每个账户作为付款方或收款方的交易数、金额合计、平均风险分数和最近交易时间（自转账只计一次）"""
+    columns = ['amount', 'risk_score', 'timestamp']
+    orig = df[['nameOrig'] + columns].rename(columns={'nameOrig': 'node'})
+    dest = df.loc[df['nameDest'].astype(str) != df['nameOrig'].astype(str), ['nameDest'] + columns]
+    dest = dest.rename(columns={'nameDest': 'node'})
+    both = pd.concat([orig, dest], ignore_index=True)
+    both['node'] = both['node'].astype(str)
+    stats = both.groupby('node', sort=False).agg(
+        tx_count=('amount', 'size'),
+        total_amount=('amount', 'sum'),
+        risk_score=('risk_score', 'mean'),
+        last_transaction=('timestamp', 'max'))
+    return stats.to_dict('index')
+
+
+def _pagerank_key(data_cache, data):
+    return (str(data_cache.last_update), data.get('start_time'), data.get('end_time'),
+            data.get('max_transactions', 10000))
+
+
+def _high_risk_seeds(gnn_model):
+    """时间不足时DBSCAN只对GNN风险最高的节点聚类"""
+    seeds = [(node, risk) for node, risk in gnn_model.node_risks.items() if risk > Config.HIGH_RISK_THRESHOLD]
+    seeds.sort(key=lambda x: x[1], reverse=True)
+    return [node for node, _ in seeds[:Config.DEADLINE_DBSCAN_SEEDS]]
+
+
+def request_deadline(data):
+    try:
+        return Deadline.from_request(data)
+    except (TypeError, ValueError):
+        raise AnalysisError('Invalid deadline', 'deadline_ms 必须为正数', 400)
+
+
+@traced('graph.run_path_analysis')
+def run_path_analysis(data_cache, data, deadline=None):
+    """
+    执行交易网络路径分析，返回未裁剪的 paths/nodes/edges/gnn_info
+    过滤后没有交易时返回带 empty 标记的空结果
+    deadline（默认取请求体中的 deadline_ms）不足时跳过GNN或潜在边预测、DBSCAN只对高风险种子节点聚类、
+    PageRank使用缓存结果，跳过和降级的阶段记录在结果的 deadline 字段中
+    """
+    # networkx只在图分析路径上使用，延迟到首次请求时导入
+    import networkx as nx
+
+    start_time = data.get('start_time')
+    end_time = data.get('end_time')
+    max_transactions = data.get('max_transactions', 10000)
+    use_gnn = data.get('use_gnn', True)
+    if deadline is None:
+        deadline = request_deadline(data)
+    # 整个请求使用同一个模型实例，避免热替换时前后不一致
+    gnn_model = data_cache.gnn_model if use_gnn else None
+
+    try:
+        if not data_cache.transactions:
+            logger.info("Loading data cache...")
+            data_cache.load_data()
+
+        if not data_cache.transactions:
+            logger.error("No transactions data available")
+            raise AnalysisError('No data available', '没有可用的交易数据', 500)
+
+        with span('graph.load'):
+            df = data_cache.transactions_frame()
+        logger.info(f"Loaded {len(df)} transactions")
+
+    except AnalysisError:
+        raise
+    except Exception as e:
+        logger.error(f"Error loading data: {str(e)}")
+        raise AnalysisError('Data loading failed', '数据加载失败', 500)
+
+    try:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+        if start_time and end_time:
+            try:
+                start = pd.to_datetime(start_time)
+                end = pd.to_datetime(end_time)
+                df = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
+                logger.info(f"Filtered to {len(df)} transactions between {start} and {end}")
+            except Exception as e:
+                logger.error(f"Error parsing date range: {str(e)}")
+                end_date = datetime.now()
+                start_date = end_date - timedelta(days=30)
+                df = df[(df['timestamp'] >= start_date) & (df['timestamp'] <= end_date)]
+                logger.info(f"Using default date range: {len(df)} transactions between {start_date} and {end_date}")
+
+        if len(df) > max_transactions:
+            logger.warning(f"Limiting analysis to {max_transactions} transactions")
+
+            # 1. 保留所有高风险交易（风险分数 >= 0.7）
+            high_risk_df = df[df['risk_score'] >= 0.7]
+            remaining_df = df[df['risk_score'] < 0.7]
+
+            # 2. 如果高风险交易数量已经超过限制，只保留风险分数最高的部分
+            if len(high_risk_df) > max_transactions:
+                high_risk_df = high_risk_df.sort_values(['risk_score', 'amount'], ascending=[False, False]).head(max_transactions)
+                df = high_risk_df
+            else:
+                # 3. 在剩余空间中，按风险分数和时间戳排序选择其他交易
+                remaining_slots = max_transactions - len(high_risk_df)
+                if remaining_slots > 0:
+                    # 优先选择最近的可疑交易（风险分数 >= 0.4）
+                    suspicious_df = remaining_df[remaining_df['risk_score'] >= 0.4]
+                    normal_df = remaining_df[remaining_df['risk_score'] < 0.4]
+
+                    suspicious_sample_size = min(len(suspicious_df), int(remaining_slots * 0.7))  # 70%给可疑交易
+                    normal_sample_size = remaining_slots - suspicious_sample_size
+
+                    sampled_suspicious = suspicious_df.sort_values(['risk_score', 'timestamp'], ascending=[False, False]).head(suspicious_sample_size)
+                    sampled_normal = normal_df.sample(n=min(len(normal_df), normal_sample_size))  # 随机采样普通交易
+
+                    # 合并所有采样结果
+                    df = pd.concat([high_risk_df, sampled_suspicious, sampled_normal])
+
+            logger.info(f"Sampled {len(df)} transactions: {len(high_risk_df)} high risk, {len(df) - len(high_risk_df)} other")
+
+        if len(df) == 0:
+            logger.warning("No transactions found after filtering")
+            return {
+                'paths': [],
+                'nodes': [],
+                'edges': [],
+                'empty': True
+            }
+
+    except Exception as e:
+        logger.error(f"Error preprocessing data: {str(e)}")
+        raise AnalysisError('Data preprocessing failed', '数据预处理失败', 500)
+
+    try:
+        build_start = time.perf_counter()
+        G = nx.DiGraph()
+
+        for _, row in df.iterrows():
+            source = str(row['nameOrig'])
+            target = str(row['nameDest'])
+            amount = float(row.get('amount', 0))
+            risk_score = float(row.get('risk_score', 0))
+
+            G.add_edge(source, target,
+                       weight=amount,
+                       risk_score=risk_score)
+
+        record_span('graph.build', time.perf_counter() - build_start)
+        logger.info(f"Built graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges")
+
+        if use_gnn and gnn_model is not None and not deadline.allows(*GNN_CORE_STAGES):
+            # 不使用模型实例上一次请求留下的风险分数和聚类结果
+            logger.info("Skipping GNN enhancement: not enough time left")
+            deadline.skip('gnn')
+            gnn_model = None
+        if use_gnn and gnn_model is not None:
+            try:
+                logger.info("Enhancing graph with GNN model...")
+                pyg_data, G = gnn_model.prepare_graph_data(df, G)
+                gnn_model.compute_embeddings(pyg_data)
+                gnn_model.predict_node_risks(pyg_data)
+                if deadline.allows('gnn.predict_potential_edges'):
+                    gnn_model.predict_potential_edges(pyg_data, G, threshold=0.65)
+                else:
+                    deadline.skip('gnn.predict_potential_edges')
+                    gnn_model.potential_edges = []
+                if deadline.allows('gnn.cluster_similar_nodes'):
+                    gnn_model.cluster_similar_nodes(min_samples=3, eps=0.4)
+                else:
+                    deadline.degrade('gnn.cluster_similar_nodes', 'high_risk_seeds')
+                    gnn_model.cluster_similar_nodes(min_samples=3, eps=0.4, nodes=_high_risk_seeds(gnn_model))
+                G = gnn_model.enhance_graph(G)
+                logger.info("Graph enhanced with GNN model")
+            except Exception as e:
+                logger.error(f"Error enhancing graph with GNN: {str(e)}")
+                import traceback
+                logger.error(traceback.format_exc())
+
+    except Exception as e:
+        logger.error(f"Error building graph: {str(e)}")
+        raise AnalysisError('Graph building failed', '网络构建失败', 500)
+
+    try:
+        path_analysis_start = time.perf_counter()
+
+        high_risk_nodes = []
+
+        if use_gnn and gnn_model:
+            high_risk_nodes = [(node, risk) for node, risk in gnn_model.node_risks.items() if risk > 0.7]
+            high_risk_nodes.sort(key=lambda x: x[1], reverse=True)
+            high_risk_nodes = high_risk_nodes[:20]
+        else:
+            risk_scores = {}
+            for node in G.nodes():
+                out_risks = [G[node][succ].get('risk_score', 0) for succ in G.successors(node)]
+                if any(risk > 0.7 for risk in out_risks) and out_risks:
+                    avg_risk = sum(out_risks) / len(out_risks)
+                    risk_scores[node] = avg_risk
+
+            high_risk_nodes = sorted(risk_scores.items(), key=lambda x: x[1], reverse=True)[:20]
+
+        record_span('graph.high_risk_nodes', time.perf_counter() - path_analysis_start)
+        logger.info(f"Found {len(high_risk_nodes)} high risk nodes")
+
+        paths = []
+        with span('graph.node_stats'):
+            node_stats = _node_transaction_stats(df)
+
+        if high_risk_nodes:
+            try:
+                pagerank_key = _pagerank_key(data_cache, data)
+                cached_pagerank = pagerank_cache.get(pagerank_key)
+                if deadline.allows('graph.pagerank'):
+                    with span('graph.pagerank'):
+                        pagerank = nx.pagerank(G, weight='weight')
+                    pagerank_cache.put(pagerank_key, pagerank)
+                elif cached_pagerank is not None:
+                    deadline.degrade('graph.pagerank', 'cached')
+                    pagerank = {node: cached_pagerank.get(node, 0.0) for node in G.nodes()}
+                else:
+                    # 时间不足且没有缓存：按加权入度排序
+                    deadline.degrade('graph.pagerank', 'weighted_in_degree')
+                    pagerank = dict(G.in_degree(weight='weight'))
+
+                important_nodes = sorted(pagerank.items(),
+                                       key=lambda x: x[1],
+                                       reverse=True)[:10]
+
+                paths_start = time.perf_counter()
+
+                for node, _ in important_nodes:
+                    stats = node_stats.get(node)
+                    if stats is not None:
+                        risk_score = gnn_model.node_risks.get(node, float(
+                            stats['risk_score'])) if use_gnn and gnn_model else float(stats['risk_score'])
+
+                        paths.append({
+                            'account_id': node,
+                            'risk_score': risk_score,
+                            'total_amount': float(stats['total_amount']),
+                            'account_type': '商户' if str(node).startswith('M') else '个人',
+                            'last_transaction': stats['last_transaction'].isoformat()
+                        })
+
+                record_span('graph.paths', time.perf_counter() - paths_start)
+
+            except Exception as e:
+                logger.error(f"Error calculating pagerank: {str(e)}")
+
+        response_build_start = time.perf_counter()
+
+        nodes = []
+        edges = []
+        node_cache = {}
+
+        node_to_cluster = {}
+        if use_gnn and gnn_model:
+            for cluster_id, cluster_info in getattr(gnn_model, 'gnn_clusters', {}).items():
+                for member in cluster_info.get('members', []):
+                    node_to_cluster[member['node']] = cluster_id
+
+        for node in G.nodes():
+            stats = node_stats.get(node)
+            if stats is not None:
+                risk_score = gnn_model.node_risks.get(node, float(
+                    stats['risk_score'])) if use_gnn and gnn_model else float(stats['risk_score'])
+                tx_count = int(stats['tx_count'])
+                total_amount = float(stats['total_amount'])
+
+                gnn_cluster_id = node_to_cluster.get(node) if use_gnn and gnn_model else None
+
+                nodes.append({
+                    'id': node,
+                    'name': node,
+                    'value': total_amount,
+                    'tx_count': tx_count,
+                    'category': 0 if str(node).startswith('M') else 1,
+                    'risk_score': risk_score,
+                    'gnn_cluster': gnn_cluster_id,
+                    'symbolSize': min(50, 20 + math.log(tx_count + 1) * 5)
+                })
+
+        edge_limit = min(3000, G.number_of_edges())
+        edge_tuples = []
+        for u, v, data in G.edges(data=True):
+            is_potential = data.get('is_potential', False)
+            risk_score = float(data.get('risk_score', 0))
+            importance = risk_score * (2 if is_potential else 1)
+            edge_tuples.append((u, v, data, importance))
+
+        edge_tuples.sort(key=lambda x: x[3], reverse=True)
+
+        for u, v, data, _ in edge_tuples[:edge_limit]:
+            is_potential = data.get('is_potential', False)
+
+            edges.append({
+                'source': u,
+                'target': v,
+                'value': float(data.get('weight', 0)),
+                'risk_score': float(data.get('risk_score', 0)),
+                'is_potential': is_potential,
+                'similarity': float(data.get('similarity', 0)) if is_potential else 0
+            })
+
+        gnn_info = {}
+        if use_gnn and gnn_model:
+            clusters_summary = {}
+            for cluster_id, cluster_data in getattr(gnn_model, 'gnn_clusters', {}).items():
+                clusters_summary[cluster_id] = {
+                    'count': cluster_data.get('count', 0),
+                    'avg_risk_score': cluster_data.get('avg_risk_score', 0),
+                    'risk_level': cluster_data.get('risk_level', 'low'),
+                    'members': [{'node': m['node'], 'risk_score': m['risk_score']}
+                                for m in cluster_data.get('members', [])[:5]]
+                }
+
+            gnn_info = {
+                'clusters': clusters_summary,
+                'potential_edges_count': len(getattr(gnn_model, 'potential_edges', [])),
+                'node_embedding_dim': len(
+                    list(gnn_model.node_embeddings.values())[0]) if gnn_model.node_embeddings else 0
+            }
+
+        record_span('graph.response', time.perf_counter() - response_build_start)
+
+        result = {
+            'paths': paths,
+            'nodes': nodes,
+            'edges': edges,
+            'gnn_info': gnn_info
+        }
+        if deadline.expires_at is not None:
+            result['deadline'] = deadline.report()
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in path analysis: {str(e)}")
+        raise AnalysisError('Analysis failed', '路径分析失败', 500)
+
+
+def build_path_response(data_cache, data, deadline=None):
+    """
+    路径分析接口的完整计算：run_path_analysis 后按需裁剪响应，返回 (结果, 是否为空)
+    作为一个整体交给 DataCache.run_analysis，启用进程池时裁剪也在工作进程中完成
+    """
+    total_start_time = time.time()
+    if deadline is None:
+        deadline = request_deadline(data)
+    result = run_path_analysis(data_cache, data, deadline)
+    if result.pop('empty', False):
+        return result, True
+
+    paths, nodes, edges = result['paths'], result['nodes'], result['edges']
+    response_data = result
+    if not data.get('disable_optimization', False):
+        response_data = optimize_fraud_detection_response(paths, nodes, edges, result['gnn_info'])
+        if 'deadline' in result:
+            response_data['deadline'] = deadline.report()
+
+    total_time = time.time() - total_start_time
+    logger.info(
+        f"Analysis complete: {len(paths)} paths, {len(nodes)} nodes, {len(edges)} edges in {total_time:.2f} seconds")
+    return response_data, False
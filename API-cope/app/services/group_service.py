@@ -3,81 +3,92 @@ import numpy as np
 from datetime import datetime
 from app.utils.logger import logger
 from app.config.config import Config
+from app.utils.tracing import traced
 
+HEATMAP_DAYS = ['周日', '周一', '周二', '周三', '周四', '周五', '周六']
+US_PER_HOUR = 3600 * 1000000
+
+
+def _to_microseconds(value):
+    timestamp = pd.to_datetime(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return int(timestamp.value // 1000)
+
+
+def _base_selection(index, start_date=None, end_date=None, account=None):
+    """日期范围和账户条件对应的位图"""
+    selection = index.all()
+    if start_date and end_date:
+        selection = selection & index.between('timestamp', _to_microseconds(start_date), _to_microseconds(end_date))
+        logger.info(f"Filtered data by date range: {selection.cardinality()} transactions")
+    if account:
+        selection = selection & (index.equals('nameOrig', account) | index.equals('nameDest', account))
+    return selection
+
+
+def _selection_frame(index, selection):
+    """只把命中的交易还原为DataFrame"""
+    positions = selection.to_indices()
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(index.values('timestamp')[positions], unit='us'),
+        'type': index.decode('type', positions),
+        'amount': index.values('amount')[positions],
+        'nameOrig': index.values('nameOrig')[positions],
+        'nameDest': index.values('nameDest')[positions],
+        'risk_score': index.values('risk_score')[positions]
+    })
+
+
+@traced()
 def get_group_heatmap_data(data_cache, min_risk=0.5, min_amount=1000, start_date=None, end_date=None, account=None):
-    """Get group heatmap data"""
+    """
+    Get group heatmap data
+    筛选条件在交易位图索引上求交/并，只对命中的交易按 星期*24+小时 做bincount
+    """
     if not data_cache.transactions or not data_cache.last_update:
         logger.info("Loading data cache...")
         data_cache.load_data()
 
-    df = pd.DataFrame(data_cache.transactions)
-    if len(df) == 0 or 'timestamp' not in df.columns:
+    index = data_cache.transaction_index
+    if len(index) == 0:
         logger.error("No valid data found in dataset")
         return {
             'error': '没有找到有效的交易数据'
         }
 
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-    if start_date and end_date:
-        start = pd.to_datetime(start_date)
-        end = pd.to_datetime(end_date)
-        df = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
-        logger.info(f"Filtered data by date range: {len(df)} transactions")
-
+    selection = _base_selection(index, start_date, end_date, account)
     if account:
-        logger.info(f"Filtering data for account: {account}")
-        df = df[(df['nameOrig'] == account) | (df['nameDest'] == account)]
-        logger.info(f"Found {len(df)} transactions for account {account}")
-
-        if len(df) == 0:
+        logger.info(f"Found {selection.cardinality()} transactions for account {account}")
+        if not selection:
             logger.error(f"No transactions found for account {account}")
             return {
                 'error': f'未找到账户 {account} 的交易记录'
             }
 
-    high_risk_txs = df[(df['risk_score'] >= min_risk) | (df['amount'] >= min_amount)]
-    logger.info(f"Found {len(high_risk_txs)} transactions matching risk criteria")
+    high_risk = selection & (index.at_least('risk_score', min_risk) | index.at_least('amount', min_amount))
+    logger.info(f"Found {high_risk.cardinality()} transactions matching risk criteria")
 
-    if len(high_risk_txs) == 0:
+    hour_labels = [f"{h:02d}" for h in range(24)]
+    if not high_risk:
         logger.warning("No transactions match the risk criteria")
         return {
-            'hours': [f"{h:02d}" for h in range(24)],
-            'days': ['周日', '周一', '周二', '周三', '周四', '周五', '周六'],
+            'hours': hour_labels,
+            'days': HEATMAP_DAYS,
             'values': [[0] * 24 for _ in range(7)],
             'max_value': 1
         }
 
-    high_risk_txs['weekday'] = high_risk_txs['timestamp'].dt.weekday
-    high_risk_txs['hour'] = high_risk_txs['timestamp'].dt.hour
-
-    heatmap_data = high_risk_txs.groupby(['weekday', 'hour']).agg({
-        'amount': 'count',
-        'risk_score': 'mean'
-    }).reset_index()
-
-    hours = list(range(24))
-    days = list(range(7))
-    heatmap_matrix = []
-
-    for day in days:
-        day_data = []
-        for hour in hours:
-            data = heatmap_data[
-                (heatmap_data['weekday'] == day) &
-                (heatmap_data['hour'] == hour)
-            ]
-            if not data.empty:
-                count = int(data['amount'].iloc[0])
-                risk = float(data['risk_score'].iloc[0])
-                value = int(count * (1 + risk))
-            else:
-                value = 0
-            day_data.append(value)
-        heatmap_matrix.append(day_data)
-
-    day_labels = ['周日', '周一', '周二', '周三', '周四', '周五', '周六']
-    hour_labels = [f"{h:02d}" for h in hours]
+    positions = high_risk.to_indices()
+    hours = index.values('timestamp')[positions] // US_PER_HOUR
+    # 1970-01-01是周四；与pandas的weekday一致，周一为0
+    weekday = (hours // 24 + 3) % 7
+    cells = weekday * 24 + hours % 24
+    counts = np.bincount(cells, minlength=7 * 24)
+    risk_sums = np.bincount(cells, weights=index.values('risk_score')[positions], minlength=7 * 24)
+    mean_risk = np.divide(risk_sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+    heatmap_matrix = (counts * (1 + mean_risk)).astype(np.int64).reshape(7, 24).tolist()
+
     max_value = max(max(row) for row in heatmap_matrix)
     if max_value == 0:
         max_value = 1
@@ -85,60 +96,47 @@ def get_group_heatmap_data(data_cache, min_risk=0.5, min_amount=1000, start_date
     logger.info(f"Generated heatmap data with max_value={max_value}")
     return {
         'hours': hour_labels,
-        'days': day_labels,
+        'days': HEATMAP_DAYS,
         'values': heatmap_matrix,
         'max_value': int(max_value)
     }
 
-def get_group_behavior_radar_data(data_cache, account=None, start_date=None, end_date=None):
+@traced()
+def get_group_behavior_radar_data(data_cache, account=None, start_date=None, end_date=None,
+                                  min_risk=None, min_amount=None):
     """Get group behavior radar data"""
     if not data_cache.transactions or not data_cache.last_update:
         logger.info("No data in cache, attempting to load data...")
         data_cache.load_data()
 
-    df = pd.DataFrame(data_cache.transactions)
-    if len(df) == 0:
+    index = data_cache.transaction_index
+    if len(index) == 0:
         logger.warning("No transactions found in data cache")
-        return {
-            'dimensions': ['交易频率', '交易金额', '交易多样性', '风险评分', '关联账户'],
-            'values': [0, 0, 0, 0, 0],
-            'stats_info': {
-                '交易频率': '0笔/天',
-                '总交易额': '¥0.00',
-                '平均金额': '¥0.00',
-                '最大金额': '¥0.00',
-                '关联账户': '0个',
-                '风险评分': '0.00'
-            }
-        }
-
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-    if start_date and end_date:
-        start = pd.to_datetime(start_date)
-        end = pd.to_datetime(end_date)
-        df = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
-        logger.info(f"Filtered data by date range: {len(df)} transactions")
+        return get_empty_behavior_data()
 
+    selection = _base_selection(index, start_date, end_date, account)
     if account:
-        return get_account_behavior_data(df, account)
+        logger.info(f"Analyzing account: {account}")
+        return get_account_behavior_data(_selection_frame(index, selection), account)
     else:
-        return get_general_behavior_data(df)
+        return get_general_behavior_data(index, selection, min_risk, min_amount)
 
+@traced()
 def get_random_accounts_data(data_cache):
     """Get random account samples"""
     if not data_cache.transactions or not data_cache.last_update:
         logger.info("No data in cache, attempting to load data...")
         data_cache.load_data()
 
-    df = pd.DataFrame(data_cache.transactions)
-    if len(df) == 0:
+    index = data_cache.transaction_index
+    if len(index) == 0:
         logger.warning("No transactions found in the dataset")
         return {
             'error': '数据集中没有交易记录'
         }
 
-    customer_accounts = df[~df['nameOrig'].str.startswith('M')]['nameOrig'].unique()
+    # 付款方为客户（非M开头）的账户，按首次出现的顺序去重
+    customer_accounts = pd.unique(index.values('nameOrig')[index.equals('orig_kind', 'C').to_mask()])
     if len(customer_accounts) == 0:
         logger.warning("No customer accounts found in the dataset")
         return {
@@ -193,23 +191,19 @@ def get_account_behavior_data(df, account):
 
     return format_behavior_data(normalized_stats, stats_info)
 
-def get_general_behavior_data(df):
+def get_general_behavior_data(index, selection, min_risk=None, min_amount=None):
     """Get general behavior data for high risk transactions"""
-    min_risk = Config.HIGH_RISK_THRESHOLD
-    min_amount = Config.MAX_TRANSACTIONS
+    min_risk = Config.HIGH_RISK_THRESHOLD if min_risk is None else min_risk
+    min_amount = Config.MAX_TRANSACTIONS if min_amount is None else min_amount
 
-    high_risk_txs = df[
-        (df['risk_score'] >= min_risk) &
-        (df['amount'] >= min_amount)
-    ]
+    high_risk = selection & index.at_least('risk_score', min_risk) & index.at_least('amount', min_amount)
 
-    if len(high_risk_txs) == 0:
+    if not high_risk:
         min_risk = min_risk * 0.8
         min_amount = min_amount * 0.8
-        high_risk_txs = df[
-            (df['risk_score'] >= min_risk) &
-            (df['amount'] >= min_amount)
-        ]
+        high_risk = selection & index.at_least('risk_score', min_risk) & index.at_least('amount', min_amount)
+
+    high_risk_txs = _selection_frame(index, high_risk)
 
     daily_tx_counts = high_risk_txs.groupby(high_risk_txs['timestamp'].dt.date).size()
     avg_daily_freq = daily_tx_counts.mean() if not pd.isna(daily_tx_counts.mean()) else 0
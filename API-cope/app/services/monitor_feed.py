@@ -0,0 +1,181 @@
+import hashlib
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+from flask_socketio import join_room, leave_room
+from app.config.config import Config
+from app.services.monitor_service import render_monitor_alert, render_monitor_transaction
+from app.utils.logger import logger
+
+FEED_EVENTS = ('transactions', 'alerts', 'stats')
+
+
+def risk_level(score):
+    if score > Config.VERY_HIGH_RISK_THRESHOLD:
+        return 'high'
+    if score > Config.SUSPICIOUS_THRESHOLD:
+        return 'medium'
+    return 'low'
+
+
+def normalize_filters(data):
+    """订阅条件归一化，相同条件的客户端共享同一个房间和同一份计算结果"""
+    data = data or {}
+
+    def _values(key):
+        values = data.get(key) or []
+        if isinstance(values, str):
+            values = [values]
+        return tuple(sorted({str(value) for value in values}))
+
+    events = tuple(event for event in _values('events') if event in FEED_EVENTS) or FEED_EVENTS
+    return {
+        'events': events,
+        'risk_levels': _values('risk_levels'),
+        'accounts': _values('accounts'),
+        'types': _values('types')
+    }
+
+
+def _matches(filters, level, tx_type, source, target):
+    if filters['risk_levels'] and level not in filters['risk_levels']:
+        return False
+    if filters['types'] and tx_type not in filters['types']:
+        return False
+    if filters['accounts'] and source not in filters['accounts'] and target not in filters['accounts']:
+        return False
+    return True
+
+
+class MonitorFeed:
+    """
+    /ws/monitor 的增量推送：
+    数据写入时只入队，后台任务每个tick取出一批，按订阅条件分组各计算一次后推送到对应房间
+    待推送队列有上限，超出时丢弃最旧的数据并在下一批中告知客户端丢弃数量
+    """
+
+    def __init__(self, socketio, namespace='/ws/monitor', tick_seconds=None, max_pending=None, max_batch=None,
+                 stats=None):
+        self.socketio = socketio
+        self.stats = stats  # StreamingStats，推送时附带各滑动窗口的统计
+        self.namespace = namespace
+        self.tick_seconds = tick_seconds or Config.MONITOR_FEED_TICK
+        self.max_pending = max_pending or Config.MONITOR_FEED_MAX_PENDING
+        self.max_batch = max_batch or Config.MONITOR_FEED_MAX_BATCH
+        self._pending = deque()
+        self._dropped = 0
+        self._rooms = {}  # 房间名 -> {'filters': ..., 'members': set(sid)}
+        self._client_rooms = {}  # sid -> 房间名
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        self._task = None
+
+    def publish(self, records, alert_count=None):
+        """DataCache 的 ingest 监听器，只做入队，不阻塞写入方；预警在推送时由高风险交易渲染"""
+        with self._lock:
+            self._pending.extend(records)
+            overflow = len(self._pending) - self.max_pending
+            for _ in range(max(0, overflow)):
+                self._pending.popleft()
+            self._dropped += max(0, overflow)
+
+    def subscribe(self, sid, data):
+        filters = normalize_filters(data)
+        room = 'feed:' + hashlib.sha1(repr(sorted(filters.items())).encode('utf-8')).hexdigest()[:16]
+        self.unsubscribe(sid)
+        join_room(room, sid=sid, namespace=self.namespace)
+        with self._lock:
+            entry = self._rooms.setdefault(room, {'filters': filters, 'members': set()})
+            entry['members'].add(sid)
+            self._client_rooms[sid] = room
+        self.start()
+        return room, filters
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            room = self._client_rooms.pop(sid, None)
+            entry = self._rooms.get(room)
+            if entry is not None:
+                entry['members'].discard(sid)
+                if not entry['members']:
+                    del self._rooms[room]
+        if room is not None:
+            try:
+                leave_room(room, sid=sid, namespace=self.namespace)
+            except Exception:
+                # 客户端已断开时房间会被自动清理
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._client_rooms)
+
+    def start(self):
+        if self._task is None:
+            self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.tick_seconds)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in monitor feed tick: {e}")
+
+    def _drain(self):
+        with self._lock:
+            count = min(self.max_batch, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(count)]
+            dropped, self._dropped = self._dropped, 0
+            rooms = [(room, entry['filters']) for room, entry in self._rooms.items()]
+        return batch, dropped, rooms
+
+    def tick(self):
+        """取出一批数据，渲染一次，再按订阅条件过滤推送；返回推送的房间数"""
+        batch, dropped, rooms = self._drain()
+        if not rooms or (not batch and not dropped):
+            return 0
+
+        transactions = []
+        alerts = []
+        for record in batch:
+            rendered = render_monitor_transaction(record)
+            rendered['risk_type'] = record['risk_type']
+            rendered['risk_level'] = risk_level(rendered['risk_score'])
+            transactions.append(rendered)
+            if record['risk_score'] > Config.HIGH_RISK_THRESHOLD:
+                alerts.append(render_monitor_alert(record))
+        stats = {
+            'transaction_count': len(transactions),
+            'risk_transaction_count': sum(1 for tx in transactions if tx['risk_score'] > Config.HIGH_RISK_THRESHOLD),
+            'total_amount': float(sum(tx['amount'] for tx in transactions)),
+            'alert_count': len(alerts)
+        }
+        if self.stats is not None:
+            stats['windows'] = self.stats.snapshot_all()
+        base = {
+            'sequence': next(self._sequence),
+            'timestamp': datetime.now().isoformat(),
+            'dropped': dropped
+        }
+
+        emitted = 0
+        for room, filters in rooms:
+            payload = dict(base)
+            if 'transactions' in filters['events']:
+                payload['transactions'] = [
+                    tx for tx in transactions
+                    if _matches(filters, tx['risk_level'], tx['transaction_type'],
+                                tx['source_account'], tx['target_account'])]
+            if 'alerts' in filters['events']:
+                payload['alerts'] = [
+                    alert for alert in alerts
+                    if _matches(filters, risk_level(alert['risk_score']), alert['details']['transaction_type'],
+                                alert['details']['source_account'], alert['details']['target_account'])]
+            if 'stats' in filters['events']:
+                payload['stats'] = stats
+            if payload.get('transactions') or payload.get('alerts') or 'stats' in payload or dropped:
+                self.socketio.emit('feed', payload, to=room, namespace=self.namespace)
+                emitted += 1
+        return emitted
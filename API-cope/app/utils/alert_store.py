@@ -0,0 +1,328 @@
+import base64
+import os
+import sqlite3
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.utils.bitmap_index import BitmapIndex
+from app.utils.serialization import column_values
+
+ALERT_TEMPLATES = {
+    '身份盗用': [
+        "检测到身份盗用风险",
+        "身份验证异常",
+        "账户身份信息不一致"
+    ],
+    '大额交易': [
+        "发现大额可疑转账",
+        "大额交易风险提示",
+        "异常大额交易预警"
+    ],
+    '洗钱行为': [
+        "检测到洗钱行为风险",
+        "多层资金转移预警",
+        "复杂资金清洗路径"
+    ]
+}
+
+# 前端筛选使用英文取值，接口返回中文取值，两种都接受
+RISK_LEVELS = {'high': '高风险', 'medium': '中风险'}
+STATUSES = {'pending': '未处理', 'processing': '处理中', 'resolved': '已处理'}
+
+# 预警ID取哈希的低53位，保证在JavaScript中也是精确整数
+_ID_MASK = np.uint64((1 << 53) - 1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    time_us INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT '未处理',
+    handler TEXT NOT NULL DEFAULT '-',
+    process_method TEXT,
+    process_description TEXT,
+    process_time TEXT,
+    transaction_type TEXT,
+    amount REAL,
+    risk_score REAL,
+    source_account TEXT,
+    target_account TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_time ON alerts (time_us, id);
+CREATE INDEX IF NOT EXISTS idx_alerts_type ON alerts (type, time_us, id);
+CREATE INDEX IF NOT EXISTS idx_alerts_risk_level ON alerts (risk_level, time_us, id);
+CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts (status, time_us, id);
+"""
+
+_COLUMNS = ['id', 'time_us', 'time', 'type', 'title', 'description', 'risk_level',
+            'transaction_type', 'amount', 'risk_score', 'source_account', 'target_account']
+
+# 重新加载数据时只刷新交易相关字段，处理状态保持不变
+_UPSERT = f"""
+INSERT INTO alerts ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)})
+ON CONFLICT(id) DO UPDATE SET
+    {', '.join(f'{column} = excluded.{column}' for column in _COLUMNS[1:])}
+"""
+
+
+def encode_cursor(time_us, alert_id):
+    return base64.urlsafe_b64encode(f"{time_us}:{alert_id}".encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析分页游标，格式错误时抛出ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        time_us, alert_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii').split(':')
+        return int(time_us), int(alert_id)
+    except Exception:
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+
+def alert_ids(df, key_columns):
+    """由交易的关键字段计算稳定的预警ID，同一笔交易在重新加载后得到相同的ID"""
+    hashes = pd.util.hash_pandas_object(df[key_columns], index=False).to_numpy(np.uint64)
+    return (hashes & _ID_MASK).astype(np.int64)
+
+
+def build_alert_rows(df, key_columns, threshold):
+    """把高风险交易转换为预警行（按列计算，不逐行iterrows）"""
+    high_risk = df[df['risk_score'] > threshold]
+    if high_risk.empty:
+        return []
+    ids = alert_ids(high_risk, key_columns)
+    amount = high_risk['amount'].to_numpy(np.float64)
+    risk_score = high_risk['risk_score'].to_numpy(np.float64)
+    alert_types = np.select([amount > 500000, risk_score > 0.85], ['大额交易', '身份盗用'], '洗钱行为')
+    risk_levels = np.where(risk_score > 0.8, '高风险', '中风险')
+
+    timestamps = pd.to_datetime(high_risk['timestamp'])
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    time_us = timestamps.to_numpy('datetime64[us]').astype(np.int64)
+    times = column_values(timestamps)
+    tx_types = column_values(high_risk['type'])
+    sources = column_values(high_risk['nameOrig'])
+    targets = column_values(high_risk['nameDest'])
+
+    rows = []
+    for i in range(len(ids)):
+        alert_type = str(alert_types[i])
+        titles = ALERT_TEMPLATES[alert_type]
+        description = f"账户 {sources[i]} 向 {targets[i]} 发起 {tx_types[i]} 交易，"
+        description += f"金额 ¥{amount[i]:,.2f}，风险评分 {risk_score[i] * 100:.0f}"
+        rows.append((int(ids[i]), int(time_us[i]), times[i], alert_type, titles[int(ids[i]) % len(titles)],
+                     description, str(risk_levels[i]), tx_types[i], float(amount[i]), float(risk_score[i]),
+                     sources[i], targets[i]))
+    return rows
+
+
+class AlertStore:
+    """
+    持久化的预警存储（SQLite）
+    预警ID由交易内容哈希得到，重新加载数据时保留处理状态；
+    按 类型/风险等级/状态/时间 建立 (字段, time_us, id) 复合索引，
+    列表使用 (time_us, id) 游标做键集分页，深分页与第一页代价相同；
+    总数和分面计数由内存中的位图索引计算，与SQLite同步维护；
+    多个进程共用同一个数据库文件时，其他连接提交的修改通过 data_version 检测后重建索引
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _data_version(self):
+        return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _load_index(self):
+        self._index = BitmapIndex(categorical=('type', 'risk_level', 'status'), columns={'time_us': np.int64})
+        self._positions = {}  # 预警ID -> 位图中的位置
+        self._version = self._data_version()
+        rows = self._conn.execute("SELECT id, time_us, type, risk_level, status FROM alerts").fetchall()
+        if rows:
+            ids, time_us, types, risk_levels, statuses = (np.array(column) for column in zip(*rows))
+            self._index_alerts(ids, {'time_us': time_us, 'type': types, 'risk_level': risk_levels}, statuses)
+
+    def _index_alerts(self, ids, fields, statuses):
+        """把写入的预警同步到位图索引：已有ID更新字段，新ID追加"""
+        # 同一批中重复的ID以最后一条为准，与SQLite的upsert结果一致
+        _, last = np.unique(ids[::-1], return_index=True)
+        keep = np.sort(len(ids) - 1 - last)
+        statuses = np.broadcast_to(np.asarray(statuses), ids.shape)[keep]
+        ids = ids[keep]
+        fields = {field: values[keep] for field, values in fields.items()}
+        positions = np.fromiter((self._positions.get(alert_id, -1) for alert_id in ids.tolist()),
+                                dtype=np.int64, count=len(ids))
+        existing = positions >= 0
+        if existing.any():
+            self._index.update(positions[existing], {field: values[existing] for field, values in fields.items()})
+        new = ~existing
+        if new.any():
+            fields = {field: values[new] for field, values in fields.items()}
+            fields['status'] = statuses[new]
+            appended = self._index.append(fields)
+            self._positions.update(zip(ids[new].tolist(), appended.tolist()))
+
+    def _sync_index(self):
+        """其他进程修改过数据库时重新加载位图索引（本连接自己的提交不会改变data_version）"""
+        if self._data_version() != self._version:
+            self._load_index()
+
+    def upsert_transactions(self, df, key_columns, threshold=0.7):
+        """写入高风险交易对应的预警，返回写入条数"""
+        rows = build_alert_rows(df, key_columns, threshold)
+        if not rows:
+            return 0
+        columns = {name: np.array(values) for name, values in zip(_COLUMNS, zip(*rows))}
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, rows)
+            self._index_alerts(columns['id'], {field: columns[field] for field in ('time_us', 'type', 'risk_level')},
+                               STATUSES['pending'])
+        return len(rows)
+
+    def replace_transactions(self, df, key_columns, threshold=0.7):
+        """
+        全量加载后同步预警：写入高风险交易对应的预警，并删除不在其中的未处理预警
+        （风险分数含随机项，重新加载后不再超过阈值的交易不应继续计入预警；处理中和已处理的预警保留）
+        返回 (写入条数, 删除条数)
+        """
+        rows = build_alert_rows(df, key_columns, threshold)
+        columns = {name: np.array(values) for name, values in zip(_COLUMNS, zip(*rows))}
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_alerts (id INTEGER PRIMARY KEY)")
+            self._conn.execute("DELETE FROM current_alerts")
+            self._conn.executemany("INSERT OR IGNORE INTO current_alerts VALUES (?)", ((row[0],) for row in rows))
+            self._conn.executemany(_UPSERT, rows)
+            removed = self._conn.execute(
+                "DELETE FROM alerts WHERE status = ? AND id NOT IN (SELECT id FROM current_alerts)",
+                (STATUSES['pending'],)).rowcount
+            self._conn.execute("DELETE FROM current_alerts")
+            if removed:
+                # 位图索引不支持删除，重新建立
+                self._load_index()
+            elif rows:
+                self._index_alerts(columns['id'], {field: columns[field] for field in ('time_us', 'type', 'risk_level')},
+                                   STATUSES['pending'])
+        return len(rows), removed
+
+    def update_status(self, ids, status, handler='System', method=None, description=None, process_time=None):
+        """批量更新处理状态，返回实际更新的预警数"""
+        ids = [int(alert_id) for alert_id in ids]
+        if not ids:
+            return 0
+        process_time = process_time or datetime.now().isoformat()
+        updated = 0
+        with self._lock, self._conn:
+            # SQLite单条语句的参数个数有上限，分批更新
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor = self._conn.execute(
+                    f"UPDATE alerts SET status = ?, handler = ?, process_method = ?, process_description = ?, "
+                    f"process_time = ? WHERE id IN ({', '.join('?' for _ in chunk)})",
+                    [status, handler, method, description, process_time] + chunk)
+                updated += cursor.rowcount
+            positions = [self._positions[alert_id] for alert_id in ids if alert_id in self._positions]
+            self._index.update(positions, {'status': status})
+        return updated
+
+    @staticmethod
+    def _filters(alert_type=None, risk_level=None, status=None, start_us=None, end_us=None):
+        clauses = []
+        params = []
+        for column, value in (('type', alert_type), ('risk_level', risk_level), ('status', status)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start_us is not None:
+            clauses.append("time_us >= ?")
+            params.append(start_us)
+        if end_us is not None:
+            clauses.append("time_us <= ?")
+            params.append(end_us)
+        return clauses, params
+
+    @staticmethod
+    def _index_filters(alert_type=None, risk_level=None, status=None, start_us=None, end_us=None):
+        filters = {'type': alert_type or None, 'risk_level': risk_level or None, 'status': status or None}
+        if start_us is not None or end_us is not None:
+            filters['time_us'] = {'min': start_us, 'max': end_us}
+        return filters
+
+    def count(self, **filters):
+        """满足条件的预警总数，由位图索引计算，不扫描SQLite"""
+        with self._lock:
+            self._sync_index()
+            return self._index.count(self._index_filters(**filters))
+
+    def facets(self, **filters):
+        """
+        按 类型/风险等级/状态 的分面计数，计算某一字段时不应用该字段自身的条件
+        返回 {'total': 总数, 'type': {...}, 'risk_level': {...}, 'status': {...}}
+        """
+        index_filters = self._index_filters(**filters)
+        with self._lock:
+            self._sync_index()
+            total = self._index.count(index_filters)
+            counts = self._index.facets(index_filters)
+        defaults = {'type': ALERT_TEMPLATES, 'risk_level': RISK_LEVELS.values(), 'status': STATUSES.values()}
+        facets = {'total': total}
+        for field, values in counts.items():
+            facets[field] = {**{value: 0 for value in defaults[field]}, **values}
+        return facets
+
+    def query(self, limit=20, cursor=None, offset=None, **filters):
+        """
+        按时间倒序返回一页预警：(记录列表, 下一页游标)
+        cursor为上一页最后一条的 (time_us, id)；未提供游标时可用offset兼容页码分页
+        """
+        clauses, params = self._filters(**filters)
+        if cursor is not None:
+            clauses.append("(time_us, id) < (?, ?)")
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = f"SELECT * FROM alerts {where} ORDER BY time_us DESC, id DESC LIMIT ?"
+        params.append(limit)
+        if cursor is None and offset:
+            sql += " OFFSET ?"
+            params.append(offset)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        next_cursor = encode_cursor(rows[-1]['time_us'], rows[-1]['id']) if len(rows) == limit else None
+        return [_render(row) for row in rows], next_cursor
+
+    def __len__(self):
+        return self.count()
+
+
+def _render(row):
+    return {
+        'id': row['id'],
+        'time': row['time'],
+        'type': row['type'],
+        'title': row['title'],
+        'description': row['description'],
+        'riskLevel': row['risk_level'],
+        'status': row['status'],
+        'handler': row['handler'],
+        'details': {
+            'transaction_type': row['transaction_type'],
+            'amount': row['amount'],
+            'risk_score': row['risk_score'],
+            'source_account': row['source_account'],
+            'target_account': row['target_account']
+        }
+    }
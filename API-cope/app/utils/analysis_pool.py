@@ -0,0 +1,287 @@
+"""
+CPU密集型图分析的进程池
+路径分析（建图、GNN推理、PageRank、DBSCAN、响应裁剪）在请求线程中执行时会长时间占用GIL，
+threading模式下的SocketIO心跳和其他请求都会被拖慢；进程池把这些任务放到独立的工作进程中执行
+
+  - 任务不传递DataFrame，只传递共享数据平面中的代号（generation），工作进程以只读mmap方式挂载同一份数据
+  - 每个任务有超时时间，超时后终止执行该任务的工作进程，下次使用时重新启动
+  - 正在执行和排队的任务总数有上限，超出时抛出 PoolSaturated，接口返回503和Retry-After
+  - 工作进程中结束的span转发给父进程记录，Server-Timing 和 /metrics 与进程内执行时一致
+"""
+import math
+import multiprocessing
+import queue
+import threading
+import time
+from datetime import datetime
+from app.config.config import Config
+from app.models import configure_torch_threads
+from app.utils.data_plane import CURRENT, Generation, SharedTransactions, load_shared_gnn_model, read_current
+from app.utils.logger import logger
+from app.utils.model_registry import ModelRegistry
+from app.utils.tracing import record_span, span_listener
+
+
+class PoolSaturated(Exception):
+    """排队的任务已达上限；retry_after为建议的重试等待秒数"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'analysis pool saturated, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class JobTimeout(Exception):
+    """任务在超时时间内没有完成，执行它的工作进程已被终止"""
+
+
+class AnalysisContext:
+    """
+    工作进程中代替DataCache的只读上下文，提供分析函数用到的 transactions / last_update /
+    transactions_frame() / gnn_model；数据来自父进程指定的那一代共享数据
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.generation = None
+        self.transactions = []
+        self.last_update = None
+        self.model_registry = ModelRegistry(retry_backoff=Config.MODEL_RETRY_BACKOFF)
+        self._gnn_version = None
+
+    def use(self, name):
+        """切换到指定的一代；该代已被清理时使用CURRENT指向的最新一代"""
+        if self.generation is not None and self.generation.name == name:
+            return
+        try:
+            generation = Generation(self.directory, name)
+        except FileNotFoundError:
+            current = read_current(self.directory)
+            if current is None:
+                raise
+            logger.warning(f"Generation {name} was pruned, using {CURRENT} generation {current}")
+            if self.generation is not None and self.generation.name == current:
+                return
+            generation = Generation(self.directory, current)
+
+        self.transactions = SharedTransactions(generation.arrays('tx.'))
+        self.last_update = datetime.fromisoformat(generation.manifest['last_update'])
+        gnn = generation.manifest['models'].get('gnn')
+        if gnn is None:
+            self.model_registry = ModelRegistry(retry_backoff=Config.MODEL_RETRY_BACKOFF)
+            self._gnn_version = None
+        elif gnn['version'] != self._gnn_version:
+            weights = generation.arrays('gnn.')
+            self.model_registry.register('gnn', Config.GNN_MODEL_PATH,
+                                         lambda path: load_shared_gnn_model(path, weights))
+            self._gnn_version = gnn['version']
+        self.generation = generation
+
+    def load_data(self):
+        return self.generation is not None
+
+    def transactions_frame(self):
+        return self.transactions.frame()
+
+    @property
+    def gnn_model(self):
+        return self.model_registry.get('gnn')
+
+
+def _worker_main(conn, settings):
+    """工作进程主循环：接收 (函数, 代号, 参数)，返回 ('done', 结果) 或 ('error', 异常)"""
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    import logging
+    logging.getLogger().setLevel(getattr(logging, Config.LOG_LEVEL, logging.INFO))
+    configure_torch_threads()
+    context = AnalysisContext(Config.SHARED_DATA_DIR)
+
+    def forward_span(name, seconds):
+        conn.send(('span', name, seconds))
+
+    while True:
+        try:
+            func, generation, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            with span_listener(forward_span):
+                context.use(generation)
+                result = func(context, *args)
+            message = ('done', result)
+        except Exception as e:
+            message = ('error', e)
+        try:
+            conn.send(message)
+        except Exception as e:
+            # 结果或异常无法序列化时只返回错误信息
+            conn.send(('error', RuntimeError(f'{type(e).__name__}: {e}')))
+
+
+class _Worker:
+    def __init__(self, context, settings):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, settings),
+                                       name='analysis-worker', daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class AnalysisPool:
+    """
+    有界进程池，工作进程在首次需要时以spawn方式启动
+    run() 在调用线程中阻塞等待结果，同一时刻最多 workers 个任务执行、queue_limit 个任务排队
+    """
+
+    def __init__(self, workers, queue_limit=4, timeout=120.0, settings=None):
+        self.workers = max(1, int(workers))
+        self.queue_limit = max(0, int(queue_limit))
+        self.timeout = timeout
+        self.settings = settings or {}
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._pending = 0
+        self._avg_seconds = None  # 任务耗时的指数移动平均，用于估计Retry-After
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._closed = False
+
+    def run(self, func, generation, *args, timeout=None):
+        """
+        在工作进程中执行 func(context, *args)，context 为挂载了 generation 的 AnalysisContext
+        func 必须是可按名称导入的模块级函数；func抛出的异常原样重新抛出
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('analysis pool is closed')
+            if self._pending >= self.workers + self.queue_limit:
+                self._rejected += 1
+                raise PoolSaturated(self._retry_after())
+            self._pending += 1
+        deadline = time.monotonic() + timeout
+        try:
+            start = time.perf_counter()
+            worker = self._checkout(deadline)
+            record_span('analysis_pool.queue', time.perf_counter() - start)
+            start = time.perf_counter()
+            try:
+                status, result = self._execute(worker, (func, generation, args), deadline)
+            except BaseException:
+                self._discard(worker)
+                raise
+            self._idle.put(worker)
+            self._record(time.perf_counter() - start, status == 'done')
+        finally:
+            with self._lock:
+                self._pending -= 1
+        if status == 'error':
+            raise result
+        return result
+
+    def _checkout(self, deadline):
+        """取一个空闲的工作进程，不足 workers 个时启动新的，否则等待"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            spawn = self._started < self.workers
+            if spawn:
+                self._started += 1
+        if spawn:
+            try:
+                return _Worker(self._context, self.settings)
+            except BaseException:
+                with self._lock:
+                    self._started -= 1
+                raise
+        try:
+            return self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise JobTimeout('timed out waiting for an analysis worker')
+
+    def _execute(self, worker, task, deadline):
+        worker.conn.send(task)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._lock:
+                    self._timeouts += 1
+                raise JobTimeout('analysis did not finish before the deadline')
+            if not worker.conn.poll(min(remaining, 1.0)):
+                if not worker.process.is_alive():
+                    raise RuntimeError(f'analysis worker exited with code {worker.process.exitcode}')
+                continue
+            try:
+                message = worker.conn.recv()
+            except (EOFError, OSError):
+                raise RuntimeError('analysis worker exited unexpectedly')
+            if message[0] == 'span':
+                record_span(message[1], message[2])
+                continue
+            return message
+
+    def _discard(self, worker):
+        """超时或异常退出的工作进程直接终止，下次需要时重新启动"""
+        worker.kill()
+        with self._lock:
+            self._started -= 1
+            self._failed += 1
+        logger.warning(f"Analysis worker {worker.process.pid} terminated")
+
+    def _record(self, seconds, ok):
+        with self._lock:
+            self._avg_seconds = seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * seconds
+            self._completed += 1
+            if not ok:
+                self._failed += 1
+
+    def _retry_after(self):
+        """按平均耗时估计排在前面的任务完成所需的秒数（调用方持有锁）"""
+        average = self._avg_seconds if self._avg_seconds is not None else 1.0
+        waves = (self._pending - self.workers + 1) / self.workers
+        return max(1, int(math.ceil(average * waves)))
+
+    def status(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'started': self._started,
+                'idle': self._idle.qsize(),
+                'pending': self._pending,
+                'queue_limit': self.queue_limit,
+                'timeout': self.timeout,
+                'avg_seconds': self._avg_seconds,
+                'completed': self._completed,
+                'failed': self._failed,
+                'timeouts': self._timeouts,
+                'rejected': self._rejected
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.kill()
+
+
+def pool_settings():
+    """传给工作进程的配置：Config中所有可序列化的大写常量（含运行时修改的值）"""
+    return {name: value for name, value in vars(Config).items()
+            if name.isupper() and isinstance(value, (str, int, float, bool, type(None)))}
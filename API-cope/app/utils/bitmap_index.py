@@ -0,0 +1,368 @@
+import numpy as np
+
+# 风险分数和金额的分档边界，与风险评分、预警规则中使用的阈值一致
+RISK_BANDS = (0.5, 0.7, 0.8, 0.85)
+AMOUNT_BANDS = (1000, 10000, 100000, 500000, 1000000)
+
+_WORD = np.dtype('<u8')
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _nwords(size):
+    return (size + 63) // 64
+
+
+def popcount(words):
+    """统计一组64位字中置位的个数"""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(words).sum(dtype=np.int64))
+    return int(_POPCOUNT_TABLE[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+class Bitmap:
+    """
+    定长位图，按64位字存储（第i位 = 第i条记录），与或非运算逐字完成
+    words 可能比 size 需要的更长（预留容量），超出 size 的位始终为0
+    """
+
+    __slots__ = ('size', 'words')
+
+    def __init__(self, size, words=None):
+        self.size = size
+        self.words = np.zeros(_nwords(size), dtype=_WORD) if words is None else words
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        packed = np.packbits(mask, bitorder='little')
+        padded = np.zeros(_nwords(len(mask)) * 8, dtype=np.uint8)
+        padded[:len(packed)] = packed
+        return cls(len(mask), padded.view(_WORD))
+
+    @classmethod
+    def from_indices(cls, size, indices):
+        bitmap = cls(size)
+        bitmap.set(indices)
+        return bitmap
+
+    @classmethod
+    def full(cls, size):
+        return ~cls(size)
+
+    def _active(self, size=None):
+        """前 size 位对应的字，长度不足时补0"""
+        n = _nwords(self.size if size is None else size)
+        if len(self.words) >= n:
+            return self.words[:n]
+        words = np.zeros(n, dtype=_WORD)
+        words[:len(self.words)] = self.words
+        return words
+
+    def _binary(self, other, op):
+        size = max(self.size, other.size)
+        return Bitmap(size, op(self._active(size), other._active(size)))
+
+    def __and__(self, other):
+        return self._binary(other, np.bitwise_and)
+
+    def __or__(self, other):
+        return self._binary(other, np.bitwise_or)
+
+    def __xor__(self, other):
+        return self._binary(other, np.bitwise_xor)
+
+    def __sub__(self, other):
+        size = max(self.size, other.size)
+        return Bitmap(size, self._active(size) & ~other._active(size))
+
+    def __invert__(self):
+        words = ~self._active()
+        tail = self.size % 64
+        if tail:
+            words[-1] &= np.uint64((1 << tail) - 1)
+        return Bitmap(self.size, words)
+
+    def __len__(self):
+        return self.cardinality()
+
+    def __bool__(self):
+        return bool(self._active().any())
+
+    def cardinality(self):
+        return popcount(self._active())
+
+    def intersection_cardinality(self, other):
+        """与另一个位图交集的大小，不构造结果位图"""
+        n = _nwords(min(self.size, other.size))
+        return popcount(np.bitwise_and(self.words[:n], other.words[:n]))
+
+    def to_mask(self):
+        return np.unpackbits(self._active().view(np.uint8), count=self.size, bitorder='little').astype(bool)
+
+    def to_indices(self):
+        return np.flatnonzero(self.to_mask())
+
+    def grow(self, size):
+        """扩展到 size 位，新增位为0；容量不足时按倍数扩容"""
+        if size <= self.size:
+            return
+        n = _nwords(size)
+        if n > len(self.words):
+            words = np.zeros(max(n, 2 * len(self.words)), dtype=_WORD)
+            words[:len(self.words)] = self.words
+            self.words = words
+        self.size = size
+
+    def set(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions):
+            np.bitwise_or.at(self.words, positions >> 6, np.left_shift(np.uint64(1), (positions & 63).astype(np.uint64)))
+
+    def clear(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions):
+            bits = np.left_shift(np.uint64(1), (positions & 63).astype(np.uint64))
+            np.bitwise_and.at(self.words, positions >> 6, ~bits)
+
+
+def _stack(bitmaps, size):
+    """把一组位图的前 size 位堆叠为二维数组，每行一个位图"""
+    rows = [bitmap._active(size) for bitmap in bitmaps]
+    return np.stack(rows) if rows else np.zeros((0, _nwords(size)), dtype=_WORD)
+
+
+class _Column:
+    """可追加的原始值数组，按倍数扩容"""
+
+    def __init__(self, dtype):
+        self.dtype = np.dtype(dtype)
+        self.buffer = np.empty(0, dtype=self.dtype)
+        self.size = 0
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        end = self.size + len(values)
+        if end > len(self.buffer):
+            buffer = np.empty(max(end, 2 * len(self.buffer)), dtype=self.dtype)
+            buffer[:self.size] = self.buffer[:self.size]
+            self.buffer = buffer
+        self.buffer[self.size:end] = values
+        self.size = end
+
+    @classmethod
+    def wrap(cls, values):
+        """直接引用已有数组（如只读mmap），不复制"""
+        column = cls(values.dtype)
+        column.buffer = values
+        column.size = len(values)
+        return column
+
+    @property
+    def values(self):
+        return self.buffer[:self.size]
+
+
+class BitmapIndex:
+    """
+    多条件筛选的位图索引
+    - 分类字段：每个取值一个位图（交易类型、账户类型M/C、预警状态等）
+    - 数值字段：保存原始值，可选按分档边界为每档建立位图；
+      范围条件由完全落在范围内的档位直接合并，只对跨越边界的一档逐条比较
+    筛选条件之间为AND，同一字段的多个取值为OR，计数直接对位图做popcount，不生成记录
+    """
+
+    def __init__(self, categorical=(), numeric=None, columns=None):
+        """
+        categorical: 分类字段名
+        numeric: {字段名: 分档边界}，边界为空时只保存原始值
+        columns: {字段名: dtype}，只保存原始值、不建位图的字段（如账户名，用于等值筛选和聚合）
+        """
+        self.size = 0
+        self.categories = {field: {} for field in categorical}
+        self.bands = {field: np.asarray(edges, dtype=np.float64) for field, edges in (numeric or {}).items()}
+        self.band_bitmaps = {field: [Bitmap(0) for _ in range(len(edges) + 1)] for field, edges in self.bands.items()}
+        self.columns = {field: _Column(np.float64) for field in self.bands}
+        for field, dtype in (columns or {}).items():
+            self.columns[field] = _Column(dtype)
+
+    def __len__(self):
+        return self.size
+
+    def export(self):
+        """
+        导出为 (数组字典, 元数据)，用于发布到共享内存；
+        同一字段的位图堆叠为二维数组，对象类型的列转换为定长Unicode数组
+        """
+        arrays = {}
+        meta = {'size': self.size, 'categories': {}, 'bands': {}, 'columns': list(self.columns)}
+        for field, bitmaps in self.categories.items():
+            meta['categories'][field] = list(bitmaps)
+            arrays[f'cat.{field}'] = _stack(bitmaps.values(), self.size)
+        for field, bitmaps in self.band_bitmaps.items():
+            meta['bands'][field] = self.bands[field].tolist()
+            arrays[f'band.{field}'] = _stack(bitmaps, self.size)
+        for field in self.columns:
+            values = self.values(field)
+            arrays[f'col.{field}'] = values.astype(str) if values.dtype == object else values
+        return arrays, meta
+
+    @classmethod
+    def attach(cls, arrays, meta):
+        """由 export 的结果构造只读索引，位图和列直接引用给定数组（如mmap），不复制"""
+        index = cls()
+        size = meta['size']
+        for field, values in meta['categories'].items():
+            words = arrays[f'cat.{field}']
+            index.categories[field] = {value: Bitmap(size, words[i]) for i, value in enumerate(values)}
+        for field, edges in meta['bands'].items():
+            index.bands[field] = np.asarray(edges, dtype=np.float64)
+            index.band_bitmaps[field] = [Bitmap(size, words) for words in arrays[f'band.{field}']]
+        for field in meta['columns']:
+            index.columns[field] = _Column.wrap(arrays[f'col.{field}'])
+        index.size = size
+        return index
+
+    def append(self, data):
+        """
+        追加一批记录，data为 {字段名: 数组}，需包含所有字段；返回新记录的位置
+        先写入原始值和位图，最后再更新 size，并发读取只会看到完整写入的记录
+        """
+        count = len(next(iter(data.values()))) if data else 0
+        offset = self.size
+        size = offset + count
+        for field, column in self.columns.items():
+            column.append(data[field])
+        for bitmap in self._bitmaps():
+            bitmap.grow(size)
+
+        positions = np.arange(offset, size, dtype=np.int64)
+        for field in self.categories:
+            self._set_categories(field, positions, np.asarray(data[field]), size)
+        for field in self.bands:
+            self._set_bands(field, positions, self.columns[field].values[offset:size])
+        self.size = size
+        return positions
+
+    def _bitmaps(self):
+        for bitmaps in self.categories.values():
+            yield from bitmaps.values()
+        for bitmaps in self.band_bitmaps.values():
+            yield from bitmaps
+
+    def update(self, positions, data):
+        """修改已有记录的字段值，data为 {字段名: 数组或单个值}，只需包含要修改的字段"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if not len(positions):
+            return
+        for field, values in data.items():
+            values = np.broadcast_to(np.asarray(values), positions.shape)
+            if field in self.categories:
+                for bitmap in self.categories[field].values():
+                    bitmap.clear(positions)
+                self._set_categories(field, positions, values, self.size)
+            if field in self.columns:
+                self.columns[field].values[positions] = values
+            if field in self.bands:
+                for bitmap in self.band_bitmaps[field]:
+                    bitmap.clear(positions)
+                self._set_bands(field, positions, self.columns[field].values[positions])
+
+    def _set_categories(self, field, positions, values, size):
+        bitmaps = self.categories[field]
+        uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(uniques) + 1))
+        for i, value in enumerate(uniques):
+            value = str(value)
+            bitmap = bitmaps.get(value)
+            if bitmap is None:
+                bitmap = bitmaps[value] = Bitmap(size)
+            bitmap.set(positions[order[bounds[i]:bounds[i + 1]]])
+
+    def _set_bands(self, field, positions, values):
+        band = np.searchsorted(self.bands[field], values, side='right')
+        for i, bitmap in enumerate(self.band_bitmaps[field]):
+            bitmap.set(positions[band == i])
+
+    def values(self, field):
+        return self.columns[field].values[:self.size]
+
+    def decode(self, field, positions):
+        """分类字段在给定位置上的取值"""
+        labels = np.full(len(positions), None, dtype=object)
+        for value, bitmap in self.categories[field].items():
+            labels[bitmap.to_mask()[positions]] = value
+        return labels
+
+    def all(self):
+        return Bitmap.full(self.size)
+
+    def equals(self, field, value):
+        if field in self.categories:
+            bitmap = self.categories[field].get(str(value))
+            return self.all() & bitmap if bitmap is not None else Bitmap(self.size)
+        return Bitmap.from_mask(self.values(field) == value)
+
+    def any_of(self, field, values):
+        result = Bitmap(self.size)
+        for value in values:
+            result = result | self.equals(field, value)
+        return result
+
+    def at_least(self, field, threshold, strict=False):
+        """field >= threshold（strict时为 >）"""
+        values = self.values(field)
+        compare = np.greater if strict else np.greater_equal
+        edges = self.bands.get(field)
+        if edges is None or not len(edges):
+            return Bitmap.from_mask(compare(values, threshold))
+        # 阈值所在的档位逐条比较（阈值恰为该档下边界且非strict时整档满足），更高的档位整体满足
+        boundary = int(np.searchsorted(edges, threshold, side='right'))
+        bitmaps = self.band_bitmaps[field]
+        if not strict and boundary > 0 and edges[boundary - 1] == threshold:
+            result = Bitmap(self.size) | bitmaps[boundary]
+        else:
+            candidates = (bitmaps[boundary] & self.all()).to_indices()
+            result = Bitmap.from_indices(self.size, candidates[compare(values[candidates], threshold)])
+        for bitmap in bitmaps[boundary + 1:]:
+            result = result | bitmap
+        return self.all() & result
+
+    def between(self, field, low=None, high=None):
+        """low <= field <= high，任一端为None表示不限"""
+        result = self.at_least(field, low) if low is not None else self.all()
+        if high is not None:
+            result = result - self.at_least(field, high, strict=True)
+        return result
+
+    def evaluate(self, filters):
+        """
+        计算筛选条件对应的位图
+        filters: {字段名: 条件}，条件为单个取值、取值列表（OR）或 {'min': x, 'max': y}；值为None的条件忽略
+        """
+        result = self.all()
+        for field, condition in filters.items():
+            if condition is None:
+                continue
+            if isinstance(condition, dict):
+                result = result & self.between(field, condition.get('min'), condition.get('max'))
+            elif isinstance(condition, (list, tuple, set, frozenset)):
+                result = result & self.any_of(field, condition)
+            else:
+                result = result & self.equals(field, condition)
+        return result
+
+    def count(self, filters):
+        return self.evaluate(filters).cardinality()
+
+    def facets(self, filters, fields=None):
+        """
+        各分类字段每个取值的计数：{字段: {取值: 数量}}
+        计算某字段的分面时不应用该字段自身的条件，便于在界面上切换取值
+        """
+        facets = {}
+        for field in fields or self.categories:
+            selection = self.evaluate({key: value for key, value in filters.items() if key != field})
+            facets[field] = {value: selection.intersection_cardinality(bitmap)
+                             for value, bitmap in self.categories[field].items()}
+        return facets
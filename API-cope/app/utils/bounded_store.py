@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+
+class BoundedStore:
+    """
+    线程安全的有界LRU存储
+    超过容量时淘汰最久未访问的条目
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max(1, int(max_items))
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def keys(self):
+        with self._lock:
+            return list(self._items.keys())
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
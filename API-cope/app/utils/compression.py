@@ -0,0 +1,44 @@
+import gzip
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# 小于该大小的响应不压缩，压缩收益抵不过开销
+MIN_COMPRESS_SIZE = 1024
+
+
+def negotiate_encoding(accept_encodings):
+    """
+    根据请求的 Accept-Encoding 选择压缩算法，优先 br，其次 gzip
+    accept_encodings 是 werkzeug 的 request.accept_encodings
+    """
+    if BROTLI_AVAILABLE and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5 if level is None else level)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6 if level is None else level)
+    return body
+
+
+def compress_response(response, accept_encodings):
+    """对已生成的Flask响应按需压缩，流式响应和已压缩的响应保持不变"""
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    body = response.get_data()
+    encoding = negotiate_encoding(accept_encodings)
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.headers.add('Vary', 'Accept-Encoding')
+    return response
@@ -1,13 +1,244 @@
+import csv
+import warnings
+from collections.abc import Sequence
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import networkx as nx
-from networkx.algorithms import community
+from pandas.api.types import union_categoricals
 from app.utils.logger import logger
-from app.models.gnn_utils import GNNModel
+from app.utils.alert_store import AlertStore
+from app.utils.analysis_pool import AnalysisPool, pool_settings
+from app.utils.bitmap_index import AMOUNT_BANDS, RISK_BANDS, BitmapIndex
+from app.utils.feature_pipeline import FEATURE_COLUMNS, FeatureScaler, build_features
+from app.utils.data_plane import (DataPlanePublisher, ReadOnlyDataError, SharedDataPlane, SharedTransactions,
+                                  csr_communities, csr_graph, load_shared_gnn_model, pin_generations)
+from app.utils.model_registry import ModelRegistry
+from app.utils.ring_buffer import RecentBuffer
+from app.utils.risk_subgraphs import RiskSubgraphs
+from app.utils.serialization import frame_records
+from app.utils.streaming_stats import StreamingStats
+from app.utils.tracing import span, traced
+from app.utils.transaction_store import create_transaction_store
 from app.config.config import Config
 import os
-import joblib
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+# load_data 从CSV读取的列及其数据类型：金额和余额保持float64（float32会改变接口返回的金额和预警ID），
+# 只压缩step、isFraud和字符串列
+TRANSACTION_COLUMNS = ['step', 'type', 'amount', 'nameOrig', 'oldbalanceOrg', 'newbalanceOrig',
+                       'nameDest', 'oldbalanceDest', 'newbalanceDest', 'isFraud']
+TRANSACTION_DTYPES = {
+    'step': 'int32',
+    'type': 'category',
+    'amount': 'float64',
+    'nameOrig': 'category',
+    'nameDest': 'category',
+    'oldbalanceOrg': 'float64',
+    'newbalanceOrig': 'float64',
+    'oldbalanceDest': 'float64',
+    'newbalanceDest': 'float64',
+    'isFraud': 'int8'
+}
+
+# 分块评分时需要的上下文：频率风险统计前24小时的交易，快进快出向后查找1小时内的交易
+RISK_CONTEXT_WINDOW = pd.Timedelta(hours=24)
+RISK_LOOKAHEAD_WINDOW = pd.Timedelta(hours=1)
+
+# 估计CSV每行字节数时读取的样本大小
+CSV_SAMPLE_BYTES = 1 << 20
+
+# 计算预警ID的交易字段：加载的数据用行号和step，实时写入的交易用时间戳
+ALERT_KEY_COLUMNS = ['index', 'step', 'type', 'amount', 'nameOrig', 'nameDest']
+INGEST_ALERT_KEY_COLUMNS = ['index', 'timestamp', 'type', 'amount', 'nameOrig', 'nameDest']
+
+# 使用 feature_pipeline 特征矩阵打分的模型
+FEATURE_MODELS = ('gbc', 'rf', 'mlp')
+
+# 环形缓冲区和增量推送使用的交易字段
+RECENT_COLUMNS = ['index', 'timestamp', 'type', 'amount', 'nameOrig', 'nameDest', 'risk_score', 'risk_type']
+
+
+def new_transaction_index():
+    """交易的位图索引，位置与 transactions 列表的下标一致"""
+    return BitmapIndex(
+        categorical=('type', 'risk_type', 'orig_kind', 'dest_kind'),
+        numeric={'risk_score': RISK_BANDS, 'amount': AMOUNT_BANDS},
+        columns={'timestamp': np.int64, 'nameOrig': object, 'nameDest': object}
+    )
+
+
+def transaction_index_columns(df):
+    """从交易DataFrame提取位图索引的字段；时间戳为微秒整数，账户类型取账户名首字母（M为商户，其余为客户）"""
+    timestamps = pd.to_datetime(df['timestamp'])
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    name_orig = df['nameOrig'].astype(str)
+    name_dest = df['nameDest'].astype(str)
+    return {
+        'type': df['type'].astype(str).to_numpy(),
+        'risk_type': df['risk_type'].astype(str).to_numpy(),
+        'orig_kind': np.where(name_orig.str.startswith('M'), 'M', 'C'),
+        'dest_kind': np.where(name_dest.str.startswith('M'), 'M', 'C'),
+        'risk_score': df['risk_score'].to_numpy(np.float64),
+        'amount': df['amount'].to_numpy(np.float64),
+        'timestamp': timestamps.to_numpy('datetime64[us]').astype(np.int64),
+        'nameOrig': name_orig.to_numpy(object),
+        'nameDest': name_dest.to_numpy(object)
+    }
+
+
+def graph_window(df):
+    """加载时建图和抽取风险子图使用的交易：时间最近的 GRAPH_MAX_TRANSACTIONS 条（未设置时为 MAX_TRANSACTIONS*2）"""
+    limit = Config.MAX_TRANSACTIONS * 2 if Config.GRAPH_MAX_TRANSACTIONS is None else Config.GRAPH_MAX_TRANSACTIONS
+    if len(df) <= limit:
+        return df
+    recent = np.argpartition(df['timestamp'].to_numpy(), len(df) - limit)[len(df) - limit:]
+    return df.iloc[np.sort(recent)]
+
+
+def read_csv_chunks(path, chunk_rows, max_rows=None):
+    """
+    分块读取交易CSV，每块约chunk_rows行，列类型为 TRANSACTION_DTYPES；max_rows为空时读取整个文件
+    安装了pyarrow时按估计的字节数切分文件，每块交给pyarrow的多线程CSV解析器，数值列直接解析为目标类型、
+    字符串列解析为字典编码（与pyarrow默认的 newlines_in_values=False 一致，假定字段内没有换行）；
+    否则使用pandas的分块读取
+    """
+    if not ARROW_AVAILABLE:
+        # round_trip与pyarrow一样得到最接近的float64，两种读取方式的金额（以及由金额计算的预警ID）一致
+        with pd.read_csv(path, usecols=TRANSACTION_COLUMNS, dtype=TRANSACTION_DTYPES, float_precision='round_trip',
+                         chunksize=chunk_rows, nrows=max_rows) as reader:
+            yield from reader
+        return
+
+    column_types = {column: pa.dictionary(pa.int32(), pa.string()) if dtype == 'category'
+                    else pa.from_numpy_dtype(np.dtype(dtype)) for column, dtype in TRANSACTION_DTYPES.items()}
+    convert_options = pa_csv.ConvertOptions(include_columns=TRANSACTION_COLUMNS, column_types=column_types)
+    remaining = max_rows
+    with open(path, 'rb') as f:
+        header = f.readline()
+        read_options = pa_csv.ReadOptions(column_names=next(csv.reader([header.decode('utf-8-sig')])),
+                                          use_threads=True)
+        sample = f.read(CSV_SAMPLE_BYTES)
+        block_bytes = min(chunk_rows * max(1, len(sample) // max(1, sample.count(b'\n'))), os.path.getsize(path))
+        f.seek(len(header))
+        while remaining is None or remaining > 0:
+            # 每块补齐到行尾
+            block = f.read(block_bytes) + f.readline()
+            if not block.strip():
+                break
+            chunk = pa_csv.read_csv(pa.BufferReader(block), read_options=read_options,
+                                    convert_options=convert_options).to_pandas()
+            if remaining is not None:
+                chunk = chunk.iloc[:remaining]
+                remaining -= len(chunk)
+            yield chunk
+
+
+def concat_chunks(chunks):
+    """拼接分块，分类列合并类别而不是退化为object列"""
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+    columns = {}
+    for column, dtype in chunks[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals([chunk[column] for chunk in chunks])
+        else:
+            columns[column] = np.concatenate([chunk[column].to_numpy() for chunk in chunks])
+    return pd.DataFrame(columns)
+
+
+def _window_totals(accounts, timestamps, amounts, window):
+    """
+    每笔交易之前window纳秒内（[t-window, t)，与 rolling(closed='left') 一致）同一账户的交易次数和金额合计
+    时间换成全部时间点中的序号后与账户编号组合成一个有序键，用二分查找代替逐账户的滚动窗口
+    """
+    codes, _ = pd.factorize(accounts)
+    times = np.unique(timestamps)
+    rank = np.searchsorted(times, timestamps)
+    base = codes.astype(np.int64) * (len(times) + 1)
+    keys = base + rank
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    # 与rolling一致，金额缺失的交易不计数
+    valid = ~np.isnan(amounts[order])
+    cumulative_counts = np.concatenate([[0], np.cumsum(valid)])
+    cumulative = np.concatenate([[0.0], np.cumsum(np.where(valid, amounts[order], 0.0))])
+    low = np.searchsorted(sorted_keys, base + np.searchsorted(times, timestamps - window), 'left')
+    high = np.searchsorted(sorted_keys, keys, 'left')
+    counts = (cumulative_counts[high] - cumulative_counts[low]).astype(np.float64)
+    totals = cumulative[high] - cumulative[low]
+    # 缺少账户的交易不参与统计
+    missing = codes < 0
+    counts[missing] = 0.0
+    totals[missing] = 0.0
+    return counts, totals
+
+
+def risk_types(risk_scores, amounts):
+    """DataCache.determine_risk_type 的向量化版本"""
+    risk_scores = np.asarray(risk_scores)
+    return np.select(
+        [(risk_scores > 0.8) & (np.asarray(amounts) > 500000), risk_scores > 0.8, risk_scores > 0.7, risk_scores > 0.5],
+        ['大额交易', '身份盗用', '洗钱行为', '可疑行为'],
+        default='正常交易'
+    ).astype(object)
+
+
+def _record_column(values):
+    """紧凑列 -> 与 pd.DataFrame(记录列表) 相同的列类型（分类列为字符串，数值列为64位），总是返回副本"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(object).to_numpy()
+    if values.dtype.kind == 'f':
+        return values.to_numpy(np.float64, copy=True)
+    if values.dtype.kind in 'iu':
+        return values.to_numpy(np.int64, copy=True)
+    return values.to_numpy(copy=True)
+
+
+class FrameTransactions(Sequence):
+    """
+    按列保存的交易，代替 df.to_dict('records') 得到的记录列表（全量数据逐条转为字典要多占数倍内存）
+    按下标取出的记录为字典；extend() 追加实时写入的记录
+    """
+
+    def __init__(self, df):
+        self._frames = [df]
+        self._size = len(df)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError('transaction index out of range')
+        for frame in self._frames:
+            if i < len(frame):
+                return frame.iloc[i:i + 1].to_dict('records')[0]
+            i -= len(frame)
+
+    def extend(self, records):
+        frame = pd.DataFrame(records)
+        if len(frame):
+            self._frames.append(frame)
+            self._size += len(frame)
+
+    def frame(self):
+        """按列构造DataFrame，列类型与 pd.DataFrame(记录列表) 一致（每次调用得到独立副本，可以修改）"""
+        frames = [pd.DataFrame({column: _record_column(values) for column, values in frame.items()})
+                  for frame in list(self._frames)]
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
 
 class DataCache:
     _instance = None
@@ -38,20 +269,13 @@ class DataCache:
             return data.loc[transaction_id].to_dict()
         return None
         
-    def get_transactions_by_user(self, user_id, limit=100):
-        """获取用户的交易记录"""
-        data = self.get_data()
-        user_transactions = data[
-            (data['nameOrig'] == user_id) | 
-            (data['nameDest'] == user_id)
-        ].head(limit)
-        return user_transactions.to_dict('records')
+    def get_transactions_by_user(self, user_id, limit=100, offset=0):
+        """获取用户的交易记录（按时间倒序分页）"""
+        return self.transaction_store.query(limit=limit, offset=offset, account=user_id)
         
-    def get_high_risk_transactions(self, risk_threshold=0.7, limit=100):
-        """获取高风险交易"""
-        data = self.get_data()
-        high_risk = data[data['risk_score'] >= risk_threshold].head(limit)
-        return high_risk.to_dict('records')
+    def get_high_risk_transactions(self, risk_threshold=0.7, limit=100, offset=0):
+        """获取高风险交易（按时间倒序分页）"""
+        return self.transaction_store.query(limit=limit, offset=offset, risk_above=risk_threshold)
         
     def get_transaction_stats(self):
         """获取交易统计信息"""
@@ -69,34 +293,151 @@ class DataCache:
 
     def __init__(self):
         self.transactions = []
-        self.alerts = []
         self.last_update = None
         self.df = None
+        # attach模式下交易图以CSR数组共享，networkx图在首次访问时才构建
+        self._graph_csr = None
         self.graph = None
         self.communities = None
         self.group_cache = {}
+        # 高风险账户的k跳子图，每代数据建好后整体替换
+        self.risk_subgraphs = None
         self.cache_timeout = Config.CACHE_TIMEOUT
-        self._load_models()
+        # 最近N条交易 / 最近N条高风险交易，监控接口直接读取预渲染结果
+        self.recent_transactions = RecentBuffer(Config.RECENT_TRANSACTIONS_SIZE)
+        self.recent_high_risk = RecentBuffer(Config.RECENT_HIGH_RISK_SIZE)
+        # 1分钟/1小时/24小时滑动窗口统计，读取为O(1)
+        self.stats = StreamingStats(risk_threshold=Config.HIGH_RISK_THRESHOLD)
+        # 多条件筛选使用的交易位图索引
+        self.transaction_index = new_transaction_index()
+        # 多进程部署：publish 模式发布数据供其他进程挂载，attach 模式只读挂载已发布的数据
+        self.data_plane = SharedDataPlane(Config.SHARED_DATA_DIR) if Config.DATA_PLANE == 'attach' else None
+        self._generation = None
+        self._model_versions = {}  # 已挂载的共享模型版本
+        # 交易存储后端，统计和分页查询下推到存储中执行
+        self.transaction_store = create_transaction_store(self._storage_backend(), Config.TRANSACTION_DB_PATH)
+        # 持久化的预警列表及处理状态
+        self.alert_store = AlertStore(Config.ALERT_DB_PATH)
+        self._ingest_lock = threading.Lock()
+        self._ingest_listeners = []
+        # 模型输入特征的标准化参数，首次使用时加载（或拟合）
+        self._feature_scaler = None
+        self._feature_scaler_lock = threading.Lock()
+        self._register_models()
+        self.publisher = None
+        # 路径分析进程池：工作进程挂载共享数据，local模式下同样需要发布者
+        self.analysis_pool = None
+        if Config.ANALYSIS_WORKERS > 0:
+            self.analysis_pool = AnalysisPool(Config.ANALYSIS_WORKERS, Config.ANALYSIS_QUEUE_LIMIT,
+                                              Config.ANALYSIS_TIMEOUT, pool_settings())
+        if Config.DATA_PLANE == 'publish' or (self.analysis_pool is not None and self.data_plane is None):
+            self.publisher = DataPlanePublisher(self, Config.SHARED_DATA_DIR, Config.DATA_PLANE_INTERVAL)
+            self.publisher.start()
+        elif self.data_plane is not None:
+            self.data_plane.watch(Config.DATA_PLANE_INTERVAL, self.load_data)
 
-    def _load_models(self):
-        try:
-            self.models = {
-                'gbc': joblib.load(Config.GBC_MODEL_PATH),
-                'rf': joblib.load(Config.RF_MODEL_PATH)
-            }
-            self.current_model = 'gbc'
-            logger.info(f"Successfully loaded models: {list(self.models.keys())}")
-        except Exception as e:
-            logger.error(f"Error loading models: {e}")
-            self.models = {}
-            self.current_model = None
+    def _storage_backend(self):
+        """attach模式下只有sqlite文件能被多个进程同时读取，其他后端在每个工作进程中各保留一份内存副本"""
+        backend = Config.STORAGE_BACKEND
+        if self.data_plane is not None and backend != 'sqlite':
+            logger.warning(f"Storage backend '{backend}' cannot be shared between processes; "
+                           f"each worker keeps an in-memory copy (use STORAGE_BACKEND=sqlite to share it)")
+            return 'memory'
+        return backend
 
-        try:
-            self.gnn_model = GNNModel(model_path=Config.GNN_MODEL_PATH)
-            logger.info("GNN model loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load GNN model: {e}")
-            self.gnn_model = None
+    def _register_models(self):
+        """注册模型，实际加载推迟到首次使用或后台预热"""
+        self.model_registry = ModelRegistry(retry_backoff=Config.MODEL_RETRY_BACKOFF)
+        self.model_registry.register('gbc', Config.GBC_MODEL_PATH, _load_sklearn_model)
+        self.model_registry.register('rf', Config.RF_MODEL_PATH, _load_sklearn_model)
+        self.model_registry.register('gnn', Config.GNN_MODEL_PATH, _load_gnn_model)
+        self.model_registry.register('mlp', Config.MLP_MODEL_PATH, _load_mlp_model)
+        self.current_model = 'gbc'
+        if Config.MODEL_WARMUP:
+            self.model_registry.warm_up()
+        self.model_registry.watch(Config.MODEL_WATCH_INTERVAL)
+
+    @property
+    def models(self):
+        """已就绪的传统模型，未加载的模型会在此处同步加载"""
+        models = {}
+        for name in ('gbc', 'rf'):
+            model = self.model_registry.get(name)
+            if model is not None:
+                models[name] = model
+        return models
+
+    @property
+    def gnn_model(self):
+        return self.model_registry.get('gnn')
+
+    @property
+    def graph(self):
+        if self._graph is None and self._graph_csr is not None:
+            self._graph = csr_graph(self._graph_csr)
+        return self._graph
+
+    @graph.setter
+    def graph(self, value):
+        self._graph = value
+
+    @property
+    def communities(self):
+        if self._communities is None and self._graph_csr is not None:
+            self._communities = csr_communities(self._graph_csr)
+        return self._communities
+
+    @communities.setter
+    def communities(self, value):
+        self._communities = value
+
+    def transactions_frame(self):
+        """全部交易的DataFrame；attach模式下直接由共享列构造，不经过逐条记录"""
+        if isinstance(self.transactions, (SharedTransactions, FrameTransactions)):
+            return self.transactions.frame()
+        return pd.DataFrame(self.transactions)
+
+    def data_plane_status(self):
+        if self.publisher is not None:
+            return self.publisher.status()
+        if self.data_plane is not None:
+            return self.data_plane.status()
+        return {'mode': 'local'}
+
+    def data_generation(self):
+        """
+        交给进程池的数据代号：attach模式为当前挂载的一代，其他模式为本进程最近发布的一代
+        （实时写入在 DATA_PLANE_INTERVAL 内发布，分析任务看到的数据最多滞后一个间隔）
+        """
+        if self.data_plane is not None:
+            if not self.load_data():
+                return None
+            return self._generation.name
+        if self.publisher.generation is None:
+            if not self.transactions or not self.last_update:
+                self.load_data()
+            if not self.transactions:
+                return None
+            self.publisher.publish()
+        return self.publisher.generation
+
+    def run_analysis(self, func, *args, timeout=None):
+        """
+        执行CPU密集型分析 func(data_cache, *args)：启用进程池时在工作进程中以共享数据执行，否则在当前线程执行
+        进程池已满时抛出 PoolSaturated，超时抛出 JobTimeout
+        """
+        if self.analysis_pool is None:
+            return func(self, *args)
+        generation = self.data_generation()
+        if generation is None:
+            # 没有可用数据时在当前线程执行，由分析函数返回相应的错误
+            return func(self, *args)
+        return self.analysis_pool.run(func, generation, *args, timeout=timeout)
+
+    def analysis_pool_status(self):
+        if self.analysis_pool is None:
+            return {'workers': 0}
+        return self.analysis_pool.status()
 
     def should_refresh(self):
         """检查是否需要刷新数据"""
@@ -106,6 +447,8 @@ class DataCache:
 
     def load_data(self):
         """Load and process transaction data"""
+        if self.data_plane is not None:
+            return self._attach_shared_data()
         try:
             if not self.should_refresh():
                 logger.info("Using cached data")
@@ -117,56 +460,46 @@ class DataCache:
                 logger.error(f"Data file not found: {Config.DATA_PATH}")
                 return False
 
-            # 1. 首先只读取必要的列，减少内存使用
-            columns = ['step', 'type', 'amount', 'nameOrig', 'oldbalanceOrg', 'newbalanceOrig', 
-                      'nameDest', 'oldbalanceDest', 'newbalanceDest', 'isFraud']
-            
-            # 2. 使用dtype指定数据类型，优化内存使用
-            dtype_dict = {
-                'step': 'int32',
-                'type': 'category',
-                'amount': 'float32',
-                'nameOrig': 'category',
-                'nameDest': 'category',
-                'oldbalanceOrg': 'float32',
-                'newbalanceOrig': 'float32',
-                'oldbalanceDest': 'float32',
-                'newbalanceDest': 'float32',
-                'isFraud': 'int8'
-            }
-            
-            # 3. 使用nrows限制最大行数
-            max_rows = Config.MAX_TRANSACTIONS * 2  # 预留一些空间用于后续处理
-            
-            # 4. 一次性读取数据，避免多次IO
-            self.df = pd.read_csv(
-                Config.DATA_PATH,
-                usecols=columns,
-                dtype=dtype_dict,
-                nrows=max_rows
-            )
-            
-            # 5. 添加时间戳列（基于step列）
-            current_time = datetime.now()
-            start_date = current_time - timedelta(days=30)
-            self.df['timestamp'] = start_date + pd.to_timedelta(self.df['step'], unit='h')  # 使用小写'h'
-            
-            # 6. 计算风险分数
-            self.df['risk_score'] = self._calculate_risk_scores(self.df)
-            
-            # 7. 添加风险类型
-            self.df['risk_type'] = self.df.apply(self.determine_risk_type, axis=1)
-            
-            # 8. 转换为记录格式
-            self.transactions = self.df.to_dict('records')
+            # 1. 分块读取、转换为紧凑类型并评分，峰值内存只与块大小有关；未设置 LOAD_MAX_ROWS 时读取 MAX_TRANSACTIONS*2 行
+            max_rows = Config.MAX_TRANSACTIONS * 2 if Config.LOAD_MAX_ROWS is None else Config.LOAD_MAX_ROWS
+            chunks = list(self._scored_chunks(Config.DATA_PATH, max_rows or None))
+            if not chunks:
+                logger.error(f"No transactions in {Config.DATA_PATH}")
+                return False
+
+            # 2. 拼接为按列保存的紧凑交易表，不再逐条转换为字典
+            with span('data_cache.to_records'):
+                self.df = concat_chunks(chunks)
+                del chunks
+                self.transactions = FrameTransactions(self.df)
             self.last_update = datetime.now()
+            with span('data_cache.recent'):
+                self._fill_recent_buffers()
+                self.stats.reset()
+                self.stats.add_frame(self.df)
+            with span('data_cache.bitmap_index'):
+                index = new_transaction_index()
+                index.append(transaction_index_columns(self.df))
+                self.transaction_index = index
+            with span('data_cache.store'):
+                self.transaction_store.replace(self.df)
 
-            # 9. 生成预警
-            self.generate_alerts()
+            # 3. 生成预警
+            with span('data_cache.alerts'):
+                written, removed = self.alert_store.replace_transactions(
+                    self.df.reset_index(), ALERT_KEY_COLUMNS, Config.HIGH_RISK_THRESHOLD)
+                logger.info(f"Synced {written} alerts to the alert store, removed {removed} stale pending alerts")
 
-            # 10. 构建交易网络
-            self._build_graph()
+            # 4. 构建交易网络
+            with span('data_cache.build_graph'):
+                self._build_graph()
 
+            # 5. 预先抽取高风险账户的子图
+            with span('data_cache.risk_subgraphs'):
+                self._precalculate_risk_subgraphs(graph_window(self.df), self.last_update.isoformat())
+
+            if self.publisher is not None:
+                self.publisher.mark_dirty()
             logger.info(f"Successfully loaded {len(self.df)} transactions")
             return True
 
@@ -176,9 +509,98 @@ class DataCache:
             logger.error(traceback.format_exc())
             return False
 
+    def _attach_shared_data(self):
+        """
+        attach模式：挂载加载进程发布的数据，不读取CSV、不重新评分和建图
+        交易列、位图索引和交易图直接引用共享的只读数组；发布了新的一代时重新挂载
+        """
+        try:
+            plane = self.data_plane
+            plane.refresh()
+            generation = plane.generation or plane.wait(Config.DATA_PLANE_WAIT)
+            if generation is None:
+                logger.error(f"No shared data published in {plane.directory}")
+                return False
+            if generation is self._generation:
+                return True
+
+            with span('data_cache.attach'):
+                manifest = generation.manifest
+                transactions = SharedTransactions(generation.arrays('tx.'))
+                index = BitmapIndex.attach(generation.arrays('index.'), manifest['index'])
+                # 监控缓冲区和滑动窗口统计只需要最新的少量数据或一次遍历，在本进程中构建（预警在共享的预警库中）
+                df = transactions.frame()
+                self._fill_recent_buffers(df)
+                self.stats.reset()
+                self.stats.add_frame(df)
+                if self.transaction_store.name == 'memory':
+                    self.transaction_store.replace(df)
+                self._precalculate_risk_subgraphs(graph_window(df), manifest['last_update'])
+                del df
+
+                self.transactions = transactions
+                self.transaction_index = index
+                self._graph_csr = generation.arrays('graph.') or None
+                self.graph = None
+                self.communities = None
+                self._attach_models(generation)
+                self.last_update = datetime.fromisoformat(manifest['last_update'])
+                self._generation = generation
+            logger.info(f"Attached {len(transactions)} shared transactions (generation {generation.name})")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error attaching shared data: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return False
+
+    def _attach_models(self, generation):
+        """
+        使用加载进程发布的模型：sklearn模型以mmap方式加载，GNN的权重替换为共享数组
+        已就绪的模型在版本变化时热替换；尚未加载（或加载失败）的模型每次挂载都改为指向当前一代，
+        并把当前一代登记为仍在引用，避免加载进程在模型真正加载前清理掉这一代
+        """
+        pending = False
+        for name, model in generation.manifest['models'].items():
+            if 'file' in model:
+                path, loader = generation.file(model['file']), _load_shared_sklearn_model
+            else:
+                weights = generation.arrays('gnn.')
+                path, loader = Config.GNN_MODEL_PATH, lambda path, weights=weights: load_shared_gnn_model(path, weights)
+            try:
+                if self.model_registry.is_ready(name):
+                    if self._model_versions.get(name) != model['version']:
+                        self.model_registry.reload(name, path, loader)
+                elif self.model_registry.retarget(name, path, loader):
+                    pending = pending or 'file' in model
+                self._model_versions[name] = model['version']
+            except Exception as e:
+                logger.error(f"Error attaching shared model '{name}': {e}")
+        try:
+            pin_generations(self.data_plane.directory, [generation.name] if pending else [])
+        except OSError as e:
+            logger.error(f"Error pinning shared data generation {generation.name}: {e}")
+
+    def _fill_recent_buffers(self, df=None):
+        """用最新的交易填充环形缓冲区，只取时间最近的N条，不对全量数据排序"""
+        df = self.df if df is None else df
+        columns = RECENT_COLUMNS
+        recent = df.nlargest(self.recent_transactions.capacity, 'timestamp')
+        high_risk = df[df['risk_score'] > Config.HIGH_RISK_THRESHOLD]
+        high_risk = high_risk.nlargest(self.recent_high_risk.capacity, 'timestamp')
+
+        self.recent_transactions.clear()
+        self.recent_transactions.extend(frame_records(recent.iloc[::-1].reset_index(), columns=columns))
+        self.recent_high_risk.clear()
+        self.recent_high_risk.extend(frame_records(high_risk.iloc[::-1].reset_index(), columns=columns))
+
     def _calculate_risk_scores(self, df):
         """Calculate risk scores based on multiple risk factors"""
         try:
+            # 按时间排序后再计算各项风险，_row记录原始行号，最后按原始顺序返回
+            df = df.assign(_row=np.arange(len(df))).sort_values('timestamp', kind='stable').reset_index(drop=True)
+
             # 1. 基于金额的风险评分 - 使用向量化操作
             amount_risk = np.zeros(len(df))
             amount_thresholds = [(1000000, 0.3), (500000, 0.2), (100000, 0.1)]
@@ -209,40 +631,16 @@ class DataCache:
                        f"num_high_risk={np.sum(balance_change_risk > 0.3)}")
             
             # 3. 基于交易频率的风险评分 - 使用时间窗口聚合
-            df = df.sort_values('timestamp')
             time_window = '24h'
             
-            # 计算每个账户在24小时窗口内的交易次数和金额
-            freq_orig = df.groupby('nameOrig').rolling(
-                window=time_window,
-                on='timestamp',
-                min_periods=1,
-                closed='left'
-            ).agg({
-                'amount': ['count', 'sum']
-            }).reset_index()
-            
-            freq_orig.columns = ['nameOrig', 'timestamp', 'tx_count', 'tx_amount']
-            
-            freq_dest = df.groupby('nameDest').rolling(
-                window=time_window,
-                on='timestamp',
-                min_periods=1,
-                closed='left'
-            ).agg({
-                'amount': ['count', 'sum']
-            }).reset_index()
-            
-            freq_dest.columns = ['nameDest', 'timestamp', 'tx_count', 'tx_amount']
-            
-            # 合并发送方和接收方的统计
-            df = df.merge(freq_orig[['nameOrig', 'timestamp', 'tx_count', 'tx_amount']], 
-                         on=['nameOrig', 'timestamp'], 
-                         how='left')
-            df = df.merge(freq_dest[['nameDest', 'timestamp', 'tx_count', 'tx_amount']], 
-                         on=['nameDest', 'timestamp'], 
-                         how='left',
-                         suffixes=('_orig', '_dest'))
+            # 计算每个账户在24小时窗口内（不含同一时刻）的交易次数和金额
+            timestamps = pd.DatetimeIndex(df['timestamp']).as_unit('ns').asi8
+            amounts = df['amount'].to_numpy(np.float64)
+            window = pd.Timedelta(time_window).value
+            for column, suffix in (('nameOrig', '_orig'), ('nameDest', '_dest')):
+                tx_count, tx_amount = _window_totals(df[column], timestamps, amounts, window)
+                df['tx_count' + suffix] = tx_count
+                df['tx_amount' + suffix] = tx_amount
             
             # 计算频率风险
             freq_risk = np.zeros(len(df))
@@ -266,7 +664,7 @@ class DataCache:
             pattern_risk = np.zeros(len(df))
             
             # 检查环形交易
-            cycle_df = df.merge(
+            cycle_df = df.reset_index().merge(
                 df,
                 left_on=['nameOrig', 'timestamp'],
                 right_on=['nameDest', 'timestamp'],
@@ -277,13 +675,13 @@ class DataCache:
                 (abs(cycle_df['amount'] - cycle_df['amount_reverse']) < cycle_df['amount'] * 0.01)  # 金额相近
             ]
             if not cycle_df.empty:
-                pattern_risk[cycle_df.index] = 0.3
+                pattern_risk[cycle_df['index'].to_numpy()] = 0.3
             
             # 检查快进快出
             quick_out = df[df['type'].isin(['CASH_OUT', 'TRANSFER'])].copy()
             quick_out['next_hour'] = quick_out['timestamp'] + pd.Timedelta(hours=1)
             
-            quick_matches = quick_out.merge(
+            quick_matches = quick_out.reset_index().merge(
                 df,
                 left_on=['nameDest'],
                 right_on=['nameOrig'],
@@ -295,10 +693,8 @@ class DataCache:
                 (quick_matches['amount_next'] >= quick_matches['amount'] * 0.9)  # 金额相近
             ]
             if not quick_matches.empty:
-                pattern_risk[quick_matches.index] = np.maximum(
-                    pattern_risk[quick_matches.index],
-                    0.25
-                )
+                matched = quick_matches['index'].to_numpy()
+                pattern_risk[matched] = np.maximum(pattern_risk[matched], 0.25)
             
             logger.info(f"Pattern risk stats: mean={pattern_risk.mean():.3f}, "
                        f"max={pattern_risk.max():.3f}, "
@@ -338,8 +734,10 @@ class DataCache:
                 count = np.sum((risk_scores > low) & (risk_scores <= high))
                 logger.info(f"Risk score range {low:.1f}-{high:.1f}: {count} transactions "
                           f"({count/len(risk_scores)*100:.1f}%)")
-            
-            return risk_scores
+
+            scores = np.empty(len(df))
+            scores[df['_row'].to_numpy()] = np.asarray(risk_scores, dtype=float)
+            return scores
             
         except Exception as e:
             logger.error(f"Error calculating risk scores: {e}")
@@ -363,45 +761,82 @@ class DataCache:
             logger.error(f"Error determining risk type: {e}")
             return '未知风险'
 
-    def generate_alerts(self):
-        """Generate alerts based on high-risk transactions"""
-        try:
-            self.alerts = []
-            high_risk_txs = self.df[self.df['risk_score'] > 0.7]
-            
-            for _, tx in high_risk_txs.iterrows():
-                alert = {
-                    'id': len(self.alerts) + 1,
-                    'timestamp': tx['timestamp'].isoformat(),
-                    'type': tx['risk_type'],
-                    'risk_level': '高风险' if tx['risk_score'] > 0.8 else '中风险',
-                    'description': f"账户 {tx['nameOrig']} 向 {tx['nameDest']} 发起 {tx['type']} 交易，金额 ¥{tx['amount']:,.2f}",
-                    'status': 'pending'
-                }
-                self.alerts.append(alert)
-            
-            logger.info(f"Generated {len(self.alerts)} alerts")
-        except Exception as e:
-            logger.error(f"Error generating alerts: {e}")
+    def add_ingest_listener(self, listener):
+        """注册增量数据监听器：listener(records, alert_count)，records为RECENT_COLUMNS字段的交易记录"""
+        self._ingest_listeners.append(listener)
+
+    @traced('data_cache.ingest')
+    def ingest_transactions(self, transactions):
+        """
+        追加新到达的交易：计算风险分数和风险类型，更新环形缓冲区和预警，并通知监听器
+        缺少timestamp时使用当前时间，已带risk_score的交易不再重新评分；返回 (交易记录, 写入预警库的预警数)
+        attach模式下共享数据只读，抛出ReadOnlyDataError
+        """
+        if self.data_plane is not None:
+            raise ReadOnlyDataError('Shared data is read-only in attach mode; send ingest requests to the loader process')
+        batch = pd.DataFrame(transactions)
+        if batch.empty:
+            return [], 0
+        for column in ('oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest', 'isFraud', 'step'):
+            if column not in batch.columns:
+                batch[column] = 0
+        batch['amount'] = batch['amount'].astype(float)
+        if 'timestamp' in batch.columns:
+            batch['timestamp'] = pd.to_datetime(batch['timestamp'])
+        else:
+            batch['timestamp'] = pd.Timestamp(datetime.now())
+        if 'risk_score' not in batch.columns:
+            batch['risk_score'] = self._calculate_risk_scores(batch)
+        batch['risk_type'] = batch.apply(self.determine_risk_type, axis=1)
+
+        with self._ingest_lock:
+            offset = len(self.transactions)
+            batch.index = pd.RangeIndex(offset, offset + len(batch))
+            self.transactions.extend(batch.to_dict('records'))
+
+            records = frame_records(batch.reset_index(), columns=RECENT_COLUMNS)
+            self.recent_transactions.extend(records)
+            self.recent_high_risk.extend(
+                [record for record in records if record['risk_score'] > Config.HIGH_RISK_THRESHOLD])
+            self.stats.add_frame(batch)
+            self.transaction_index.append(transaction_index_columns(batch))
+            self.transaction_store.append(batch)
+            alert_count = self.alert_store.upsert_transactions(
+                batch.reset_index(), INGEST_ALERT_KEY_COLUMNS, Config.HIGH_RISK_THRESHOLD)
+
+        for listener in self._ingest_listeners:
+            try:
+                listener(records, alert_count)
+            except Exception as e:
+                logger.error(f"Error notifying ingest listener: {e}")
+        return records, alert_count
 
     def _build_graph(self):
         """Build transaction network graph"""
         try:
+            import networkx as nx
+            from networkx.algorithms import community
+
             G = nx.DiGraph()
-            
+
+            # 加载全量数据时只用时间最近的交易建图，networkx图的内存与边数成正比
+            df = graph_window(self.df)
+
             # Add edges with weights based on transaction amounts
-            for _, row in self.df.iterrows():
-                G.add_edge(
-                    row['nameOrig'],
-                    row['nameDest'],
-                    weight=float(row['amount']),
-                    risk_score=float(row['risk_score'])
-                )
+            with span('data_cache.graph_edges'):
+                for orig, dest, amount, risk_score in zip(df['nameOrig'], df['nameDest'], df['amount'], df['risk_score']):
+                    G.add_edge(
+                        orig,
+                        dest,
+                        weight=float(amount),
+                        risk_score=float(risk_score)
+                    )
             
             self.graph = G
             
             # Find communities using Louvain method
-            self.communities = list(community.louvain_communities(G.to_undirected()))
+            with span('data_cache.louvain'):
+                self.communities = list(community.louvain_communities(G.to_undirected()))
             logger.info(f"Built graph with {len(G.nodes)} nodes and {len(G.edges)} edges")
             
         except Exception as e:
@@ -409,17 +844,161 @@ class DataCache:
             self.graph = None
             self.communities = None
 
-    def _preprocess_chunk(self, chunk):
-        # 保持原有的_preprocess_chunk方法代码不变
-        # ... (从原文件复制_preprocess_chunk方法的内容)
-        pass
+    def _scored_chunks(self, path, max_rows=None):
+        """
+        逐块读取并评分，依次产出带 timestamp/risk_score/risk_type 的紧凑分块
+        每块评分时带上之前读取的24小时内的全部交易和下一块中1小时内的交易，
+        按时间排列的文件的评分与整表一次评分一致；因此每块在读到下一块之后才评分
+        """
+        chunk_rows = max(1, Config.LOAD_CHUNK_ROWS)
+        start_date = datetime.now() - timedelta(days=30)
+        reader = read_csv_chunks(path, chunk_rows, max_rows)
+        context = None
+        pending = None
+        while True:
+            with span('data_cache.read_csv'):
+                chunk = next(reader, None)
+                if chunk is not None:
+                    chunk = self._preprocess_chunk(chunk, start_date)
+            if pending is not None:
+                with span('data_cache.risk_scores'):
+                    scores = self._score_chunk(pending, context, chunk)
+                    if chunk is not None:
+                        context = self._risk_context(pending, context, chunk)
+                with span('data_cache.risk_type'):
+                    pending['risk_score'] = scores
+                    pending['risk_type'] = pd.Categorical(risk_types(scores, pending['amount']))
+                yield pending
+            if chunk is None:
+                return
+            pending = chunk
+
+    def _preprocess_chunk(self, chunk, start_date):
+        """转换为紧凑的列类型（pyarrow读取的列已是目标类型，不会复制）并按step添加时间戳"""
+        chunk = chunk.astype(TRANSACTION_DTYPES, copy=False)
+        chunk['timestamp'] = start_date + pd.to_timedelta(chunk['step'], unit='h')
+        return chunk
+
+    def _score_chunk(self, chunk, context, following):
+        """带上下文计算一块的风险分数，只返回该块的部分"""
+        parts = [] if context is None else [context]
+        parts.append(chunk)
+        if following is not None:
+            lookahead = following[following['timestamp'] <= chunk['timestamp'].max() + RISK_LOOKAHEAD_WINDOW]
+            if len(lookahead):
+                parts.append(lookahead)
+        if len(parts) == 1:
+            return self._calculate_risk_scores(chunk)
+        offset = len(parts[0]) if context is not None else 0
+        scores = self._calculate_risk_scores(pd.concat(parts, ignore_index=True))
+        return scores[offset:offset + len(chunk)]
 
-    def _precalculate_risk_subgraphs(self):
-        # 保持原有的_precalculate_risk_subgraphs方法代码不变
-        # ... (从原文件复制_precalculate_risk_subgraphs方法的内容)
-        pass
+    @staticmethod
+    def _risk_context(chunk, context, following):
+        """
+        下一块评分用的上文：已读交易中不早于下一块最早时间24小时前的全部交易
+        只按时间截取，不限制行数，24小时内的交易多于一块时频率风险也不会少算
+        """
+        columns = TRANSACTION_COLUMNS + ['timestamp']
+        frame = chunk[columns] if context is None else pd.concat([context, chunk[columns]], ignore_index=True)
+        frame = frame[frame['timestamp'] >= following['timestamp'].min() - RISK_CONTEXT_WINDOW]
+        return frame.reset_index(drop=True)
+
+    def _precalculate_risk_subgraphs(self, df, generation):
+        """为这一代数据建立账户邻接，并预先抽取平均风险分数超过 HIGH_RISK_THRESHOLD 的账户的子图"""
+        try:
+            subgraphs = RiskSubgraphs(df, generation, Config.RISK_SUBGRAPH_HOPS,
+                                      Config.RISK_SUBGRAPH_MAX_NODES, Config.HIGH_RISK_THRESHOLD)
+            flagged = subgraphs.precompute(Config.RISK_SUBGRAPH_MAX_ACCOUNTS)
+            self.risk_subgraphs = subgraphs
+            logger.info(f"Precalculated risk subgraphs for {flagged} accounts (generation {generation})")
+        except Exception as e:
+            logger.error(f"Error precalculating risk subgraphs: {e}")
+            self.risk_subgraphs = None
 
+    def risk_subgraph(self, account, hops):
+        """账户的k跳子图（高风险账户直接取预先抽取的结果）；没有数据或账户不存在时返回None"""
+        if self.risk_subgraphs is None or not self.last_update:
+            self.load_data()
+        subgraphs = self.risk_subgraphs
+        if subgraphs is None:
+            return None
+        return subgraphs.get(account, hops)
+
+    def feature_scaler(self):
+        """特征标准化参数：读取 FEATURE_SCALER_PATH，文件不存在时用训练数据 DATA_PATH 拟合并保存"""
+        if self._feature_scaler is not None:
+            return self._feature_scaler
+        with self._feature_scaler_lock:
+            if self._feature_scaler is None:
+                path = Config.FEATURE_SCALER_PATH
+                if os.path.exists(path):
+                    self._feature_scaler = FeatureScaler.load(path)
+                else:
+                    with span('data_cache.fit_feature_scaler'):
+                        scaler = FeatureScaler.fit_csv(Config.DATA_PATH, max(1, Config.LOAD_CHUNK_ROWS))
+                    try:
+                        scaler.save(path)
+                        logger.info(f"Fitted feature scaler on {scaler.count} rows, saved to {path}")
+                    except OSError as e:
+                        logger.error(f"Error saving feature scaler to {path}: {e}")
+                    self._feature_scaler = scaler
+        return self._feature_scaler
+
+    @traced('data_cache.features')
     def prepare_batch_features(self, df):
-        # 保持原有的prepare_batch_features方法代码不变
-        # ... (从原文件复制prepare_batch_features方法的内容)
-        pass 
\ No newline at end of file
+        """交易批次（DataFrame或 {列名: 数组}）-> 按训练列顺序排列的C连续float32特征矩阵"""
+        return build_features(df, self.feature_scaler())
+
+    def predict_batch(self, df, names=None):
+        """
+        用各模型给一批交易打分，特征只计算一次，所有模型共用同一个矩阵
+        返回 {模型名: 欺诈概率数组} 和加载失败的模型名列表
+        """
+        names = list(names or FEATURE_MODELS)
+        features = self.prepare_batch_features(df)
+        scores = {}
+        unavailable = []
+        for name in names:
+            model = self.model_registry.get(name)
+            if model is None:
+                unavailable.append(name)
+                continue
+            with span(f'model.{name}.predict'):
+                scores[name] = _fraud_scores(model, features)
+        return scores, unavailable
+
+
+def _load_sklearn_model(path):
+    import joblib
+    return joblib.load(path)
+
+
+def _load_mlp_model(path):
+    from app.models.mlp import MLPModel
+    return MLPModel(path)
+
+
+def _fraud_scores(model, features):
+    """特征矩阵 -> 欺诈概率；sklearn模型先核对训练时的列顺序"""
+    if hasattr(model, 'fraud_scores'):
+        return model.fraud_scores(features)
+    names = getattr(model, 'feature_names_in_', None)
+    if names is not None and list(names) != FEATURE_COLUMNS:
+        raise ValueError(f'Model was trained on columns {list(names)}, expected {FEATURE_COLUMNS}')
+    with warnings.catch_warnings():
+        # 列顺序已经核对过，矩阵不带列名
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        return model.predict_proba(features)[:, 1]
+
+
+def _load_gnn_model(path):
+    from app.models.gnn_utils import GNNModel
+    return GNNModel(model_path=path)
+
+
+def _load_shared_sklearn_model(path):
+    # 模型中的numpy数组以只读mmap打开，多个工作进程共享同一份
+    import joblib
+    return joblib.load(path, mmap_mode='r')
+
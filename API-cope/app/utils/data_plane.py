@@ -0,0 +1,520 @@
+"""
+跨进程共享的只读数据平面
+加载进程（DATA_PLANE=publish）把交易列、位图索引、CSR交易图和模型权重写成 .npy 文件，
+工作进程（DATA_PLANE=attach）以 mmap 只读方式打开，所有进程共享操作系统页缓存中的同一份数据；
+SHARED_DATA_DIR 位于 /dev/shm 时数据常驻内存，不经过磁盘
+
+目录结构：
+    SHARED_DATA_DIR/
+        CURRENT               当前一代的目录名，新一代写完后原子替换
+        <generation>/
+            manifest.json     行数、分类取值、模型版本等元数据
+            *.npy             各数组
+            models/           sklearn模型（joblib格式，加载时数组部分以mmap打开）
+
+用法（在API-cope目录下，单独的加载进程）:
+    python -m app.utils.data_plane --once
+    python -m app.utils.data_plane --interval 10
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import warnings
+from collections.abc import Sequence
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.utils.graph_arrays import graph_to_arrays
+from app.utils.logger import logger
+
+CURRENT = 'CURRENT'
+MANIFEST = 'manifest.json'
+PINS = '.pins'  # 工作进程仍在引用的代（每个进程一个文件，内容为代号），清理时跳过
+KEEP_GENERATIONS = 2  # 保留的历史代数，正在读取旧一代的工作进程不受影响
+
+# 共享的交易字段及其数据类型，与 pd.DataFrame(DataCache.transactions) 的列一致；字符串保存为定长Unicode数组
+SHARED_COLUMNS = {
+    'step': np.int64,
+    'type': str,
+    'amount': np.float64,
+    'nameOrig': str,
+    'oldbalanceOrg': np.float64,
+    'newbalanceOrig': np.float64,
+    'nameDest': str,
+    'oldbalanceDest': np.float64,
+    'newbalanceDest': np.float64,
+    'isFraud': np.int64,
+    'timestamp': 'datetime64[ns]',
+    'risk_score': np.float64,
+    'risk_type': str
+}
+
+# 发布到共享目录的sklearn模型
+SHARED_SKLEARN_MODELS = ('gbc', 'rf')
+
+
+class ReadOnlyDataError(RuntimeError):
+    """attach模式的工作进程不能修改共享数据，写入需发送到加载进程"""
+
+
+def shared_columns(df):
+    """交易DataFrame -> {字段: 可mmap的定长数组}"""
+    columns = {}
+    for field, dtype in SHARED_COLUMNS.items():
+        if field not in df.columns:
+            values = np.zeros(len(df), dtype=np.asarray([], dtype=dtype).dtype)
+        elif dtype is str:
+            values = df[field].astype(str).to_numpy(str)
+        elif field == 'timestamp':
+            timestamps = pd.to_datetime(df[field])
+            if timestamps.dt.tz is not None:
+                timestamps = timestamps.dt.tz_localize(None)
+            values = timestamps.to_numpy(dtype)
+        else:
+            values = df[field].fillna(0).to_numpy(dtype)
+        columns[field] = values
+    return columns
+
+
+class SharedTransactions(Sequence):
+    """共享交易列的只读视图，代替 DataCache.transactions 列表；按下标取出的记录为字典"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._size = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError('transaction index out of range')
+        record = {field: values[i].item() for field, values in self.columns.items()}
+        record['timestamp'] = pd.Timestamp(self.columns['timestamp'][i])
+        return record
+
+    def frame(self):
+        """按列构造DataFrame（每次调用得到独立副本，可以修改）"""
+        return pd.DataFrame({field: np.asarray(values) for field, values in self.columns.items()})
+
+
+def graph_csr(graph, communities=None):
+    """networkx交易图 -> CSR数组：节点名、indptr、indices、边属性（按CSR顺序）和社区编号（无社区为-1）"""
+    nodes, node_index, src, dst = graph_to_arrays(graph)
+    num_edges = len(src)
+    weight = np.fromiter((data.get('weight', 0.0) for _, _, data in graph.edges(data=True)),
+                         dtype=np.float64, count=num_edges)
+    risk_score = np.fromiter((data.get('risk_score', 0.0) for _, _, data in graph.edges(data=True)),
+                             dtype=np.float64, count=num_edges)
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(nodes)), out=indptr[1:])
+    labels = np.full(len(nodes), -1, dtype=np.int64)
+    for i, members in enumerate(communities or []):
+        labels[[node_index[member] for member in members]] = i
+    return {
+        'nodes': np.asarray([str(node) for node in nodes], dtype=str),
+        'indptr': indptr,
+        'indices': dst[order],
+        'weight': weight[order],
+        'risk_score': risk_score[order],
+        'community': labels
+    }
+
+
+def csr_graph(arrays):
+    """CSR数组 -> networkx交易图（在需要时由工作进程各自构建）"""
+    import networkx as nx
+    nodes = arrays['nodes'].tolist()
+    indptr = np.asarray(arrays['indptr'])
+    src = np.repeat(np.arange(len(nodes)), np.diff(indptr))
+    G = nx.DiGraph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(
+        (nodes[u], nodes[v], {'weight': weight, 'risk_score': risk_score})
+        for u, v, weight, risk_score in zip(src.tolist(), arrays['indices'].tolist(),
+                                            arrays['weight'].tolist(), arrays['risk_score'].tolist()))
+    return G
+
+
+def csr_communities(arrays):
+    """CSR数组中的社区编号 -> [节点集合]，与 louvain_communities 的返回格式一致"""
+    labels = np.asarray(arrays['community'])
+    nodes = arrays['nodes']
+    communities = []
+    for label in np.unique(labels[labels >= 0]):
+        communities.append(set(nodes[labels == label].tolist()))
+    return communities
+
+
+def module_weights(module):
+    """torch模块的浮点参数和缓冲区 -> {名称: numpy数组}；量化后的打包参数不导出"""
+    weights = {}
+    for name, tensor in module.state_dict().items():
+        if hasattr(tensor, 'is_floating_point') and tensor.is_floating_point():
+            weights[name] = tensor.detach().cpu().numpy()
+    return weights
+
+
+def share_module_weights(module, arrays):
+    """把torch模块的参数替换为共享数组上的只读张量（释放进程内副本），返回替换的个数"""
+    import torch
+    shared = 0
+    with warnings.catch_warnings():
+        # 只读数组上的张量会触发警告；推理在no_grad下进行，不会写入
+        warnings.simplefilter('ignore', UserWarning)
+        for name, tensor in list(module.named_parameters()) + list(module.named_buffers()):
+            array = arrays.get(name)
+            if array is None or tuple(array.shape) != tuple(tensor.shape):
+                continue
+            shared_tensor = torch.from_numpy(array)
+            if shared_tensor.dtype == tensor.dtype:
+                tensor.data = shared_tensor
+                shared += 1
+    return shared
+
+
+def load_shared_gnn_model(path, weights):
+    """加载GNN模型，并把浮点权重替换为共享数组"""
+    from app.models.gnn_utils import GNNModel
+    model = GNNModel(model_path=path)
+    if model.model is not None and weights:
+        shared = share_module_weights(model.model, weights)
+        logger.info(f"GNN model uses {shared} shared weight tensors")
+    return model
+
+
+def read_current(directory):
+    """CURRENT指向的代号，尚未发布时返回None"""
+    try:
+        with open(os.path.join(directory, CURRENT), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_generation(directory, arrays, manifest, files=None):
+    """
+    写入新的一代并切换CURRENT，返回代号
+    arrays: {名称: 数组}；files: {相对路径: 写入函数(绝对路径)}
+    先写入临时目录再重命名，工作进程只会看到完整的一代
+    """
+    os.makedirs(directory, exist_ok=True)
+    generation = datetime.now().strftime('%Y%m%d%H%M%S%f') + f'-{os.getpid()}'
+    staging = os.path.join(directory, f'.{generation}.tmp')
+    os.makedirs(staging)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, name + '.npy'), np.ascontiguousarray(array), allow_pickle=False)
+        for relative, writer in (files or {}).items():
+            path = os.path.join(staging, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer(path)
+        manifest = dict(manifest, generation=generation, arrays=sorted(arrays), files=sorted(files or {}))
+        with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.rename(staging, os.path.join(directory, generation))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(directory, f'.{CURRENT}.tmp')
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(generation)
+    os.replace(pointer, os.path.join(directory, CURRENT))
+    _prune(directory, generation)
+    return generation
+
+
+def pin_generations(directory, names):
+    """
+    记录本进程仍需从中读取文件的代（例如尚未加载的模型文件所在的代），加载进程清理时跳过这些代；
+    names为空时删除记录
+    """
+    path = os.path.join(directory, PINS, str(os.getpid()))
+    if not names:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(sorted(names)))
+    os.replace(temp_path, path)
+
+
+def _pinned(directory):
+    """仍在运行的工作进程引用的代；进程已退出的记录直接删除"""
+    pins = os.path.join(directory, PINS)
+    try:
+        entries = os.listdir(pins)
+    except FileNotFoundError:
+        return set()
+    names = set()
+    for entry in entries:
+        path = os.path.join(pins, entry)
+        if not entry.isdigit():
+            continue
+        try:
+            os.kill(int(entry), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        except PermissionError:
+            pass
+        try:
+            with open(path, encoding='utf-8') as f:
+                names.update(line.strip() for line in f if line.strip())
+        except FileNotFoundError:
+            pass
+    return names
+
+
+def _prune(directory, current):
+    """删除较旧的代；已被工作进程mmap的文件在解除映射前仍然有效，仍被工作进程引用的代保留"""
+    generations = sorted(name for name in os.listdir(directory)
+                         if not name.startswith('.') and os.path.isdir(os.path.join(directory, name)))
+    pinned = _pinned(directory)
+    for name in generations[:-KEEP_GENERATIONS]:
+        if name != current and name not in pinned:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+class Generation:
+    """已发布的一代数据，所有数组在打开时即以只读mmap映射（不读取内容）"""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        with open(os.path.join(self.path, MANIFEST), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self._arrays = {array_name: np.load(os.path.join(self.path, array_name + '.npy'), mmap_mode='r')
+                        for array_name in self.manifest['arrays']}
+
+    def arrays(self, prefix):
+        """名称以prefix开头的数组，返回的键去掉前缀"""
+        return {name[len(prefix):]: array for name, array in self._arrays.items() if name.startswith(prefix)}
+
+    def file(self, relative):
+        return os.path.join(self.path, relative)
+
+    def nbytes(self):
+        return int(sum(array.nbytes for array in self._arrays.values()))
+
+
+class SharedDataPlane:
+    """工作进程一侧：打开CURRENT指向的一代，加载进程发布新一代后切换"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.generation = None
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def refresh(self):
+        """CURRENT有变化时打开新的一代，返回是否切换"""
+        name = read_current(self.directory)
+        if name is None or (self.generation is not None and self.generation.name == name):
+            return False
+        with self._lock:
+            if self.generation is not None and self.generation.name == name:
+                return False
+            self.generation = Generation(self.directory, name)
+        logger.info(f"Attached shared data generation {name} ({self.generation.nbytes() / 1e6:.1f} MB)")
+        return True
+
+    def wait(self, timeout):
+        """等待首次发布（工作进程可能先于加载进程启动），超时返回None"""
+        deadline = time.time() + timeout
+        while True:
+            self.refresh()
+            if self.generation is not None or time.time() >= deadline:
+                return self.generation
+            time.sleep(min(0.5, max(deadline - time.time(), 0)))
+
+    def watch(self, interval, callback):
+        """按固定间隔检查是否发布了新的一代，有则调用callback()"""
+        if self._watcher is not None or interval <= 0:
+            return self._watcher
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if read_current(self.directory) != (self.generation.name if self.generation else None):
+                        callback()
+                except Exception as e:
+                    logger.error(f"Error attaching shared data: {e}")
+
+        self._watcher = threading.Thread(target=_run, name='data-plane-watcher', daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def status(self):
+        generation = self.generation
+        if generation is None:
+            return {'mode': 'attach', 'generation': None}
+        return {'mode': 'attach', 'generation': generation.name, 'rows': generation.manifest['rows'],
+                'bytes': generation.nbytes()}
+
+
+class DataPlanePublisher:
+    """
+    加载进程一侧：把DataCache当前的数据发布到共享目录
+    加载和实时写入只标记数据已变化，后台线程按最小间隔合并发布，避免每批写入都重写整份数据
+    """
+
+    def __init__(self, data_cache, directory, interval=5.0):
+        self.data_cache = data_cache
+        self.directory = directory
+        self.interval = interval
+        self.generation = None
+        self._published_models = {}  # 模型名 -> (版本, 文件路径)，版本未变时硬链接上一代的文件
+        self._dirty = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        data_cache.add_ingest_listener(lambda records, alert_count: self.mark_dirty())
+
+    def mark_dirty(self):
+        self._dirty.set()
+
+    def publish(self):
+        """发布新的一代，返回代号"""
+        with self._lock:
+            data_cache = self.data_cache
+            arrays = {}
+            for field, values in shared_columns(data_cache.transactions_frame()).items():
+                arrays[f'tx.{field}'] = values
+            index_arrays, index_meta = data_cache.transaction_index.export()
+            arrays.update({f'index.{name}': values for name, values in index_arrays.items()})
+            if data_cache.graph is not None:
+                arrays.update({f'graph.{name}': values
+                               for name, values in graph_csr(data_cache.graph, data_cache.communities).items()})
+            models, files, weights = self._models()
+            arrays.update({f'gnn.{name}': values for name, values in weights.items()})
+
+            manifest = {
+                'created': datetime.now().isoformat(),
+                'rows': len(arrays['tx.step']),
+                'last_update': (data_cache.last_update or datetime.now()).isoformat(),
+                'index': index_meta,
+                'models': models
+            }
+            self.generation = write_generation(self.directory, arrays, manifest, files)
+            for name, model in models.items():
+                if 'file' in model:
+                    self._published_models[name] = (model['version'], os.path.join(
+                        self.directory, self.generation, model['file']))
+        logger.info(f"Published shared data generation {self.generation} ({manifest['rows']} transactions)")
+        return self.generation
+
+    def _models(self):
+        """在加载进程中加载模型并导出：sklearn模型写为joblib文件，GNN导出浮点权重数组"""
+        registry = self.data_cache.model_registry
+        models = {}
+        files = {}
+        weights = {}
+        for name in SHARED_SKLEARN_MODELS:
+            model = registry.get(name)
+            if model is None:
+                continue
+            version = registry.status()[name]['version']
+            relative = f'models/{name}.joblib'
+            models[name] = {'version': version, 'file': relative}
+            files[relative] = self._model_writer(name, version, model)
+        gnn = registry.get('gnn')
+        module = getattr(gnn, 'model', None)
+        if module is not None and hasattr(module, 'state_dict'):
+            weights = module_weights(module)
+            models['gnn'] = {'version': registry.status()['gnn']['version'], 'weights': sorted(weights)}
+        return models, files, weights
+
+    def _model_writer(self, name, version, model):
+        published = self._published_models.get(name)
+        if published is not None and published[0] == version and os.path.exists(published[1]):
+            return lambda path: _link_or_copy(published[1], path)
+
+        def _dump(path):
+            import joblib
+            joblib.dump(model, path)
+        return _dump
+
+    def start(self):
+        """后台线程：首次加载数据后发布，之后每当数据变化按最小间隔重新发布"""
+        if self._thread is not None:
+            return self._thread
+
+        def _run():
+            if not self.data_cache.transactions or not self.data_cache.last_update:
+                self.data_cache.load_data()
+            while True:
+                self._dirty.wait()
+                self._dirty.clear()
+                try:
+                    self.publish()
+                except Exception as e:
+                    logger.error(f"Error publishing shared data: {e}")
+                time.sleep(self.interval)
+
+        self._thread = threading.Thread(target=_run, name='data-plane-publisher', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def status(self):
+        return {'mode': 'publish', 'generation': self.generation, 'directory': self.directory}
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def main():
+    from app.config.config import Config
+    from app.utils.data_cache import DataCache
+
+    parser = argparse.ArgumentParser(description='Load the transaction data once and publish it for attach-mode workers')
+    parser.add_argument('--directory', default=Config.SHARED_DATA_DIR)
+    parser.add_argument('--interval', type=float, default=Config.DATA_PLANE_INTERVAL,
+                        help='seconds between checks of the data file for changes')
+    parser.add_argument('--once', action='store_true', help='publish one generation and exit')
+    args = parser.parse_args()
+
+    # 独立的加载进程自己读取CSV，发布由本函数控制
+    Config.DATA_PLANE = 'local'
+    Config.MODEL_WARMUP = False
+    data_cache = DataCache()
+    publisher = DataPlanePublisher(data_cache, args.directory, args.interval)
+    if not data_cache.load_data():
+        raise SystemExit(1)
+    publisher.publish()
+    if args.once:
+        return
+
+    mtime = os.path.getmtime(Config.DATA_PATH)
+    while True:
+        time.sleep(args.interval)
+        current = os.path.getmtime(Config.DATA_PATH)
+        if current != mtime:
+            mtime = current
+            data_cache.last_update = None
+            if data_cache.load_data():
+                publisher.publish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import time
+from app.utils.tracing import span_mean
+
+
+class Deadline:
+    """
+    请求级的时间预算（请求体中的 deadline_ms）
+    各阶段开始前用 allows() 按该阶段在本进程中的平均耗时判断剩余时间是否足够，不够时跳过或降级并记录下来；
+    截止时间为墙钟时间，可以随任务传给分析进程池中的工作进程
+    """
+
+    def __init__(self, budget_ms=None):
+        self.budget_ms = budget_ms
+        self.started_at = time.time()
+        self.expires_at = None if budget_ms is None else self.started_at + budget_ms / 1000
+        self.skipped = []
+        self.degraded = {}
+
+    @classmethod
+    def from_request(cls, data):
+        """从请求体读取 deadline_ms，未提供时不限时；不是正数时抛出ValueError"""
+        value = data.get('deadline_ms')
+        if value is None:
+            return cls()
+        budget_ms = float(value)
+        if not budget_ms > 0:
+            raise ValueError(f'deadline_ms must be positive: {value}')
+        return cls(budget_ms)
+
+    def remaining(self):
+        if self.expires_at is None:
+            return float('inf')
+        return self.expires_at - time.time()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, *stages):
+        """剩余时间是否够执行这些阶段；没有历史耗时的阶段按0估计"""
+        if self.expires_at is None:
+            return True
+        estimate = sum(span_mean(stage) or 0.0 for stage in stages)
+        return self.remaining() > estimate
+
+    def skip(self, stage):
+        self.skipped.append(stage)
+
+    def degrade(self, stage, mode):
+        self.degraded[stage] = mode
+
+    def report(self):
+        """返回给前端的预算使用情况；未设置 deadline_ms 时返回None"""
+        if self.expires_at is None:
+            return None
+        elapsed_ms = (time.time() - self.started_at) * 1000
+        return {
+            'deadline_ms': self.budget_ms,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'met': elapsed_ms <= self.budget_ms,
+            'skipped': list(self.skipped),
+            'degraded': dict(self.degraded)
+        }
@@ -0,0 +1,127 @@
+"""
+模型输入特征：与训练笔记本相同的特征工程（type独热编码去掉第一类、两个余额差、数值列标准化、缺失值填均值），
+一次把列式批次转换为按训练列顺序排列的C连续float32矩阵，GBC/RF/MLP共用同一个矩阵
+标准化参数由 FeatureScaler 按列名保存为JSON；训练数据即 DATA_PATH，没有参数文件时可以分块流式重新拟合
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# 训练时 pd.get_dummies(drop_first=True) 保留的交易类型（CASH_IN为基准类别）
+TYPE_CATEGORIES = ['CASH_OUT', 'DEBIT', 'PAYMENT', 'TRANSFER']
+
+RAW_NUMERIC_COLUMNS = ['step', 'amount', 'oldbalanceOrg', 'newbalanceOrig', 'oldbalanceDest', 'newbalanceDest']
+
+# 训练时的特征列顺序（与模型的 feature_names_in_ 一致）
+FEATURE_COLUMNS = RAW_NUMERIC_COLUMNS + [f'type_{name}' for name in TYPE_CATEGORIES] + [
+    'balanceDiffOrig', 'balanceDiffDest']
+
+# 训练时标准化的列（float64/int64列，独热列为bool不参与标准化）及其在特征矩阵中的位置
+SCALED_COLUMNS = RAW_NUMERIC_COLUMNS + ['balanceDiffOrig', 'balanceDiffDest']
+SCALED_POSITIONS = np.array([FEATURE_COLUMNS.index(column) for column in SCALED_COLUMNS])
+TYPE_OFFSET = FEATURE_COLUMNS.index(f'type_{TYPE_CATEGORIES[0]}')
+
+
+def _column(batch, name, length):
+    """DataFrame或 {列名: 数组} 中的一列，转为float64；缺少的列视为缺失值"""
+    if name not in batch:
+        return np.full(length, np.nan)
+    return np.asarray(batch[name], dtype=np.float64)
+
+
+def scaled_columns(batch):
+    """批次中需要标准化的各列（未标准化的float64一维数组），顺序为 SCALED_COLUMNS"""
+    length = len(batch['amount'])
+    columns = [_column(batch, name, length) for name in RAW_NUMERIC_COLUMNS]
+    columns.append(columns[2] - columns[3])
+    columns.append(columns[4] - columns[5])
+    return columns
+
+
+class FeatureScaler:
+    """训练时 StandardScaler 的参数：均值和总体标准差（为0时取1），拟合时忽略缺失值"""
+
+    def __init__(self, mean, scale, count=0):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.count = int(count)
+
+    @classmethod
+    def fit(cls, chunks):
+        """按块流式拟合（逐块合并均值和平方差和），结果与整表一次拟合一致"""
+        count = np.zeros(len(SCALED_COLUMNS))
+        mean = np.zeros(len(SCALED_COLUMNS))
+        m2 = np.zeros(len(SCALED_COLUMNS))
+        rows = 0
+        for chunk in chunks:
+            rows += len(chunk['amount'])
+            for j, values in enumerate(scaled_columns(chunk)):
+                values = values[~np.isnan(values)]
+                if len(values) == 0:
+                    continue
+                chunk_mean = values.mean()
+                total = count[j] + len(values)
+                delta = chunk_mean - mean[j]
+                mean[j] += delta * len(values) / total
+                m2[j] += ((values - chunk_mean) ** 2).sum() + delta ** 2 * count[j] * len(values) / total
+                count[j] = total
+        if rows == 0:
+            raise ValueError('No rows to fit the feature scaler')
+        variance = np.divide(m2, count, out=np.zeros_like(m2), where=count > 0)
+        scale = np.sqrt(variance)
+        scale[scale == 0] = 1.0
+        return cls(mean, scale, rows)
+
+    @classmethod
+    def fit_csv(cls, path, chunk_rows):
+        """用训练数据CSV拟合，只读取数值列并按float64解析（与训练时一致）"""
+        with pd.read_csv(path, usecols=RAW_NUMERIC_COLUMNS, dtype=np.float64, chunksize=chunk_rows) as reader:
+            return cls.fit(reader)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            params = json.load(f)
+        columns = params['columns']
+        if columns != SCALED_COLUMNS:
+            raise ValueError(f'Feature scaler columns {columns} do not match {SCALED_COLUMNS}')
+        return cls(params['mean'], params['scale'], params.get('count', 0))
+
+    def save(self, path):
+        """先写临时文件再替换，其他进程不会读到写了一半的参数"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f'{path}.tmp{os.getpid()}'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'columns': SCALED_COLUMNS,
+                'mean': self.mean.tolist(),
+                'scale': self.scale.tolist(),
+                'count': self.count
+            }, f, indent=2)
+        os.replace(temp_path, path)
+
+
+def build_features(batch, scaler):
+    """
+    列式批次（DataFrame或 {列名: 数组}，至少包含amount和type）-> (行数, 12) 的C连续float32矩阵，列顺序为 FEATURE_COLUMNS
+    数值列在float64下标准化后再写入，缺失值填0（即训练数据的均值）；不在 TYPE_CATEGORIES 中的类型各独热列均为0
+    """
+    columns = scaled_columns(batch)
+    features = np.zeros((len(columns[0]), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for j, values in enumerate(columns):
+        values = values - scaler.mean[j]
+        values /= scaler.scale[j]
+        features[:, SCALED_POSITIONS[j]] = values
+    np.nan_to_num(features, copy=False, nan=0.0)
+    # 分类列按类别编码、字符串列按去重后的取值比较，不逐行比较字符串
+    types = batch['type']
+    if not isinstance(types, (pd.Series, pd.Index, np.ndarray)):
+        types = np.asarray(types, dtype=object)
+    codes, uniques = pd.factorize(types)
+    lookup = np.array([TYPE_CATEGORIES.index(value) if value in TYPE_CATEGORIES else -1 for value in uniques] + [-1])
+    positions = lookup[codes]
+    rows = np.flatnonzero(positions >= 0)
+    features[rows, TYPE_OFFSET + positions[rows]] = 1.0
+    return features
@@ -0,0 +1,185 @@
+import numpy as np
+
+
+def graph_to_arrays(G):
+    """将networkx图转换为整数节点编号和边数组"""
+    nodes = list(G.nodes())
+    node_index = {node: i for i, node in enumerate(nodes)}
+    num_edges = G.number_of_edges()
+    src = np.fromiter((node_index[u] for u, _ in G.edges()), dtype=np.int64, count=num_edges)
+    dst = np.fromiter((node_index[v] for _, v in G.edges()), dtype=np.int64, count=num_edges)
+    return nodes, node_index, src, dst
+
+
+def build_csr(src, dst, num_nodes, symmetric=False):
+    """Build a deduplicated CSR adjacency (indptr, indices) without self loops"""
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    if symmetric:
+        src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+    keep = src != dst
+    keys = np.unique(src[keep] * num_nodes + dst[keep])
+    rows = keys // num_nodes
+    indices = keys % num_nodes
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return indptr, indices
+
+
+def expand_ranges(starts, counts):
+    """Concatenate arange(s, s + c) for every (s, c) pair without a Python loop"""
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(np.asarray(starts, dtype=np.int64), counts) + (np.arange(total) - offsets)
+
+
+def connected_components(num_nodes, src, dst):
+    """Label connected components with a vectorized union-find (hooking + pointer jumping)"""
+    labels = np.arange(num_nodes, dtype=np.int64)
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    if len(src) == 0:
+        return labels
+    while True:
+        root_u = labels[src]
+        root_v = labels[dst]
+        pending = root_u != root_v
+        if not pending.any():
+            break
+        low = np.minimum(root_u[pending], root_v[pending])
+        np.minimum.at(labels, root_u[pending], low)
+        np.minimum.at(labels, root_v[pending], low)
+        # 路径压缩，直到每个节点都直接指向根节点
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+def relabel(labels):
+    """Map arbitrary component roots to consecutive ids in order of first appearance"""
+    _, first_index, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first_index, kind='stable'), kind='stable')
+    return order[inverse]
+
+
+def label_propagation(indptr, indices, max_iter=20):
+    """
+    Deterministic synchronous label propagation over a CSR adjacency
+    Each node adopts the most frequent label among its neighbours and itself; ties go to the smallest label
+    """
+    num_nodes = len(indptr) - 1
+    labels = np.arange(num_nodes, dtype=np.int64)
+    if num_nodes == 0:
+        return labels
+    # 计入节点自身的标签，抑制同步更新在二分结构上的来回振荡
+    rows = np.concatenate([np.repeat(np.arange(num_nodes), np.diff(indptr)), np.arange(num_nodes)])
+    cols = np.concatenate([np.asarray(indices, dtype=np.int64), np.arange(num_nodes)])
+    for _ in range(max_iter):
+        keys, counts = np.unique(rows * num_nodes + labels[cols], return_counts=True)
+        key_rows = keys // num_nodes
+        key_labels = keys % num_nodes
+        order = np.lexsort((key_labels, -counts, key_rows))
+        _, first = np.unique(key_rows[order], return_index=True)
+        new_labels = key_labels[order][first]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return relabel(labels)
+
+
+def radius_neighbor_pairs(X, eps, block_size=1024, precomputed=False):
+    """Return (i, j) index pairs whose euclidean distance is below eps, computed in row blocks"""
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    rows, cols = [], []
+    if precomputed:
+        for start in range(0, n, block_size):
+            block_rows, block_cols = np.nonzero(X[start:start + block_size] < eps)
+            rows.append(block_rows + start)
+            cols.append(block_cols)
+    else:
+        squared_norms = np.einsum('ij,ij->i', X, X)
+        eps_squared = eps * eps
+        for start in range(0, n, block_size):
+            block = X[start:start + block_size]
+            d2 = squared_norms[start:start + block_size, None] + squared_norms[None, :] - 2.0 * (block @ X.T)
+            np.maximum(d2, 0, out=d2)
+            block_rows, block_cols = np.nonzero(d2 < eps_squared)
+            rows.append(block_rows + start)
+            cols.append(block_cols)
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(rows).astype(np.int64), np.concatenate(cols).astype(np.int64)
+
+
+def dbscan_labels(X, eps=0.5, min_samples=5, precomputed=False, block_size=1024):
+    """DBSCAN over a blocked radius graph; core points are merged with union-find"""
+    n = len(X)
+    labels = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return labels
+    rows, cols = radius_neighbor_pairs(X, eps, block_size=block_size, precomputed=precomputed)
+    neighbor_counts = np.bincount(rows, minlength=n)
+    is_core = neighbor_counts >= min_samples
+    if not is_core.any():
+        return labels
+
+    core_edges = is_core[rows] & is_core[cols]
+    roots = connected_components(n, rows[core_edges], cols[core_edges])
+    labels[is_core] = relabel(roots[is_core])
+
+    # 边界点归入其第一个核心邻居所在的簇
+    border = ~is_core[rows] & is_core[cols]
+    if border.any():
+        border_rows, first = np.unique(rows[border], return_index=True)
+        labels[border_rows] = labels[cols[border][first]]
+    return labels
+
+
+def common_neighbor_candidates(indptr, indices, scores, top_k, block_size=2048):
+    """
+    基于A·A计算两跳且不直接相连的节点对及其共同邻居数
+    按 (score, similarity) 降序，每个行块只保留top_k，保证内存受块大小约束
+    """
+    num_nodes = len(indptr) - 1
+    degrees = np.diff(indptr)
+    adjacency_keys = np.repeat(np.arange(num_nodes, dtype=np.int64), degrees) * num_nodes + indices
+    best = []
+    for start in range(0, num_nodes, block_size):
+        end = min(start + block_size, num_nodes)
+        first_hop = indices[indptr[start]:indptr[end]]
+        first_rows = np.repeat(np.arange(start, end, dtype=np.int64), degrees[start:end])
+        if len(first_hop) == 0:
+            continue
+        second_hop = indices[expand_ranges(indptr[first_hop], degrees[first_hop])]
+        second_rows = np.repeat(first_rows, degrees[first_hop])
+        keys = second_rows * num_nodes + second_hop
+        keys = keys[second_rows != second_hop]
+        if len(keys) == 0:
+            continue
+        keys, common = np.unique(keys, return_counts=True)
+        # adjacency_keys已排序，二分查找排除已有边
+        pos = np.searchsorted(adjacency_keys, keys)
+        pos[pos == len(adjacency_keys)] = 0
+        not_adjacent = adjacency_keys[pos] != keys if len(adjacency_keys) else np.ones(len(keys), dtype=bool)
+        keys, common = keys[not_adjacent], common[not_adjacent]
+        if len(keys) == 0:
+            continue
+        src = keys // num_nodes
+        dst = keys % num_nodes
+        similarity = common / np.maximum(np.maximum(degrees[src], degrees[dst]), 1)
+        pair_scores = (scores[src] + scores[dst]) / 2
+        order = np.lexsort((-similarity, -pair_scores))[:top_k]
+        best.append((src[order], dst[order], similarity[order], pair_scores[order]))
+    if not best:
+        empty = np.zeros(0)
+        return empty.astype(np.int64), empty.astype(np.int64), empty, empty
+    src, dst, similarity, pair_scores = (np.concatenate(parts) for parts in zip(*best))
+    order = np.lexsort((-similarity, -pair_scores))[:top_k]
+    return src[order], dst[order], similarity[order], pair_scores[order]
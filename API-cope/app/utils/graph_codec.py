@@ -0,0 +1,162 @@
+import json
+import numpy as np
+from app.utils.optimize import index_graph
+from app.utils.serialization import dumps
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+GRAPH_FORMAT = 'graph-columns/1'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# 节点/边的标志位
+NODE_FLAG_AGGREGATED = 1
+EDGE_FLAG_POTENTIAL = 1
+
+NODE_COLUMNS = {
+    'value': np.float32,
+    'risk_score': np.float32,
+    'tx_count': np.uint32,
+    'category': np.int16,
+    'symbol_size': np.float32,
+    'gnn_cluster': np.int32,  # -1 表示不属于任何簇
+    'node_count': np.uint32,  # 聚合节点包含的节点数，普通节点为0
+    'flags': np.uint8
+}
+
+EDGE_COLUMNS = {
+    'src': np.uint32,  # strings 中的下标
+    'dst': np.uint32,
+    'value': np.float32,
+    'risk_score': np.float32,
+    'similarity': np.float32,
+    'transaction_count': np.uint32,  # 合并边包含的交易数，未合并的边为1
+    'flags': np.uint8
+}
+
+
+def negotiate_graph_format(accept_mimetypes):
+    """根据 Accept 头选择二进制图格式，客户端未请求或依赖不可用时返回None（使用JSON）"""
+    candidates = []
+    if ARROW_AVAILABLE:
+        candidates.append(ARROW_MIMETYPE)
+    if MSGPACK_AVAILABLE:
+        candidates.append(MSGPACK_MIMETYPE)
+    if not candidates:
+        return None
+    # JSON排在最前，Accept为 */* 或未指定时仍返回JSON
+    best = accept_mimetypes.best_match(['application/json'] + candidates, default=None)
+    return best if best in candidates else None
+
+
+def _column(items, key, dtype, default=0):
+    return np.fromiter((item.get(key, default) for item in items), dtype=dtype, count=len(items))
+
+
+def graph_to_columns(response_data):
+    """
+    将 {'nodes', 'edges', ...} 响应转换为列式表示：
+    节点id放入字符串表，边端点用uint32下标表示，数值列使用float32/整数数组，布尔属性压入标志位
+    所有映射的键都是字符串，客户端用默认参数的 msgpack.unpackb（strict_map_key=True）即可解码
+    """
+    nodes = response_data.get('nodes', [])
+    edges = response_data.get('edges', [])
+    node_index, src, dst, _ = index_graph(nodes, edges)
+
+    node_columns = {
+        'value': _column(nodes, 'value', NODE_COLUMNS['value']),
+        'risk_score': _column(nodes, 'risk_score', NODE_COLUMNS['risk_score']),
+        'tx_count': _column(nodes, 'tx_count', NODE_COLUMNS['tx_count']),
+        'category': _column(nodes, 'category', NODE_COLUMNS['category']),
+        'symbol_size': _column(nodes, 'symbolSize', NODE_COLUMNS['symbol_size']),
+        'gnn_cluster': np.fromiter((-1 if node.get('gnn_cluster') is None else node['gnn_cluster'] for node in nodes),
+                                   dtype=NODE_COLUMNS['gnn_cluster'], count=len(nodes)),
+        'node_count': _column(nodes, 'node_count', NODE_COLUMNS['node_count']),
+        'flags': _column(nodes, 'is_aggregated', NODE_COLUMNS['flags'], False) * NODE_FLAG_AGGREGATED
+    }
+    edge_columns = {
+        'src': src.astype(EDGE_COLUMNS['src']),
+        'dst': dst.astype(EDGE_COLUMNS['dst']),
+        'value': _column(edges, 'value', EDGE_COLUMNS['value']),
+        'risk_score': _column(edges, 'risk_score', EDGE_COLUMNS['risk_score']),
+        'similarity': _column(edges, 'similarity', EDGE_COLUMNS['similarity']),
+        'transaction_count': _column(edges, 'transaction_count', EDGE_COLUMNS['transaction_count'], 1),
+        'flags': _column(edges, 'is_potential', EDGE_COLUMNS['flags'], False) * EDGE_FLAG_POTENTIAL
+    }
+    # 只有显示名和id不同的节点（如聚合节点）才单独记录名称，以节点下标和名称两个并列数组表示
+    named = [(i, node['name']) for i, node in enumerate(nodes) if node.get('name', node['id']) != node['id']]
+    names = {'index': [i for i, _ in named], 'name': [name for _, name in named]}
+
+    # 元数据（paths、gnn_info等）按JSON响应的规则规范化：整数键（如簇编号）转为字符串，NumPy标量转为Python值
+    meta = json.loads(dumps({key: value for key, value in response_data.items() if key not in ('nodes', 'edges')}))
+    return {
+        'format': GRAPH_FORMAT,
+        'strings': [str(node_id) for node_id in node_index],
+        'node_count': len(nodes),
+        'names': names,
+        'nodes': node_columns,
+        'edges': edge_columns,
+        'meta': meta
+    }
+
+
+def encode_msgpack(columns):
+    """数组以小端字节串存放，dtypes 中记录每列的类型，客户端可直接按类型数组读取"""
+    payload = {
+        'format': columns['format'],
+        'strings': columns['strings'],
+        'node_count': columns['node_count'],
+        'names': columns['names'],
+        'dtypes': {
+            'nodes': {name: np.dtype(dtype).newbyteorder('<').str for name, dtype in NODE_COLUMNS.items()},
+            'edges': {name: np.dtype(dtype).newbyteorder('<').str for name, dtype in EDGE_COLUMNS.items()}
+        },
+        'nodes': {name: array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes()
+                  for name, array in columns['nodes'].items()},
+        'edges': {name: array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes()
+                  for name, array in columns['edges'].items()},
+        'meta': columns['meta']
+    }
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode_arrow(columns):
+    """
+    编码为单行的Arrow IPC流：每一列都是一个list数组（strings、nodes.*、edges.*）
+    paths/gnn_info等元数据以JSON形式放在schema metadata中
+    """
+    arrays = {'strings': pa.array([columns['strings']], type=pa.list_(pa.string()))}
+    for prefix in ('nodes', 'edges'):
+        for name, array in columns[prefix].items():
+            arrays[f"{prefix}.{name}"] = pa.ListArray.from_arrays(
+                pa.array([0, len(array)], type=pa.int32()), pa.array(array))
+    metadata = {
+        'format': columns['format'],
+        'node_count': str(columns['node_count']),
+        'names': json.dumps(columns['names'], ensure_ascii=False),
+        'meta': json.dumps(columns['meta'], ensure_ascii=False)
+    }
+    batch = pa.RecordBatch.from_pydict(arrays).replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_graph(response_data, mimetype):
+    columns = graph_to_columns(response_data)
+    if mimetype == ARROW_MIMETYPE:
+        return encode_arrow(columns)
+    if mimetype == MSGPACK_MIMETYPE:
+        return encode_msgpack(columns)
+    raise ValueError(f"Unsupported graph format: {mimetype}")
@@ -0,0 +1,87 @@
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+
+
+class ImportProfiler:
+    """
+    启动阶段的导入耗时统计，类似 python -X importtime
+    记录每个模块首次导入的累计耗时和自身耗时（扣除其间导入的子模块）
+    """
+
+    def __init__(self):
+        self.records = {}
+        self._stack = []
+        self._original_import = None
+        self._thread_id = None
+        self.started_at = None
+        self.total_seconds = None
+
+    def start(self):
+        if self._original_import is not None:
+            return self
+        self._original_import = builtins.__import__
+        self._thread_id = threading.get_ident()
+        self.started_at = time.perf_counter()
+        builtins.__import__ = self._import
+        return self
+
+    def stop(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+            self.total_seconds = time.perf_counter() - self.started_at
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # 只统计启动线程，后台预热线程的导入直接放行
+        if threading.get_ident() != self._thread_id:
+            return self._original_import(name, globals, locals, fromlist, level)
+        module_name = self._absolute_name(name, globals, level)
+        if module_name is None or module_name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            if module_name not in self.records:
+                self.records[module_name] = {'cumulative': elapsed, 'self': elapsed - children}
+
+    @staticmethod
+    def _absolute_name(name, globals, level):
+        if not level:
+            return name
+        package = (globals or {}).get('__package__')
+        if not package:
+            return None
+        try:
+            return importlib.util.resolve_name('.' * level + name, package)
+        except (ImportError, ValueError):
+            return None
+
+    def top(self, limit=20, key='cumulative'):
+        """按耗时降序返回 (模块名, 累计秒数, 自身秒数)"""
+        rows = sorted(self.records.items(), key=lambda item: item[1][key], reverse=True)[:limit]
+        return [(name, record['cumulative'], record['self']) for name, record in rows]
+
+    def report(self, limit=20):
+        lines = [f"Import profile: {len(self.records)} modules, "
+                 f"{(self.total_seconds or 0) * 1000:.1f} ms total"]
+        lines.append(f"{'cumulative ms':>14} {'self ms':>10}  module")
+        for name, cumulative, self_time in self.top(limit):
+            lines.append(f"{cumulative * 1000:>14.1f} {self_time * 1000:>10.1f}  {name}")
+        return '\n'.join(lines)
@@ -1,7 +1,8 @@
 import logging
+from app.config.config import Config
 
 def setup_logger():
-    logging.basicConfig(level=logging.DEBUG)
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL, logging.INFO))
     logger = logging.getLogger(__name__)
     return logger
 
@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+from datetime import datetime
+from app.utils.logger import logger
+
+
+class ModelEntry:
+    """单个模型的加载状态"""
+
+    def __init__(self, name, path, loader):
+        self.name = name
+        self.path = path
+        self.loader = loader
+        self.model = None
+        self.state = 'unloaded'  # unloaded / loading / ready / failed
+        self.error = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.file_mtime = None
+        self.version = 0
+        self.failures = 0  # 连续加载失败次数，决定重试前的等待时间
+        self.failed_at = None
+        self.lock = threading.Lock()
+
+    def status(self):
+        return {
+            'state': self.state,
+            'path': self.path,
+            'version': self.version,
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'load_seconds': self.load_seconds,
+            'error': self.error,
+            'failures': self.failures
+        }
+
+
+class ModelRegistry:
+    """
+    模型注册表：首次使用时才加载模型，支持后台预热和热替换
+    loader是一个接收文件路径并返回模型对象的函数，重型依赖在loader内部导入
+    加载失败的模型在退避时间（每次连续失败翻倍，最长max_retry_backoff秒）过后或模型文件变化后重新尝试加载
+    """
+
+    def __init__(self, retry_backoff=30.0, max_retry_backoff=600.0):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+
+    def register(self, name, path, loader):
+        with self._lock:
+            self._entries[name] = ModelEntry(name, path, loader)
+
+    def retarget(self, name, path, loader):
+        """
+        让尚未加载（或加载失败）的模型下次使用时从新的位置加载；已就绪的模型不受影响
+        返回模型是否仍未就绪（即仍会从path加载）
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            self.register(name, path, loader)
+            return True
+        with entry.lock:
+            if entry.state == 'ready':
+                return False
+            entry.path = path
+            entry.loader = loader
+            if entry.state == 'failed':
+                entry.state = 'unloaded'
+                entry.error = None
+        return True
+
+    def names(self):
+        return list(self._entries.keys())
+
+    def get(self, name, wait=True, timeout=None):
+        """获取模型，未加载时在当前线程加载；加载失败返回None"""
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        if entry.state == 'ready':
+            return entry.model
+        if not wait or (entry.state == 'failed' and not self._should_retry(entry)):
+            return None
+        if entry.lock.acquire(timeout=-1 if timeout is None else timeout):
+            try:
+                if entry.state != 'ready' and (entry.state != 'failed' or self._should_retry(entry)):
+                    self._load(entry)
+            finally:
+                entry.lock.release()
+        return entry.model if entry.state == 'ready' else None
+
+    def _should_retry(self, entry):
+        """加载失败的模型是否可以重试：退避时间已过，或模型文件在失败后发生了变化（例如热替换时文件正在写入）"""
+        backoff = min(self.retry_backoff * 2 ** max(entry.failures - 1, 0), self.max_retry_backoff)
+        if entry.failed_at is None or time.time() - entry.failed_at >= backoff:
+            return True
+        return self._mtime(entry.path) != entry.file_mtime
+
+    def is_ready(self, name):
+        entry = self._entries.get(name)
+        return entry is not None and entry.state == 'ready'
+
+    def status(self):
+        return {name: entry.status() for name, entry in self._entries.items()}
+
+    def warm_up(self, names=None):
+        """在后台线程中依次加载模型，不阻塞应用启动"""
+        names = names or self.names()
+
+        def _run():
+            for name in names:
+                self.get(name)
+            logger.info(f"Model warm-up finished: {self.status()}")
+
+        thread = threading.Thread(target=_run, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def reload(self, name, path=None, loader=None):
+        """
+        热替换：在锁外加载新模型，成功后再原子替换
+        加载失败时保留旧模型继续服务；传入loader时之后的加载也改用新的loader
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model: {name}")
+        path = path or entry.path
+        loader = loader or entry.loader
+        start_time = time.time()
+        new_model = loader(path)
+        with entry.lock:
+            entry.model = new_model
+            entry.path = path
+            entry.loader = loader
+            entry.state = 'ready'
+            entry.error = None
+            entry.loaded_at = datetime.now()
+            entry.load_seconds = round(time.time() - start_time, 3)
+            entry.file_mtime = self._mtime(path)
+            entry.version += 1
+            entry.failures = 0
+            entry.failed_at = None
+        logger.info(f"Hot-swapped model '{name}' from {path} (version {entry.version})")
+        return entry.status()
+
+    def check_for_updates(self):
+        """模型文件发生变化时自动重新加载；加载失败的模型到了可以重试的时候也在这里重新加载"""
+        reloaded = []
+        for name, entry in list(self._entries.items()):
+            if entry.state == 'failed':
+                if self._should_retry(entry) and self.get(name, timeout=0) is not None:
+                    reloaded.append(name)
+                continue
+            if entry.state != 'ready':
+                continue
+            mtime = self._mtime(entry.path)
+            if mtime is not None and entry.file_mtime is not None and mtime > entry.file_mtime:
+                try:
+                    self.reload(name)
+                    reloaded.append(name)
+                except Exception as e:
+                    logger.error(f"Failed to reload model '{name}': {e}")
+        return reloaded
+
+    def watch(self, interval):
+        """按固定间隔检查模型文件是否更新"""
+        if self._watcher is not None or interval <= 0:
+            return self._watcher
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                self.check_for_updates()
+
+        self._watcher = threading.Thread(target=_run, name='model-watcher', daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def _load(self, entry):
+        entry.state = 'loading'
+        start_time = time.time()
+        try:
+            logger.info(f"Loading model '{entry.name}' from {entry.path}")
+            entry.model = entry.loader(entry.path)
+            entry.state = 'ready'
+            entry.error = None
+            entry.loaded_at = datetime.now()
+            entry.file_mtime = self._mtime(entry.path)
+            entry.version += 1
+            entry.failures = 0
+            entry.failed_at = None
+            logger.info(f"Model '{entry.name}' ready in {time.time() - start_time:.2f} seconds")
+        except Exception as e:
+            logger.error(f"Error loading model '{entry.name}' (attempt {entry.failures + 1}): {e}")
+            entry.model = None
+            entry.state = 'failed'
+            entry.error = str(e)
+            entry.failures += 1
+            entry.failed_at = time.time()
+            # 记录失败时的文件状态，文件之后被替换（或重新出现）时立即重试
+            entry.file_mtime = self._mtime(entry.path)
+        finally:
+            entry.load_seconds = round(time.time() - start_time, 3)
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
@@ -1,116 +1,196 @@
+import numpy as np
+from app.utils.tracing import traced
+
+HIGH_RISK_THRESHOLD = 0.6
+MIN_AGGREGATE_SIZE = 5
+
+
+def index_graph(nodes, edges):
+    """
+    将节点/边列表转换为整数编号的数组表示
+    边中出现但不在节点列表里的id追加在末尾，is_node标记其是否为真实节点
+    """
+    node_index = {}
+    for node in nodes:
+        node_index.setdefault(node['id'], len(node_index))
+    num_listed = len(node_index)
+
+    def lookup(node_id):
+        index = node_index.get(node_id)
+        if index is None:
+            index = node_index[node_id] = len(node_index)
+        return index
+
+    src = np.fromiter((lookup(edge['source']) for edge in edges), dtype=np.int64, count=len(edges))
+    dst = np.fromiter((lookup(edge['target']) for edge in edges), dtype=np.int64, count=len(edges))
+    is_node = np.zeros(len(node_index), dtype=bool)
+    is_node[:num_listed] = True
+    return node_index, src, dst, is_node
+
+
+def _node_column(nodes, key, size, dtype=np.float64):
+    column = np.zeros(size, dtype=dtype)
+    column[:len(nodes)] = np.fromiter((node.get(key, 0) for node in nodes), dtype=dtype, count=len(nodes))
+    return column
+
+
+def classify_nodes(unique_nodes, edges):
+    """
+    节点分类：高风险节点、需要保留的节点（高风险及其1跳/2跳邻居）、可按类别聚合的低风险节点
+    unique_nodes中的id必须唯一
+    """
+    node_index, src, dst, is_node = index_graph(unique_nodes, edges)
+    num_nodes = len(node_index)
+    num_listed = len(unique_nodes)
+
+    risk = _node_column(unique_nodes, 'risk_score', num_nodes)
+    high_risk = is_node & (risk >= HIGH_RISK_THRESHOLD)
+
+    # 1跳：与高风险节点直接相连的节点
+    connected = np.zeros(num_nodes, dtype=bool)
+    connected[dst[high_risk[src]]] = True
+    connected[src[high_risk[dst]]] = True
+
+    # 2跳：与1跳节点相连且本身不是高风险的节点
+    second_degree = np.zeros(num_nodes, dtype=bool)
+    second_degree[dst[connected[src] & ~high_risk[dst]]] = True
+    second_degree[src[connected[dst] & ~high_risk[src]]] = True
+
+    keep = (high_risk | connected | second_degree) & is_node
+    low_risk = is_node & ~keep & (risk < HIGH_RISK_THRESHOLD)
+
+    # 类别编码顺序与其在节点列表中首次出现的顺序一致
+    categories = [node.get('category', 0) for node in unique_nodes]
+    category_index = {}
+    category_codes = np.fromiter((category_index.setdefault(c, len(category_index)) for c in categories),
+                                 dtype=np.int64, count=num_listed)
+    low_positions = np.flatnonzero(low_risk[:num_listed])
+    return {
+        'node_index': node_index,
+        'src': src,
+        'dst': dst,
+        'risk': risk,
+        'high_risk': high_risk,
+        'keep': keep,
+        'low_positions': low_positions,
+        'low_codes': category_codes[low_positions],
+        'category_values': list(category_index.keys())
+    }
+
+
+def aggregate_groups(nodes, edges):
+    """返回 {聚合节点id: 成员节点列表}，与optimize_fraud_detection_response中的agg_cat_*节点一一对应"""
+    unique_nodes = list({node['id']: node for node in nodes}.values())
+    classes = classify_nodes(unique_nodes, edges)
+    low_positions, low_codes = classes['low_positions'], classes['low_codes']
+    groups = {}
+    for code in np.unique(low_codes):
+        members = low_positions[low_codes == code]
+        if len(members) > MIN_AGGREGATE_SIZE:
+            groups[f"agg_cat_{classes['category_values'][code]}"] = [unique_nodes[i] for i in members]
+    return groups
+
+
+@traced()
 def optimize_fraud_detection_response(paths, nodes, edges, gnn_info):
     """
     为诈骗检测项目优化响应数据
     保留高风险信息同时减少数据量
+    节点和边先映射为整数数组，扩展、聚合、合并均为向量化操作
     """
-    high_risk_threshold = 0.6
-    high_risk_nodes = {node['id'] for node in nodes if node.get('risk_score', 0) >= high_risk_threshold}
-    connected_nodes = set()
-    second_degree = set()
-    for edge in edges:
-        if edge['source'] in high_risk_nodes:
-            connected_nodes.add(edge['target'])
-        if edge['target'] in high_risk_nodes:
-            connected_nodes.add(edge['source'])
-
-    for edge in edges:
-        if edge['source'] in connected_nodes and edge['target'] not in high_risk_nodes:
-            second_degree.add(edge['target'])
-        if edge['target'] in connected_nodes and edge['source'] not in high_risk_nodes:
-            second_degree.add(edge['source'])
-
-    nodes_to_keep = high_risk_nodes.union(connected_nodes).union(second_degree)
-
-    low_risk_nodes = {node['id'] for node in nodes
-                      if node['id'] not in nodes_to_keep
-                      and node.get('risk_score', 0) < high_risk_threshold}
-
-    category_groups = {}
-    for node in nodes:
-        if node['id'] in low_risk_nodes:
-            category = node.get('category', 0)
-            if category not in category_groups:
-                category_groups[category] = []
-            category_groups[category].append(node)
+    # 节点id应当唯一，重复时保留最后一次出现的属性
+    unique_nodes = list({node['id']: node for node in nodes}.values())
+    classes = classify_nodes(unique_nodes, edges)
+    src, dst = classes['src'], classes['dst']
+    num_nodes = len(classes['node_index'])
+    num_listed = len(unique_nodes)
+    risk, high_risk, keep = classes['risk'], classes['high_risk'], classes['keep']
 
-    aggregated_nodes = []
-    for category, node_list in category_groups.items():
-        if len(node_list) > 5:  # 只聚合数量足够多的节点
-            agg_value = sum(node.get('value', 0) for node in node_list)
-            avg_risk = sum(node.get('risk_score', 0) for node in node_list) / len(node_list)
+    # 按类别聚合低风险节点
+    low_positions, low_codes = classes['low_positions'], classes['low_codes']
+    category_values = classes['category_values']
+    num_categories = len(category_values)
+    group_sizes = np.bincount(low_codes, minlength=num_categories)
+    group_values = np.bincount(low_codes, weights=_node_column(unique_nodes, 'value', num_listed)[low_positions],
+                               minlength=num_categories)
+    group_tx_counts = np.bincount(low_codes, weights=_node_column(unique_nodes, 'tx_count', num_listed)[low_positions],
+                                  minlength=num_categories)
+    group_risks = np.bincount(low_codes, weights=risk[low_positions], minlength=num_categories)
 
+    in_output = keep.copy()
+    aggregated_nodes = []
+    _, first_positions = np.unique(low_codes, return_index=True)
+    for code in low_codes[np.sort(first_positions)]:
+        size = int(group_sizes[code])
+        category = category_values[code]
+        if size > MIN_AGGREGATE_SIZE:  # 只聚合数量足够多的节点
             aggregated_nodes.append({
                 'id': f"agg_cat_{category}",
                 'name': f"{'商户' if category == 0 else '个人'} 群组",
-                'value': agg_value,
-                'tx_count': sum(node.get('tx_count', 0) for node in node_list),
+                'value': float(group_values[code]),
+                'tx_count': int(group_tx_counts[code]),
                 'category': category,
-                'risk_score': avg_risk,
+                'risk_score': float(group_risks[code] / size),
                 'symbolSize': 35,  # 稍大的尺寸表示聚合节点
                 'is_aggregated': True,
-                'node_count': len(node_list)
+                'node_count': size
             })
         else:
-            aggregated_nodes.extend(node_list)
+            members = low_positions[low_codes == code]
+            in_output[members] = True
+            aggregated_nodes.extend(unique_nodes[i] for i in members)
 
-    for node in nodes:
-        if node['id'] in nodes_to_keep:
-            optimized_node = {
-                'id': node['id'],
-                'name': node.get('name', node['id']),
-                'value': node.get('value', 0),
-                'tx_count': node.get('tx_count', 0),
-                'category': node.get('category', 0),
-                'risk_score': round(node.get('risk_score', 0), 4),  # 保留4位小数的精度
-                'symbolSize': node.get('symbolSize', 25),
-            }
-
-            if node.get('gnn_cluster') is not None:
-                optimized_node['gnn_cluster'] = node['gnn_cluster']
-            aggregated_nodes.append(optimized_node)
+    # 高风险及其关联节点
+    for i in np.flatnonzero(keep):
+        node = unique_nodes[i]
+        optimized_node = {
+            'id': node['id'],
+            'name': node.get('name', node['id']),
+            'value': node.get('value', 0),
+            'tx_count': node.get('tx_count', 0),
+            'category': node.get('category', 0),
+            'risk_score': round(node.get('risk_score', 0), 4),  # 保留4位小数的精度
+            'symbolSize': node.get('symbolSize', 25),
+        }
+        if node.get('gnn_cluster') is not None:
+            optimized_node['gnn_cluster'] = node['gnn_cluster']
+        aggregated_nodes.append(optimized_node)
 
+    # 与高风险节点相连的边逐条保留
+    touches_high_risk = high_risk[src] | high_risk[dst]
     optimized_edges = []
-    node_ids = {node['id'] for node in aggregated_nodes}
-    edge_map = {}
-    for edge in edges:
-        source = edge['source']
-        target = edge['target']
-        source_in_agg = source in node_ids
-        target_in_agg = target in node_ids
-        if not source_in_agg and not target_in_agg:
-            continue
-        if source in high_risk_nodes or target in high_risk_nodes:
-            optimized_edges.append({
-                'source': source,
-                'target': target,
-                'value': edge.get('value', 0),
-                'risk_score': round(edge.get('risk_score', 0), 4),
-                'is_potential': edge.get('is_potential', False)
-            })
-        else:
-            source_node = next((n for n in aggregated_nodes if n['id'] == source), None)
-            target_node = next((n for n in aggregated_nodes if n['id'] == target), None)
-            if source_node and target_node:
-                edge_key = f"{source}_{target}"
-                if edge_key not in edge_map:
-                    edge_map[edge_key] = {
-                        'source': source,
-                        'target': target,
-                        'value': 0,
-                        'risk_score': 0,
-                        'transaction_count': 0
-                    }
-                edge_map[edge_key]['value'] += edge.get('value', 0)
-                edge_map[edge_key]['risk_score'] = max(edge_map[edge_key]['risk_score'], edge.get('risk_score', 0))
-                edge_map[edge_key]['transaction_count'] += 1
-    for edge_data in edge_map.values():
+    for i in np.flatnonzero(touches_high_risk):
+        edge = edges[i]
         optimized_edges.append({
-            'source': edge_data['source'],
-            'target': edge_data['target'],
-            'value': edge_data['value'],
-            'risk_score': round(edge_data['risk_score'], 4),
-            'transaction_count': edge_data['transaction_count']
+            'source': edge['source'],
+            'target': edge['target'],
+            'value': edge.get('value', 0),
+            'risk_score': round(edge.get('risk_score', 0), 4),
+            'is_potential': edge.get('is_potential', False)
         })
+
+    # 其余两端都保留的边按 (src, dst) 合并
+    mergeable = np.flatnonzero(~touches_high_risk & in_output[src] & in_output[dst])
+    if len(mergeable):
+        keys = src[mergeable] * num_nodes + dst[mergeable]
+        unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        edge_values = np.fromiter((edges[i].get('value', 0) for i in mergeable), dtype=np.float64, count=len(mergeable))
+        edge_risks = np.fromiter((edges[i].get('risk_score', 0) for i in mergeable), dtype=np.float64, count=len(mergeable))
+        merged_values = np.bincount(inverse, weights=edge_values, minlength=len(unique_keys))
+        merged_counts = np.bincount(inverse, minlength=len(unique_keys))
+        merged_risks = np.zeros(len(unique_keys))
+        np.maximum.at(merged_risks, inverse, edge_risks)
+        for k in np.argsort(first_index, kind='stable'):
+            edge = edges[mergeable[first_index[k]]]
+            optimized_edges.append({
+                'source': edge['source'],
+                'target': edge['target'],
+                'value': float(merged_values[k]),
+                'risk_score': round(float(merged_risks[k]), 4),
+                'transaction_count': int(merged_counts[k])
+            })
+
     optimized_paths = []
     for path in paths:
         optimized_paths.append({
@@ -145,6 +225,6 @@ def optimize_fraud_detection_response(paths, nodes, edges, gnn_info):
             'optimized_node_count': len(aggregated_nodes),
             'original_edge_count': len(edges),
             'optimized_edge_count': len(optimized_edges),
-            'high_risk_node_count': len(high_risk_nodes)
+            'high_risk_node_count': int(high_risk.sum())
         }
-    } 
\ No newline at end of file
+    }
@@ -0,0 +1,79 @@
+import threading
+from app.utils.serialization import dumps
+
+
+class RecentBuffer:
+    """
+    固定容量的环形缓冲区，保存最近写入的N条记录
+    写入时按已注册的视图把每条记录预先渲染为JSON片段，
+    读取时拼接片段并按版本号缓存整个JSON数组，数据未变化时直接返回缓存
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self._slots = [None] * self.capacity  # 每个槽位: (记录, {视图名: JSON片段})
+        self._next = 0
+        self._size = 0
+        self.version = 0
+        self._views = {}
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def add_view(self, name, render):
+        """注册视图：render接收一条记录，返回可序列化的对象"""
+        with self._lock:
+            self._views[name] = render
+            self._rendered = {key: value for key, value in self._rendered.items() if key[0] != name}
+
+    def push(self, record):
+        self.extend([record])
+
+    def extend(self, records):
+        """按时间从旧到新写入，超出容量时覆盖最旧的记录"""
+        rendered = [(record, {name: dumps(render(record)) for name, render in self._views.items()})
+                    for record in records]
+        with self._lock:
+            for slot in rendered[-self.capacity:]:
+                self._slots[self._next] = slot
+                self._next = (self._next + 1) % self.capacity
+            self._size = min(self.capacity, self._size + len(rendered))
+            if rendered:
+                self.version += 1
+
+    def clear(self):
+        with self._lock:
+            self._slots = [None] * self.capacity
+            self._next = 0
+            self._size = 0
+            self.version += 1
+
+    def _newest_first(self, limit):
+        count = self._size if limit is None else min(limit, self._size)
+        return [self._slots[(self._next - 1 - i) % self.capacity] for i in range(count)]
+
+    def records(self, limit=None):
+        """最新的记录在前"""
+        with self._lock:
+            return [record for record, _ in self._newest_first(limit)]
+
+    def render_json(self, view, limit=None):
+        """返回该视图下最近limit条记录的JSON数组（bytes），最新的在前"""
+        with self._lock:
+            key = (view, limit)
+            cached = self._rendered.get(key)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            render = self._views[view]
+            fragments = []
+            for record, rendered in self._newest_first(limit):
+                fragment = rendered.get(view)
+                if fragment is None:
+                    # 视图在记录写入之后才注册，补渲染一次
+                    fragment = rendered[view] = dumps(render(record))
+                fragments.append(fragment)
+            body = b'[' + b','.join(fragments) + b']'
+            self._rendered[key] = (self.version, body)
+            return body
+
+    def __len__(self):
+        return self._size
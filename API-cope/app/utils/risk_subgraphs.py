@@ -0,0 +1,169 @@
+"""
+高风险账户的k跳子图
+每代数据建好后，把账户之间的交易聚合为有向边（交易数、金额合计、平均/最高风险分数），邻接保存为CSR数组；
+平均风险分数超过阈值的账户预先抽取1..hops跳的子图，键为 (账户, 跳数, 代号)，
+子图只保存节点编号、跳数和边编号，汇总指标在抽取时算好，请求时再按环形布局生成前端可直接渲染的节点和边
+"""
+import math
+import numpy as np
+import pandas as pd
+from app.utils.graph_arrays import build_csr, expand_ranges
+
+
+class RiskSubgraphs:
+    """一代数据的账户邻接和预先抽取的风险子图（只读，整体替换）"""
+
+    def __init__(self, df, generation, hops=2, max_nodes=200, threshold=0.7):
+        self.generation = generation
+        self.hops = hops
+        self.threshold = threshold
+        self.max_nodes = max(1, int(max_nodes))
+        self.subgraphs = {}
+
+        orig = df['nameOrig'].astype(str).to_numpy(object)
+        dest = df['nameDest'].astype(str).to_numpy(object)
+        codes, accounts = pd.factorize(np.concatenate([orig, dest]))
+        self.accounts = np.asarray(accounts, dtype=object)
+        self.account_index = {account: i for i, account in enumerate(self.accounts)}
+        num_nodes = len(self.accounts)
+        src, dst = codes[:len(orig)], codes[len(orig):]
+        amount = df['amount'].to_numpy(np.float64)
+        risk = df['risk_score'].to_numpy(np.float64)
+
+        # 账户统计：付款和收款的交易都计入，自转账只计一次（与路径分析的节点统计一致）
+        other = src != dst
+        nodes = np.concatenate([src, dst[other]])
+        counts = np.bincount(nodes, minlength=num_nodes)
+        self.node_tx_count = counts
+        self.node_amount = np.bincount(nodes, np.concatenate([amount, amount[other]]), minlength=num_nodes)
+        self.node_risk = np.bincount(nodes, np.concatenate([risk, risk[other]]), minlength=num_nodes) / np.maximum(counts, 1)
+
+        # 按 (付款方, 收款方) 聚合的有向边，按付款方排序，edge_ptr为每个账户的出边范围
+        keys, inverse = np.unique(src.astype(np.int64) * num_nodes + dst, return_inverse=True)
+        edge_count = np.bincount(inverse, minlength=len(keys))
+        self.edge_src = keys // num_nodes
+        self.edge_dst = keys % num_nodes
+        self.edge_tx_count = edge_count
+        self.edge_amount = np.bincount(inverse, amount, minlength=len(keys))
+        self.edge_risk = np.bincount(inverse, risk, minlength=len(keys)) / np.maximum(edge_count, 1)
+        self.edge_max_risk = np.zeros(len(keys))
+        np.maximum.at(self.edge_max_risk, inverse, risk)
+        self.edge_ptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.edge_src, minlength=num_nodes), out=self.edge_ptr[1:])
+
+        # 按跳数扩展时不区分方向
+        self.indptr, self.indices = build_csr(self.edge_src, self.edge_dst, num_nodes, symmetric=True)
+
+    def precompute(self, max_accounts):
+        """抽取平均风险分数超过阈值的账户（最多max_accounts个，风险从高到低）的1..hops跳子图，返回账户数"""
+        flagged = np.flatnonzero(self.node_risk > self.threshold)
+        flagged = flagged[np.argsort(-self.node_risk[flagged], kind='stable')][:max_accounts]
+        for node in flagged:
+            for hops in range(1, self.hops + 1):
+                self.subgraphs[(self.accounts[node], hops, self.generation)] = self._extract(node, hops)
+        return len(flagged)
+
+    def get(self, account, hops):
+        """账户的子图，预先抽取过的直接返回；账户不在这一代数据中时返回None"""
+        subgraph = self.subgraphs.get((account, hops, self.generation))
+        cached = subgraph is not None
+        if not cached:
+            node = self.account_index.get(account)
+            if node is None:
+                return None
+            subgraph = self._extract(node, hops)
+        return self._payload(account, hops, subgraph, cached)
+
+    def _extract(self, node, hops):
+        """
+        从node出发按跳扩展；节点总数超过max_nodes时每跳只保留风险最高的邻居
+        同一跳内的节点按风险从高到低排列，决定环形布局中的位置
+        """
+        members = [np.array([node], dtype=np.int64)]
+        visited = members[0]
+        frontier = members[0]
+        truncated = False
+        for _ in range(hops):
+            starts = self.indptr[frontier]
+            neighbours = self.indices[expand_ranges(starts, self.indptr[frontier + 1] - starts)]
+            neighbours = np.unique(neighbours)
+            neighbours = neighbours[~np.isin(neighbours, visited)]
+            neighbours = neighbours[np.argsort(-self.node_risk[neighbours], kind='stable')]
+            room = self.max_nodes - len(visited)
+            if len(neighbours) > room:
+                neighbours = neighbours[:room]
+                truncated = True
+            if len(neighbours) == 0:
+                break
+            members.append(neighbours)
+            visited = np.concatenate([visited, neighbours])
+            frontier = neighbours
+
+        starts = self.edge_ptr[visited]
+        edges = expand_ranges(starts, self.edge_ptr[visited + 1] - starts)
+        edges = edges[np.isin(self.edge_dst[edges], visited)]
+        node_risk = self.node_risk[visited]
+        return {
+            'nodes': visited.astype(np.int32),
+            'hop': np.repeat(np.arange(len(members), dtype=np.int8), [len(m) for m in members]),
+            'edges': edges.astype(np.int32),
+            'summary': {
+                'node_count': int(len(visited)),
+                'edge_count': int(len(edges)),
+                'tx_count': int(self.edge_tx_count[edges].sum()),
+                'total_amount': float(self.edge_amount[edges].sum()),
+                'avg_risk_score': float(node_risk.mean()),
+                'max_risk_score': float(node_risk.max()),
+                'high_risk_count': int((node_risk > self.threshold).sum()),
+                'nodes_per_hop': [int(len(m)) for m in members],
+                'truncated': truncated
+            }
+        }
+
+    def _payload(self, account, hops, subgraph, cached):
+        """紧凑子图 -> 接口返回的节点和边；第k跳的节点均匀分布在半径为k的圆上"""
+        nodes, hop = subgraph['nodes'], subgraph['hop']
+        names = self.accounts[nodes]
+        x = np.zeros(len(nodes))
+        y = np.zeros(len(nodes))
+        for level in range(1, int(hop.max()) + 1):
+            ring = np.flatnonzero(hop == level)
+            angles = 2 * math.pi * np.arange(len(ring)) / max(len(ring), 1)
+            x[ring] = level * np.cos(angles)
+            y[ring] = level * np.sin(angles)
+
+        node_items = []
+        for i, node in enumerate(nodes):
+            tx_count = int(self.node_tx_count[node])
+            node_items.append({
+                'id': names[i],
+                'name': names[i],
+                'value': float(self.node_amount[node]),
+                'tx_count': tx_count,
+                'category': 0 if str(names[i]).startswith('M') else 1,
+                'risk_score': float(self.node_risk[node]),
+                'hop': int(hop[i]),
+                'x': round(float(x[i]), 4),
+                'y': round(float(y[i]), 4),
+                'symbolSize': min(50, 20 + math.log(tx_count + 1) * 5)
+            })
+
+        edges = subgraph['edges']
+        edge_items = [{
+            'source': self.accounts[self.edge_src[e]],
+            'target': self.accounts[self.edge_dst[e]],
+            'value': float(self.edge_amount[e]),
+            'tx_count': int(self.edge_tx_count[e]),
+            'risk_score': float(self.edge_risk[e]),
+            'max_risk_score': float(self.edge_max_risk[e])
+        } for e in edges]
+
+        return {
+            'account': account,
+            'hops': hops,
+            'generation': self.generation,
+            'cached': cached,
+            'summary': dict(subgraph['summary']),
+            'nodes': node_items,
+            'edges': edge_items
+        }
@@ -0,0 +1,112 @@
+import json
+import time
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from flask import current_app, g, request
+from app.utils.compression import compress_response
+from app.utils.logger import logger
+from app.utils.tracing import span, span_seconds
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    """orjson/json无法直接处理的类型：NumPy标量、数组、pandas时间戳等"""
+    if isinstance(value, np.generic):
+        if isinstance(value, np.datetime64):
+            return None if np.isnat(value) else str(value)
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, pd.Timedelta):
+        return value.total_seconds()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """序列化为UTF-8 JSON字节串，优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(payload, ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def column_values(series):
+    """
+    将一列整体转换为Python对象列表
+    datetime64列转为ISO 8601字符串，类别列转为原始值，数值列通过tolist一次性完成装箱
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert(None)
+        values = series.to_numpy(dtype='datetime64[us]')
+        strings = np.datetime_as_string(values, unit='us').astype(object)
+        strings[np.isnat(values)] = None
+        return strings.tolist()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(object).tolist()
+    return series.tolist()
+
+
+def frame_records(df, columns=None, rename=None, converters=None):
+    """
+    按列将DataFrame切片转换为记录列表，代替逐行 iterrows
+    rename 将列名映射为输出字段名，converters 对整列做额外转换（接收Series，返回列表）
+    """
+    columns = list(df.columns if columns is None else columns)
+    rename = rename or {}
+    converters = converters or {}
+    names = [rename.get(column, column) for column in columns]
+    values = [converters[column](df[column]) if column in converters else column_values(df[column])
+              for column in columns]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def json_response(payload, status=None, headers=None):
+    """
+    所有路由统一使用的JSON响应构造函数（替代jsonify）
+    序列化耗时记录为 serialization span，出现在 Server-Timing 头和请求结束时的耗时日志中
+    """
+    with span('serialization'):
+        body = dumps(payload)
+    return current_app.response_class(body, status=status, headers=headers, mimetype='application/json')
+
+
+def json_bytes_response(body, status=None, headers=None):
+    """直接返回已经渲染好的JSON字节串（如环形缓冲区中预渲染的结果）"""
+    return current_app.response_class(body, status=status, headers=headers, mimetype='application/json')
+
+
+def register_serialization(app):
+    """注册请求耗时日志和响应压缩协商"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def finish_response(response):
+        raw_size = response.content_length
+        if response.mimetype == 'application/json':
+            compress_response(response, request.accept_encodings)
+        start = g.get('request_start')
+        if start is not None:
+            logger.info(
+                f"{request.method} {request.path} {response.status_code} "
+                f"total {(time.perf_counter() - start) * 1000:.1f} ms, "
+                f"serialization {span_seconds('serialization') * 1000:.1f} ms, "
+                f"{raw_size} bytes -> {response.content_length} bytes")
+        return response
@@ -0,0 +1,222 @@
+import math
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# 窗口名 -> (窗口长度秒数, 桶宽秒数)
+DEFAULT_WINDOWS = {
+    '1m': (60, 1),
+    '1h': (3600, 60),
+    '24h': (86400, 900)
+}
+
+
+def hash_values(values):
+    """把账户名等值映射为64位哈希（向量化）"""
+    return pd.util.hash_pandas_object(pd.Series(values, dtype=object).astype(str), index=False).to_numpy(np.uint64)
+
+
+def _bit_length(values):
+    """uint64数组中每个元素的有效位数"""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values >= np.uint64(1 << shift)
+        lengths[mask] += shift
+        values[mask] >>= np.uint64(shift)
+    lengths += values > 0
+    return lengths
+
+
+class HyperLogLog:
+    """HyperLogLog基数估计的寄存器运算，寄存器以uint8数组保存，便于多个桶之间取最大值合并"""
+
+    def __init__(self, precision=10):
+        self.precision = precision
+        self.size = 1 << precision
+        if self.size >= 128:
+            self.alpha = 0.7213 / (1 + 1.079 / self.size)
+        else:
+            self.alpha = {16: 0.673, 32: 0.697, 64: 0.709}[self.size]
+
+    def positions(self, hashes):
+        """返回每个哈希对应的 (寄存器下标, rank)"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        remaining_bits = 64 - self.precision
+        index = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << remaining_bits) - 1)
+        rank = remaining_bits - _bit_length(remainder) + 1
+        return index, rank.astype(np.uint8)
+
+    def estimate(self, registers):
+        estimate = self.alpha * self.size * self.size / np.sum(np.exp2(-registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(registers == 0))
+        if estimate <= 2.5 * self.size and zeros:
+            # 小基数时使用线性计数修正
+            estimate = self.size * math.log(self.size / zeros)
+        return estimate
+
+
+class SlidingWindow:
+    """
+    分桶的环形数组：保存当前窗口和上一个窗口共2N个桶
+    每个桶记录交易数、高风险交易数、金额和账户HLL寄存器；
+    桶轮转时重新汇总两个窗口，写入时增量更新，读取为O(1)
+    """
+
+    def __init__(self, window_seconds, bucket_seconds, hll):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = max(1, window_seconds // bucket_seconds)
+        self.hll = hll
+        slots = 2 * self.num_buckets
+        self.bucket_ids = np.full(slots, -1, dtype=np.int64)
+        self.counts = np.zeros(slots, dtype=np.int64)
+        self.risk_counts = np.zeros(slots, dtype=np.int64)
+        self.amounts = np.zeros(slots, dtype=np.float64)
+        self.registers = np.zeros((slots, hll.size), dtype=np.uint8)
+        self.head = None
+        self._totals = None
+
+    def _rotate(self, head):
+        """推进到当前时刻所在的桶，清空过期的桶并重新汇总"""
+        self.head = head
+        oldest = head - 2 * self.num_buckets
+        stale = self.bucket_ids <= oldest
+        self.bucket_ids[stale] = -1
+        self.counts[stale] = 0
+        self.risk_counts[stale] = 0
+        self.amounts[stale] = 0
+        self.registers[stale] = 0
+        self._summarize()
+
+    def _summarize(self):
+        current = self.bucket_ids > self.head - self.num_buckets
+        previous = (self.bucket_ids > self.head - 2 * self.num_buckets) & ~current
+        self._totals = {}
+        for name, mask in (('current', current), ('previous', previous)):
+            self._totals[name] = {
+                'count': int(self.counts[mask].sum()),
+                'risk_count': int(self.risk_counts[mask].sum()),
+                'amount': float(self.amounts[mask].sum()),
+                'registers': self.registers[mask].max(axis=0) if mask.any() else np.zeros(self.hll.size, np.uint8),
+                'accounts': None
+            }
+
+    def advance(self, now_seconds):
+        head = int(now_seconds // self.bucket_seconds)
+        if self.head is None or head > self.head:
+            self._rotate(head)
+
+    def add(self, seconds, risk_flags, amounts, register_index, ranks, account_rows, now_seconds):
+        """
+        批量写入：seconds为每笔交易的unix秒数，now_seconds为当前时刻
+        窗口始终以当前时刻为准，时间戳晚于当前时刻的交易（例如按step推算出的未来时间）计入当前桶，
+        不会把窗口推到未来，使随后实时写入的交易落进“上一个窗口”
+        register_index/ranks/account_rows 为账户哈希展开后的HLL更新（account_rows指向对应的交易）
+        """
+        self.advance(now_seconds)
+        buckets = np.minimum((seconds // self.bucket_seconds).astype(np.int64), self.head)
+        valid = buckets > self.head - 2 * self.num_buckets
+        if not valid.any():
+            return
+        slots = buckets % len(self.bucket_ids)
+        # 槽位被更早的桶占用时先清空
+        reused = valid & (self.bucket_ids[slots] != buckets)
+        for slot in np.unique(slots[reused]):
+            self.counts[slot] = self.risk_counts[slot] = 0
+            self.amounts[slot] = 0
+            self.registers[slot] = 0
+        self.bucket_ids[slots[valid]] = buckets[valid]
+
+        size = len(self.bucket_ids)
+        self.counts += np.bincount(slots[valid], minlength=size)
+        self.risk_counts += np.bincount(slots[valid], weights=risk_flags[valid], minlength=size).astype(np.int64)
+        self.amounts += np.bincount(slots[valid], weights=amounts[valid], minlength=size)
+        account_valid = valid[account_rows]
+        np.maximum.at(self.registers, (slots[account_rows][account_valid], register_index[account_valid]),
+                      ranks[account_valid])
+        self._summarize()
+
+    def totals(self, which):
+        totals = self._totals[which]
+        if totals['accounts'] is None:
+            totals['accounts'] = int(round(self.hll.estimate(totals['registers'])))
+        return totals
+
+
+def _trend(current, previous):
+    """相对上一个窗口的变化百分比"""
+    if not previous:
+        return 0.0
+    return round((current - previous) / previous * 100, 2)
+
+
+class StreamingStats:
+    """
+    交易流的在线统计：1分钟/1小时/24小时滑动窗口的交易数、高风险交易数、金额和活跃账户数
+    以及与上一个窗口相比的变化趋势
+    """
+
+    def __init__(self, windows=None, risk_threshold=0.7, precision=10, clock=time.time):
+        self.hll = HyperLogLog(precision)
+        self.risk_threshold = risk_threshold
+        self.clock = clock
+        self._windows_config = dict(windows or DEFAULT_WINDOWS)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.windows = {name: SlidingWindow(length, bucket, self.hll)
+                            for name, (length, bucket) in self._windows_config.items()}
+
+    def add_frame(self, df):
+        """写入一批交易（DataFrame，需要 timestamp/amount/risk_score/nameOrig/nameDest 列）"""
+        if df is None or len(df) == 0:
+            return
+        seconds = _unix_seconds(df['timestamp'])
+        amounts = df['amount'].to_numpy(dtype=np.float64)
+        risk_flags = (df['risk_score'].to_numpy(dtype=np.float64) > self.risk_threshold).astype(np.float64)
+        hashes = np.concatenate([hash_values(df['nameOrig']), hash_values(df['nameDest'])])
+        register_index, ranks = self.hll.positions(hashes)
+        account_rows = np.concatenate([np.arange(len(df)), np.arange(len(df))])
+        with self._lock:
+            now = self.clock()
+            for window in self.windows.values():
+                window.add(seconds, risk_flags, amounts, register_index, ranks, account_rows, now)
+
+    def snapshot(self, window='24h'):
+        with self._lock:
+            sliding = self.windows[window]
+            sliding.advance(self.clock())
+            current = sliding.totals('current')
+            previous = sliding.totals('previous')
+            return {
+                'window': window,
+                'transaction_count': current['count'],
+                'risk_transaction_count': current['risk_count'],
+                'total_amount': current['amount'],
+                'active_accounts': current['accounts'],
+                'transaction_trend': _trend(current['count'], previous['count']),
+                'risk_transaction_trend': _trend(current['risk_count'], previous['risk_count']),
+                'amount_trend': _trend(current['amount'], previous['amount']),
+                'active_accounts_trend': _trend(current['accounts'], previous['accounts'])
+            }
+
+    def snapshot_all(self):
+        return {name: self.snapshot(name) for name in self.windows}
+
+
+def _unix_seconds(timestamps):
+    """
+    时间戳列转换为与time.time()一致的unix秒数
+    不带时区的时间戳按本地时间处理（数据中的时间由datetime.now()推算）
+    """
+    timestamps = pd.to_datetime(timestamps)
+    if timestamps.dt.tz is not None:
+        return timestamps.dt.tz_convert(None).to_numpy('datetime64[s]').astype(np.int64)
+    local_seconds = timestamps.to_numpy('datetime64[s]').astype(np.int64)
+    utc_offset = -time.altzone if time.localtime().tm_isdst else -time.timezone
+    return local_seconds - utc_offset
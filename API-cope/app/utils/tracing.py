@@ -0,0 +1,266 @@
+import bisect
+import cProfile
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import g, has_request_context, request
+from app.config.config import Config
+from app.utils.logger import logger
+
+try:
+    from pyinstrument import Profiler as InstrumentProfiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+# 直方图桶上限（秒），覆盖从亚毫秒级的缓存读取到数十秒的全量图分析
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Prometheus风格的累积直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """进程内的直方图集合，按 (指标名, 标签) 区分，以Prometheus文本格式导出"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def mean(self, name, labels):
+        """直方图的平均值，尚无观测时返回None"""
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None or histogram.count == 0:
+                return None
+            return histogram.sum / histogram.count
+
+    def render(self):
+        with self._lock:
+            snapshot = sorted(
+                (name, labels, histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+                for (name, labels), histogram in self._histograms.items())
+        lines = []
+        current = None
+        for name, labels, buckets, counts, total, count in snapshot:
+            if name != current:
+                current = name
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+metrics = MetricsRegistry()
+metrics.describe('app_span_duration_seconds', 'Duration of named spans inside request handling and data loading')
+metrics.describe('app_http_request_duration_seconds', 'Duration of HTTP requests by route and status')
+
+# 每个线程当前注册的span监听器
+_span_listeners = threading.local()
+
+
+@contextmanager
+def span_listener(callback):
+    """在当前线程内，每个结束的span同时交给 callback(name, seconds)，例如从工作进程转发给父进程"""
+    listeners = _span_listeners.__dict__.setdefault('stack', [])
+    listeners.append(callback)
+    try:
+        yield
+    finally:
+        listeners.pop()
+
+
+def record_span(name, seconds):
+    """记录一次span：写入直方图，并在请求上下文中累计到本次请求的 Server-Timing"""
+    metrics.observe('app_span_duration_seconds', (('span', name),), seconds)
+    for callback in getattr(_span_listeners, 'stack', ()):
+        callback(name, seconds)
+    if has_request_context():
+        totals = g.setdefault('span_totals', {})
+        entry = totals.get(name)
+        if entry is None:
+            totals[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+
+@contextmanager
+def span(name):
+    """命名的计时区间：with span('graph.pagerank'): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def traced(name=None):
+    """把整个函数作为一个span计时，默认名称为 模块名.函数名"""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_span(span_name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def span_seconds(name):
+    """本次请求中某个span的累计耗时（秒）"""
+    if not has_request_context():
+        return 0.0
+    entry = g.get('span_totals', {}).get(name)
+    return entry[1] if entry else 0.0
+
+
+def span_mean(name):
+    """本进程中某个span的平均耗时（秒），尚未记录过时返回None"""
+    return metrics.mean('app_span_duration_seconds', (('span', name),))
+
+
+def server_timing_header(totals, total_seconds):
+    parts = [f"{name};dur={seconds * 1000:.2f}" + (f';desc="x{count}"' if count > 1 else '')
+             for name, (count, seconds) in totals.items()]
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ', '.join(parts)
+
+
+# 多线程服务器中同时只剖析一个请求：重叠的cProfile/pyinstrument会相互干扰，只得到不完整的结果
+_profile_lock = threading.Lock()
+
+
+def _start_profiler():
+    """
+    请求头 X-Profile: cprofile | pyinstrument 触发单次请求的性能剖析（需开启 REQUEST_PROFILING）
+    已有请求正在剖析时不等待，本次请求照常处理并在响应头 X-Profile-Skipped 中说明
+    """
+    mode = request.headers.get('X-Profile', '').strip().lower()
+    if not mode:
+        return
+    if not _profile_lock.acquire(blocking=False):
+        g.profile_skipped = True
+        return
+    try:
+        if mode == 'pyinstrument' and PYINSTRUMENT_AVAILABLE:
+            profiler = InstrumentProfiler()
+            profiler.start()
+        else:
+            mode = 'cprofile'
+            profiler = cProfile.Profile()
+            profiler.enable()
+    except Exception:
+        _profile_lock.release()
+        raise
+    g.profiler = (mode, profiler)
+
+
+def _stop_profiler(mode, profiler):
+    if mode == 'pyinstrument':
+        profiler.stop()
+    else:
+        profiler.disable()
+
+
+def _finish_profiler(response):
+    mode, profiler = g.pop('profiler')
+    try:
+        _stop_profiler(mode, profiler)
+        name = (request.endpoint or 'unmatched').replace('.', '_')
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        stem = os.path.join(Config.PROFILE_DIR, f"{datetime.now():%Y%m%d_%H%M%S_%f}_{name}")
+        if mode == 'pyinstrument':
+            path = stem + '.html'
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        else:
+            path = stem + '.prof'
+            profiler.dump_stats(path)
+    finally:
+        _profile_lock.release()
+    response.headers['X-Profile-File'] = os.path.basename(path)
+    logger.info(f"Profile of {request.method} {request.path} written to {path}")
+
+
+def register_tracing(app):
+    """注册请求级计时：Server-Timing 响应头、请求耗时直方图，以及按请求头触发的性能剖析"""
+
+    @app.before_request
+    def start_trace():
+        g.trace_start = time.perf_counter()
+        if Config.REQUEST_PROFILING:
+            _start_profiler()
+
+    @app.after_request
+    def finish_trace(response):
+        if g.get('profiler') is not None:
+            _finish_profiler(response)
+        elif g.get('profile_skipped'):
+            response.headers['X-Profile-Skipped'] = 'another request is being profiled'
+        start = g.get('trace_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe('app_http_request_duration_seconds',
+                        (('method', request.method), ('route', endpoint), ('status', str(response.status_code))),
+                        elapsed)
+        if Config.SERVER_TIMING:
+            response.headers['Server-Timing'] = server_timing_header(g.get('span_totals', {}), elapsed)
+        return response
+
+    @app.teardown_request
+    def release_profiler(exc):
+        # 请求异常结束时after_request不会执行，在这里停止剖析并释放锁
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            try:
+                _stop_profiler(*profiler)
+            finally:
+                _profile_lock.release()
@@ -0,0 +1,378 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from app.utils.logger import logger
+from app.utils.serialization import column_values, frame_records
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+# 存储的交易字段，position为交易在DataCache.transactions中的下标，时间为不带时区的微秒整数
+STORE_COLUMNS = ['position', 'step', 'type', 'amount', 'nameOrig', 'oldbalanceOrg', 'newbalanceOrig',
+                 'nameDest', 'oldbalanceDest', 'newbalanceDest', 'isFraud', 'timestamp_us', 'risk_score', 'risk_type']
+
+# store_frame 需要的DataCache交易字段
+_INPUT_COLUMNS = [column for column in STORE_COLUMNS if column not in ('position', 'timestamp_us')] + ['timestamp']
+
+# 分页查询返回的记录字段
+RECORD_COLUMNS = ['index', 'timestamp', 'type', 'amount', 'nameOrig', 'nameDest', 'risk_score', 'risk_type', 'isFraud']
+
+# 趋势统计的时间粒度 -> numpy datetime64单位
+PERIODS = {'day': 'D', 'month': 'M'}
+
+
+def store_frame(df):
+    """把DataCache中的交易DataFrame转换为存储格式，position取自DataFrame的索引"""
+    timestamps = pd.to_datetime(df['timestamp'])
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    frame = pd.DataFrame({
+        'position': df.index.to_numpy(np.int64),
+        'step': df['step'].to_numpy(np.int64),
+        'type': df['type'].astype(str).to_numpy(object),
+        'amount': df['amount'].to_numpy(np.float64),
+        'nameOrig': df['nameOrig'].astype(str).to_numpy(object),
+        'oldbalanceOrg': df['oldbalanceOrg'].to_numpy(np.float64),
+        'newbalanceOrig': df['newbalanceOrig'].to_numpy(np.float64),
+        'nameDest': df['nameDest'].astype(str).to_numpy(object),
+        'oldbalanceDest': df['oldbalanceDest'].to_numpy(np.float64),
+        'newbalanceDest': df['newbalanceDest'].to_numpy(np.float64),
+        'isFraud': df['isFraud'].to_numpy(np.int64),
+        'timestamp_us': timestamps.to_numpy('datetime64[us]').astype(np.int64),
+        'risk_score': df['risk_score'].to_numpy(np.float64),
+        'risk_type': df['risk_type'].astype(str).to_numpy(object)
+    })
+    return frame
+
+
+def _records(frame):
+    """存储格式 -> 接口记录"""
+    frame = frame.assign(index=frame['position'], timestamp=pd.to_datetime(frame['timestamp_us'], unit='us'))
+    return frame_records(frame, columns=RECORD_COLUMNS)
+
+
+class MemoryTransactionStore:
+    """
+    进程内的交易存储（pandas），与原先直接扫描DataFrame的行为一致
+    实时写入的批次先暂存，读取时才合并，避免每批都复制整张表
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self._frame = store_frame(pd.DataFrame(columns=_INPUT_COLUMNS))
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def replace(self, df):
+        frame = store_frame(df)
+        with self._lock:
+            self._frame = frame
+            self._pending = []
+
+    def append(self, df):
+        frame = store_frame(df)
+        with self._lock:
+            self._pending.append(frame)
+
+    def _current(self):
+        with self._lock:
+            if self._pending:
+                self._frame = pd.concat([self._frame] + self._pending, ignore_index=True)
+                self._pending = []
+            return self._frame
+
+    def _select(self, start_us=None, end_us=None, account=None, risk_above=None):
+        frame = self._current()
+        mask = np.ones(len(frame), dtype=bool)
+        if start_us is not None:
+            mask &= frame['timestamp_us'].to_numpy() >= start_us
+        if end_us is not None:
+            mask &= frame['timestamp_us'].to_numpy() <= end_us
+        if account is not None:
+            mask &= (frame['nameOrig'] == account).to_numpy() | (frame['nameDest'] == account).to_numpy()
+        if risk_above is not None:
+            mask &= frame['risk_score'].to_numpy() > risk_above
+        return frame[mask] if not mask.all() else frame
+
+    def __len__(self):
+        return len(self._current())
+
+    def count(self, **filters):
+        return len(self._select(**filters))
+
+    def time_range(self):
+        frame = self._current()
+        if frame.empty:
+            return None
+        return int(frame['timestamp_us'].min()), int(frame['timestamp_us'].max())
+
+    def risk_trend(self, period='day', high=0.8, low=0.6, start_us=None, end_us=None):
+        """按天/月分组：[(时间标签, 交易数, 风险>high的交易数, low<风险<=high的交易数)]，按时间升序"""
+        frame = self._select(start_us=start_us, end_us=end_us)
+        if frame.empty:
+            return []
+        unit = PERIODS[period]
+        keys = frame['timestamp_us'].to_numpy(np.int64).astype('datetime64[us]').astype(f'datetime64[{unit}]')
+        risk = frame['risk_score'].to_numpy()
+        grouped = pd.DataFrame({'key': keys, 'high': risk > high, 'mid': (risk > low) & (risk <= high)}) \
+            .groupby('key').agg(total=('high', 'size'), high=('high', 'sum'), mid=('mid', 'sum'))
+        labels = np.datetime_as_string(grouped.index.to_numpy().astype(f'datetime64[{unit}]'), unit=unit)
+        return [(str(label), int(total), int(high_count), int(mid_count))
+                for label, total, high_count, mid_count in zip(labels, grouped['total'], grouped['high'], grouped['mid'])]
+
+    def risk_type_counts(self):
+        """{风险类型: 交易数}，按数量降序"""
+        counts = self._current()['risk_type'].value_counts()
+        return {str(risk_type): int(count) for risk_type, count in counts.items()}
+
+    def fraud_agreement(self, start_us, threshold=0.7):
+        """(风险>threshold 与 isFraud 一致的交易数, 交易数)"""
+        frame = self._select(start_us=start_us)
+        matches = (frame['risk_score'].to_numpy() > threshold) == (frame['isFraud'].to_numpy() == 1)
+        return int(matches.sum()), len(frame)
+
+    def clustered_high_risk(self, start_us, risk_above=0.8, min_count=5):
+        """付款账户的高风险交易超过min_count笔时，这些账户的高风险交易总数"""
+        counts = self._select(start_us=start_us, risk_above=risk_above).groupby('nameOrig').size()
+        return int(counts[counts > min_count].sum())
+
+    def query(self, limit=20, offset=0, **filters):
+        """按时间倒序分页返回交易记录"""
+        frame = self._select(**filters)
+        page = frame.nlargest(offset + limit, ['timestamp_us', 'position']).iloc[offset:]
+        return _records(page)
+
+    def close(self):
+        pass
+
+
+class _SQLTransactionStore:
+    """SQLite/DuckDB共用的查询：筛选、聚合和分页都在数据库中完成"""
+
+    name = None
+    _POSITION_TYPE = 'BIGINT'
+    _INDEXES = {}  # 索引名 -> 列
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        columns = ', '.join(f'{column} {sql_type}' for column, sql_type in zip(STORE_COLUMNS, self._column_types()))
+        self._execute_script(f"CREATE TABLE IF NOT EXISTS transactions ({columns});" + self._create_indexes())
+
+    def _create_indexes(self):
+        return ''.join(f"CREATE INDEX IF NOT EXISTS {name} ON transactions ({columns});"
+                       for name, columns in self._INDEXES.items())
+
+    def _column_types(self):
+        types = {'position': f'{self._POSITION_TYPE} PRIMARY KEY', 'step': 'BIGINT', 'isFraud': 'INTEGER',
+                 'timestamp_us': 'BIGINT NOT NULL', 'type': 'VARCHAR', 'nameOrig': 'VARCHAR', 'nameDest': 'VARCHAR',
+                 'risk_type': 'VARCHAR'}
+        return [types.get(column, 'DOUBLE') for column in STORE_COLUMNS]
+
+    def _day_expr(self):
+        """timestamp_us 对应的整数天（自1970-01-01起）"""
+        raise NotImplementedError
+
+    @staticmethod
+    def _where(start_us=None, end_us=None, account=None, risk_above=None):
+        clauses = []
+        params = []
+        if start_us is not None:
+            clauses.append("timestamp_us >= ?")
+            params.append(int(start_us))
+        if end_us is not None:
+            clauses.append("timestamp_us <= ?")
+            params.append(int(end_us))
+        if account is not None:
+            clauses.append("(nameOrig = ? OR nameDest = ?)")
+            params.extend([account, account])
+        if risk_above is not None:
+            clauses.append("risk_score > ?")
+            params.append(float(risk_above))
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+    def replace(self, df):
+        frame = store_frame(df)
+        with self._lock:
+            self._execute("DELETE FROM transactions")
+            self._insert(frame)
+
+    def append(self, df):
+        frame = store_frame(df)
+        with self._lock:
+            self._insert(frame)
+
+    def __len__(self):
+        return self.count()
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        return int(self._fetch(f"SELECT COUNT(*) FROM transactions {where}", params)[0][0])
+
+    def time_range(self):
+        low, high = self._fetch("SELECT MIN(timestamp_us), MAX(timestamp_us) FROM transactions")[0]
+        return None if low is None else (int(low), int(high))
+
+    def risk_trend(self, period='day', high=0.8, low=0.6, start_us=None, end_us=None):
+        # 数据库中按整数天分组（不对每行格式化日期），按月统计时再在Python中合并
+        where, params = self._where(start_us=start_us, end_us=end_us)
+        rows = self._fetch(
+            f"SELECT {self._day_expr()} AS day, COUNT(*), "
+            f"SUM(CASE WHEN risk_score > ? THEN 1 ELSE 0 END), "
+            f"SUM(CASE WHEN risk_score > ? AND risk_score <= ? THEN 1 ELSE 0 END) "
+            f"FROM transactions {where} GROUP BY day ORDER BY day",
+            [float(high), float(low), float(high)] + params)
+        if not rows:
+            return []
+        unit = PERIODS[period]
+        days = np.array([row[0] for row in rows], dtype=np.int64).astype('datetime64[D]')
+        labels = np.datetime_as_string(days.astype(f'datetime64[{unit}]'), unit=unit)
+        trend = []
+        for label, row in zip(labels, rows):
+            if trend and trend[-1][0] == label:
+                _, total, high_count, mid_count = trend[-1]
+                trend[-1] = (label, total + int(row[1]), high_count + int(row[2]), mid_count + int(row[3]))
+            else:
+                trend.append((str(label), int(row[1]), int(row[2]), int(row[3])))
+        return trend
+
+    def risk_type_counts(self):
+        rows = self._fetch("SELECT risk_type, COUNT(*) AS n FROM transactions GROUP BY risk_type ORDER BY n DESC")
+        return {str(risk_type): int(count) for risk_type, count in rows}
+
+    def fraud_agreement(self, start_us, threshold=0.7):
+        where, params = self._where(start_us=start_us)
+        matches, total = self._fetch(
+            f"SELECT SUM(CASE WHEN (risk_score > ?) = (isFraud = 1) THEN 1 ELSE 0 END), COUNT(*) "
+            f"FROM transactions {where}", [float(threshold)] + params)[0]
+        return int(matches or 0), int(total)
+
+    def clustered_high_risk(self, start_us, risk_above=0.8, min_count=5):
+        where, params = self._where(start_us=start_us, risk_above=risk_above)
+        total = self._fetch(
+            f"SELECT SUM(n) FROM (SELECT COUNT(*) AS n FROM transactions {where} "
+            f"GROUP BY nameOrig HAVING COUNT(*) > ?) AS clusters", params + [int(min_count)])[0][0]
+        return int(total or 0)
+
+    def query(self, limit=20, offset=0, **filters):
+        where, params = self._where(**filters)
+        rows = self._fetch(
+            f"SELECT {', '.join(STORE_COLUMNS)} FROM transactions {where} "
+            f"ORDER BY timestamp_us DESC, position DESC LIMIT ? OFFSET ?", params + [int(limit), int(offset)])
+        return _records(pd.DataFrame(rows, columns=STORE_COLUMNS))
+
+
+class SQLiteTransactionStore(_SQLTransactionStore):
+    """SQLite交易存储：按时间、账户+时间、风险分数建立索引"""
+
+    name = 'sqlite'
+    _POSITION_TYPE = 'INTEGER'  # INTEGER PRIMARY KEY 即rowid，不额外建索引
+    _INDEXES = {
+        'idx_transactions_time': 'timestamp_us',
+        'idx_transactions_orig': 'nameOrig, timestamp_us',
+        'idx_transactions_dest': 'nameDest, timestamp_us',
+        'idx_transactions_risk': 'risk_score'
+    }
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        super().__init__()
+
+    def _execute_script(self, script):
+        self._conn.executescript(script)
+
+    def _execute(self, sql, params=()):
+        self._conn.execute(sql, params)
+
+    def replace(self, df):
+        # 全量写入时先删除索引，写完后一次性重建，比逐行维护索引快得多
+        frame = store_frame(df)
+        with self._lock:
+            self._conn.executescript(''.join(f"DROP INDEX IF EXISTS {name};" for name in self._INDEXES)
+                                     + "DELETE FROM transactions;")
+            self._insert(frame)
+            self._conn.executescript(self._create_indexes())
+
+    def _insert(self, frame):
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO transactions ({', '.join(STORE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in STORE_COLUMNS)})",
+                zip(*(column_values(frame[column]) for column in STORE_COLUMNS)))
+
+    def _fetch(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _day_expr(self):
+        return "timestamp_us / 86400000000"
+
+    def close(self):
+        self._conn.close()
+
+
+class DuckDBTransactionStore(_SQLTransactionStore):
+    """DuckDB交易存储：列式扫描，聚合类查询不依赖索引"""
+
+    name = 'duckdb'
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = duckdb.connect(path)
+        super().__init__()
+
+    def _execute_script(self, script):
+        self._conn.execute(script)
+
+    def _execute(self, sql, params=()):
+        self._conn.execute(sql, params)
+
+    def _insert(self, frame):
+        # 直接从DataFrame批量写入，不逐行绑定参数
+        self._conn.register('incoming_transactions', frame)
+        try:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO transactions SELECT {', '.join(STORE_COLUMNS)} FROM incoming_transactions")
+        finally:
+            self._conn.unregister('incoming_transactions')
+
+    def _fetch(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _day_expr(self):
+        return "timestamp_us // 86400000000"
+
+    def close(self):
+        self._conn.close()
+
+
+def create_transaction_store(backend='memory', path=None):
+    """
+    按配置创建交易存储：memory（默认，进程内pandas）、sqlite 或 duckdb
+    未安装duckdb时退回sqlite
+    """
+    if backend == 'memory':
+        return MemoryTransactionStore()
+    path = path or ':memory:'
+    if backend == 'duckdb':
+        if DUCKDB_AVAILABLE:
+            return DuckDBTransactionStore(path if path == ':memory:' else os.path.splitext(path)[0] + '.duckdb')
+        logger.warning("duckdb is not installed, falling back to the sqlite storage backend")
+        backend = 'sqlite'
+    if backend == 'sqlite':
+        return SQLiteTransactionStore(path)
+    raise ValueError(f'Unknown storage backend: {backend}')
@@ -0,0 +1,158 @@
+"""
+分析进程池基准：多个路径分析并发执行时，轻量接口（仪表盘、监控统计）的延迟
+每种配置（ANALYSIS_WORKERS=0 即在请求线程中执行，或N个工作进程）在独立的进程中启动应用：
+  1. 空闲时探测轻量接口，得到基线延迟
+  2. --analyses 个线程持续请求 /api/graph/analysis/path，同时继续探测轻量接口
+报告两个阶段的探测延迟分位数，以及分析完成数、503拒绝数和超时数
+
+用法（在API-cope目录下）:
+    python -m benchmarks.analysis_offload --rows 50000 --workers 0 2 --analyses 4 --duration 20 --output offload.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from app.config.config import Config
+from benchmarks import synthetic_data
+from benchmarks.load_test import summarize
+
+# 探测的轻量接口，轮流请求
+PROBE_ENDPOINTS = [
+    '/api/dashboard/stats',
+    '/api/monitor/statistics?window=1m',
+    '/api/alerts?page=1&pageSize=20',
+    '/api/health',
+]
+
+
+def probe(client, duration, interval):
+    """在duration秒内轮流请求轻量接口，返回延迟（毫秒）和错误数"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        path = PROBE_ENDPOINTS[i % len(PROBE_ENDPOINTS)]
+        i += 1
+        start = time.perf_counter()
+        status = client.get(path).status_code
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors += status != 200
+        time.sleep(interval)
+    return latencies, errors
+
+
+def run_config(settings, args, results):
+    """子进程：按settings启动应用，先空闲探测再在分析负载下探测"""
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    from main import create_app
+    app, _ = create_app()
+    logging.getLogger().setLevel(logging.WARNING)
+    client = app.test_client()
+    body = {'use_gnn': args.use_gnn, 'max_transactions': args.max_transactions}
+
+    # 加载数据并预热（含工作进程启动和首次挂载），不计入测量
+    client.get(PROBE_ENDPOINTS[0])
+    client.post('/api/graph/analysis/path', json=body)
+
+    report = {'workers': settings['ANALYSIS_WORKERS']}
+    latencies, errors = probe(client, args.idle_duration, args.probe_interval)
+    report['idle'] = summarize(latencies, errors, args.idle_duration)
+
+    statuses = []
+    stop = threading.Event()
+
+    def analyze():
+        analysis_client = app.test_client()
+        while not stop.is_set():
+            statuses.append(analysis_client.post('/api/graph/analysis/path', json=body).status_code)
+            if statuses[-1] == 503:
+                time.sleep(args.probe_interval)
+
+    threads = [threading.Thread(target=analyze, daemon=True) for _ in range(args.analyses)]
+    for thread in threads:
+        thread.start()
+    latencies, errors = probe(client, args.duration, args.probe_interval)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    report['loaded'] = summarize(latencies, errors, args.duration)
+    report['analyses'] = {
+        'completed': statuses.count(200),
+        'rejected': statuses.count(503),
+        'timed_out': statuses.count(504),
+        'other': len(statuses) - statuses.count(200) - statuses.count(503) - statuses.count(504)
+    }
+    results.put(report)
+
+
+def print_report(report):
+    idle, loaded, analyses = report['idle'], report['loaded'], report['analyses']
+    print(f"workers={report['workers']:<3} idle p50 {idle['p50_ms']:7.1f} ms p99 {idle['p99_ms']:7.1f} ms | "
+          f"under load p50 {loaded['p50_ms']:7.1f} ms p95 {loaded['p95_ms']:7.1f} ms "
+          f"p99 {loaded['p99_ms']:7.1f} ms max {loaded['max_ms']:7.1f} ms | "
+          f"analyses {analyses['completed']} done, {analyses['rejected']} rejected, {analyses['timed_out']} timed out")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure light endpoint latency while graph analyses run')
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2],
+                        help='ANALYSIS_WORKERS values to compare (0 = inline on the request thread)')
+    parser.add_argument('--analyses', type=int, default=4, help='concurrent analysis request threads')
+    parser.add_argument('--queue-limit', type=int, default=Config.ANALYSIS_QUEUE_LIMIT)
+    parser.add_argument('--max-transactions', type=int, default=10_000, help='max_transactions of each analysis')
+    parser.add_argument('--use-gnn', action='store_true')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of probing under analysis load')
+    parser.add_argument('--idle-duration', type=float, default=5.0)
+    parser.add_argument('--probe-interval', type=float, default=0.02)
+    parser.add_argument('--fraud-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='api_cope_offload_')
+    reports = []
+    try:
+        data_path = os.path.join(directory, f'synthetic_{args.rows}.csv')
+        synthetic_data.write_csv(data_path, args.rows, args.fraud_rate, args.seed)
+        context = multiprocessing.get_context('spawn')
+        for workers in args.workers:
+            run_directory = os.path.join(directory, f'workers_{workers}')
+            os.makedirs(run_directory)
+            settings = {
+                'DATA_PATH': data_path,
+                'MAX_TRANSACTIONS': max(1, args.rows // 2),
+                'MODEL_WARMUP': False,
+                'ANALYSIS_WORKERS': workers,
+                'ANALYSIS_QUEUE_LIMIT': args.queue_limit,
+                'SHARED_DATA_DIR': os.path.join(run_directory, 'shared'),
+                'TRANSACTION_DB_PATH': os.path.join(run_directory, 'transactions.db'),
+                'ALERT_DB_PATH': os.path.join(run_directory, 'alerts.db'),
+            }
+            results = context.Queue()
+            process = context.Process(target=run_config, args=(settings, args, results))
+            process.start()
+            report = results.get()
+            process.join()
+            reports.append(report)
+            print_report(report)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'analyses': args.analyses, 'duration': args.duration,
+                       'cpu_count': os.cpu_count(), 'runs': reports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
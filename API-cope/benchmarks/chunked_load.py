@@ -0,0 +1,107 @@
+"""
+分块加载基准：用不同的 LOAD_CHUNK_ROWS 加载整个CSV（LOAD_MAX_ROWS=0），比较加载耗时和进程峰值内存
+每种块大小在独立的进程中执行 DataCache.load_data，峰值内存取 ru_maxrss 减去加载前的常驻内存；
+块大小不小于行数时即为整表一次读取和评分的基线
+
+用法（在API-cope目录下）:
+    python -m benchmarks.chunked_load --rows 1000000 --chunk-rows 50000 200000 2000000 --output chunked.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic_data
+
+
+def _rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+
+def run_load(settings, results):
+    """子进程：按settings加载数据，报告耗时、行数和内存"""
+    from app.config.config import Config
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    from app.utils.data_cache import DataCache
+    logging.getLogger().setLevel(logging.WARNING)
+    cache = DataCache()
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    ok = cache.load_data()
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put({
+        'chunk_rows': settings['LOAD_CHUNK_ROWS'],
+        'ok': ok,
+        'rows': len(cache.transactions),
+        'graph_edges': cache.graph.number_of_edges() if cache.graph is not None else 0,
+        'seconds': seconds,
+        'baseline_rss_mb': baseline,
+        'peak_rss_mb': peak,
+        'peak_growth_mb': peak - baseline,
+        'retained_mb': _rss_mb() - baseline,
+        'frame_mb': cache.df.memory_usage(deep=True).sum() / (1024 * 1024) if cache.df is not None else 0.0
+    })
+
+
+def print_report(report):
+    print(f"chunk_rows={report['chunk_rows']:<9} rows {report['rows']:>9}  {report['seconds']:8.2f} s  "
+          f"peak +{report['peak_growth_mb']:8.1f} MB  retained +{report['retained_mb']:8.1f} MB  "
+          f"frame {report['frame_mb']:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare load_data time and peak memory across chunk sizes')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunk-rows', type=int, nargs='+', default=[50_000, 200_000, 2_000_000],
+                        help='LOAD_CHUNK_ROWS values to compare (>= rows reads the file in one piece)')
+    parser.add_argument('--storage-backend', default='memory')
+    parser.add_argument('--graph-max-transactions', type=int, default=20_000)
+    parser.add_argument('--fraud-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='api_cope_chunked_')
+    reports = []
+    try:
+        data_path = os.path.join(directory, f'synthetic_{args.rows}.csv')
+        synthetic_data.write_csv(data_path, args.rows, args.fraud_rate, args.seed)
+        context = multiprocessing.get_context('spawn')
+        for chunk_rows in args.chunk_rows:
+            run_directory = os.path.join(directory, f'chunk_{chunk_rows}')
+            os.makedirs(run_directory)
+            settings = {
+                'DATA_PATH': data_path,
+                'LOAD_MAX_ROWS': 0,
+                'LOAD_CHUNK_ROWS': chunk_rows,
+                'GRAPH_MAX_TRANSACTIONS': args.graph_max_transactions,
+                'STORAGE_BACKEND': args.storage_backend,
+                'MODEL_WARMUP': False,
+                'TRANSACTION_DB_PATH': os.path.join(run_directory, 'transactions.db'),
+                'ALERT_DB_PATH': os.path.join(run_directory, 'alerts.db'),
+            }
+            results = context.Queue()
+            process = context.Process(target=run_load, args=(settings, results))
+            process.start()
+            report = results.get()
+            process.join()
+            reports.append(report)
+            print_report(report)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'storage_backend': args.storage_backend, 'runs': reports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
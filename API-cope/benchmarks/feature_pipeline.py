@@ -0,0 +1,73 @@
+"""
+模型特征基准：对比笔记本式的pandas特征工程（get_dummies、余额差、按列标准化、fillna，每个模型各算一遍）
+与 feature_pipeline.build_features（一次生成float32矩阵，GBC/RF/MLP共用）在不同批次大小下的耗时，并核对两者的输出一致
+
+用法（在API-cope目录下）:
+    python -m benchmarks.feature_pipeline --sizes 100 10000 1000000 --models 3 --output features.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.utils.feature_pipeline import FEATURE_COLUMNS, SCALED_COLUMNS, FeatureScaler, build_features
+from benchmarks import synthetic_data
+
+
+def notebook_features(batch, scaler):
+    """训练笔记本中的特征工程，标准化参数使用已拟合的scaler"""
+    X = batch.drop(['isFraud', 'isFlaggedFraud', 'nameOrig', 'nameDest'], axis=1, errors='ignore')
+    X = pd.get_dummies(X, columns=['type'], drop_first=True)
+    X['balanceDiffOrig'] = X['oldbalanceOrg'] - X['newbalanceOrig']
+    X['balanceDiffDest'] = X['oldbalanceDest'] - X['newbalanceDest']
+    X[SCALED_COLUMNS] = (X[SCALED_COLUMNS] - scaler.mean) / scaler.scale
+    X = X.fillna(X.mean())
+    return X.reindex(columns=FEATURE_COLUMNS, fill_value=False).to_numpy(np.float32)
+
+
+def time_median(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-model pandas featurization with the shared feature matrix')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 1_000_000])
+    parser.add_argument('--models', type=int, default=3, help='model backends scored per batch')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    data = synthetic_data.generate_paysim(max(args.sizes), seed=args.seed)
+    scaler = FeatureScaler.fit([data])
+    reports = []
+    for size in args.sizes:
+        batch = data.iloc[:size].reset_index(drop=True)
+        expected = notebook_features(batch, scaler)
+        features = build_features(batch, scaler)
+        report = {
+            'rows': size,
+            'max_abs_diff': float(np.abs(features - expected).max()),
+            'notebook_ms': time_median(lambda: [notebook_features(batch, scaler) for _ in range(args.models)],
+                                       args.repeats) * 1000,
+            'shared_ms': time_median(lambda: build_features(batch, scaler), args.repeats) * 1000
+        }
+        reports.append(report)
+        print(f"rows {size:>9}  notebook x{args.models} {report['notebook_ms']:9.2f} ms  "
+              f"shared {report['shared_ms']:9.2f} ms  max diff {report['max_abs_diff']:.2e}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'models': args.models, 'runs': reports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
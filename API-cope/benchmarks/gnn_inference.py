@@ -0,0 +1,117 @@
+"""
+GNN CPU推理基准：对比fp32与动态int8量化的精度差异和延迟
+
+用法（在API-cope目录下）:
+    python -m benchmarks.gnn_inference --sizes 1000 5000 20000 --repeats 5 --output gnn_inference.json
+"""
+import argparse
+import json
+import time
+
+import networkx as nx
+import numpy as np
+import torch
+
+from app.config.config import Config
+from app.models import configure_torch_threads
+from app.models.gnn_utils import GNNModel
+
+
+def build_synthetic_graph(num_nodes, avg_degree=3, seed=42):
+    """生成带节点特征的随机交易图，节点规模与线上请求相当"""
+    rng = np.random.default_rng(seed)
+    num_edges = num_nodes * avg_degree // 2
+    src = rng.integers(0, num_nodes, num_edges)
+    dst = rng.integers(0, num_nodes, num_edges)
+    names = [f"M{i}" if i % 10 == 0 else f"C{i}" for i in range(num_nodes)]
+    G = nx.DiGraph()
+    for u, v in zip(src, dst):
+        if u != v:
+            G.add_edge(names[u], names[v], weight=float(rng.lognormal(10, 1.5)), risk_score=float(rng.random()))
+    for node in G.nodes():
+        G.nodes[node]['transaction_count'] = int(G.degree(node))
+        G.nodes[node]['total_amount'] = float(rng.lognormal(11, 1.5))
+        G.nodes[node]['risk_score'] = float(rng.beta(2, 5))
+    return G
+
+
+def load_models(model_path):
+    """加载fp32模型并基于同一份权重构造int8副本"""
+    fp32 = GNNModel(model_path=model_path, inference_mode='fp32')
+    if fp32.model_type == 'dummy':
+        # 模型文件不可用时，用随机初始化的Linear结构作为基准对象
+        torch.manual_seed(0)
+        fp32.model = fp32._create_gnn_model().eval()
+        fp32.model_type = 'gnn'
+    int8 = GNNModel(model_path=model_path, inference_mode='fp32')
+    int8.model = int8._quantize_model(fp32.model)
+    int8.model_type = fp32.model_type
+    return fp32, int8
+
+
+def time_predict(model, data, repeats):
+    latencies = []
+    scores = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        scores = model.predict_node_risks(data)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return scores, latencies
+
+
+def run(sizes, repeats, model_path, num_threads):
+    configure_torch_threads(num_threads)
+    fp32, int8 = load_models(model_path)
+
+    results = {
+        'torch_version': torch.__version__,
+        'num_threads': torch.get_num_threads(),
+        'model_path': model_path,
+        'int8_enabled': int8.inference_mode == 'int8',
+        'sizes': []
+    }
+    for num_nodes in sizes:
+        G = build_synthetic_graph(num_nodes)
+        data, G = fp32.prepare_graph_data(None, G)
+        int8.prepare_graph_data(None, G)
+
+        fp32_scores, fp32_latency = time_predict(fp32, data, repeats)
+        int8_scores, int8_latency = time_predict(int8, data, repeats)
+
+        delta = np.abs(fp32_scores - int8_scores)
+        fp32_flags = fp32_scores >= Config.HIGH_RISK_THRESHOLD
+        int8_flags = int8_scores >= Config.HIGH_RISK_THRESHOLD
+        entry = {
+            'num_nodes': G.number_of_nodes(),
+            'num_edges': G.number_of_edges(),
+            'fp32_p50_ms': float(np.percentile(fp32_latency, 50)),
+            'int8_p50_ms': float(np.percentile(int8_latency, 50)),
+            'speedup': float(np.percentile(fp32_latency, 50) / max(np.percentile(int8_latency, 50), 1e-9)),
+            'max_abs_delta': float(delta.max()) if len(delta) else 0.0,
+            'mean_abs_delta': float(delta.mean()) if len(delta) else 0.0,
+            'high_risk_agreement': float((fp32_flags == int8_flags).mean()) if len(delta) else 1.0
+        }
+        results['sizes'].append(entry)
+        print(f"{entry['num_nodes']:>8} nodes  fp32 {entry['fp32_p50_ms']:8.2f} ms  "
+              f"int8 {entry['int8_p50_ms']:8.2f} ms  max|Δ| {entry['max_abs_delta']:.5f}  "
+              f"agreement {entry['high_risk_agreement'] * 100:.2f}%")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare fp32 and int8 GNN inference on CPU')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=Config.TORCH_NUM_THREADS)
+    parser.add_argument('--model-path', default=Config.GNN_MODEL_PATH)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeats, args.model_path, args.threads)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
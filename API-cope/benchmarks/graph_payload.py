@@ -0,0 +1,101 @@
+"""
+路径分析响应体积基准：对比JSON与列式二进制格式（Arrow IPC / MessagePack）的大小和编码耗时
+
+用法（在API-cope目录下）:
+    python -m benchmarks.graph_payload --edges 3000 --repeats 20 --output graph_payload.json
+"""
+import argparse
+import gzip
+import json
+import time
+
+import numpy as np
+
+from app.utils import graph_codec
+from app.utils.compression import BROTLI_AVAILABLE, compress
+
+
+def build_synthetic_response(num_edges, seed=42):
+    """生成与 /api/graph/analysis/path 未优化响应结构相同的节点/边列表"""
+    rng = np.random.default_rng(seed)
+    num_nodes = max(2, num_edges // 2)
+    ids = [f"C{rng.integers(10 ** 8, 10 ** 10)}" if i % 10 else f"M{rng.integers(10 ** 8, 10 ** 10)}"
+           for i in range(num_nodes)]
+    nodes = []
+    for i, node_id in enumerate(ids):
+        tx_count = int(rng.integers(1, 20))
+        nodes.append({
+            'id': node_id,
+            'name': node_id,
+            'value': float(rng.lognormal(11, 1.5)),
+            'tx_count': tx_count,
+            'category': 0 if node_id.startswith('M') else 1,
+            'risk_score': float(rng.beta(2, 5)),
+            'gnn_cluster': int(rng.integers(0, 5)) if rng.random() < 0.2 else None,
+            'symbolSize': min(50, 20 + float(np.log(tx_count + 1)) * 5)
+        })
+    edges = []
+    for _ in range(num_edges):
+        is_potential = bool(rng.random() < 0.05)
+        edges.append({
+            'source': ids[rng.integers(num_nodes)],
+            'target': ids[rng.integers(num_nodes)],
+            'value': float(rng.lognormal(10, 1.5)),
+            'risk_score': float(rng.random()),
+            'is_potential': is_potential,
+            'similarity': float(rng.random()) if is_potential else 0
+        })
+    return {'paths': [], 'nodes': nodes, 'edges': edges, 'gnn_info': {}}
+
+
+def time_encode(encode, repeats):
+    latencies = []
+    body = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        body = encode()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return body, float(np.percentile(latencies, 50))
+
+
+def run(num_edges, repeats):
+    response_data = build_synthetic_response(num_edges)
+    encoders = {
+        'json': lambda: json.dumps({'result': response_data}, ensure_ascii=False).encode('utf-8')
+    }
+    if graph_codec.ARROW_AVAILABLE:
+        encoders['arrow'] = lambda: graph_codec.encode_graph(response_data, graph_codec.ARROW_MIMETYPE)
+    if graph_codec.MSGPACK_AVAILABLE:
+        encoders['msgpack'] = lambda: graph_codec.encode_graph(response_data, graph_codec.MSGPACK_MIMETYPE)
+
+    results = {'num_nodes': len(response_data['nodes']), 'num_edges': num_edges, 'formats': {}}
+    for name, encode in encoders.items():
+        body, encode_ms = time_encode(encode, repeats)
+        entry = {
+            'bytes': len(body),
+            'gzip_bytes': len(gzip.compress(body, compresslevel=6)),
+            'encode_p50_ms': encode_ms
+        }
+        if BROTLI_AVAILABLE:
+            entry['br_bytes'] = len(compress(body, 'br'))
+        results['formats'][name] = entry
+        print(f"{name:>8}  {entry['bytes']:>9} bytes  gzip {entry['gzip_bytes']:>9} bytes  "
+              f"encode {encode_ms:8.2f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON and columnar binary graph payloads')
+    parser.add_argument('--edges', type=int, default=3000)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.edges, args.repeats)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+"""
+接口负载与回放基准：用合成的PaySim数据启动 create_app()，对每个路由施加负载，
+统计每个接口的 p50/p95/p99 延迟、吞吐量、错误数和峰值RSS，结果写成JSON便于在不同提交之间diff
+
+两种驱动方式：
+  - client: Flask test client，单线程，只测应用本身的处理耗时
+  - http:   在本机临时端口上启动WSGI服务，多线程并发发送真实HTTP请求
+最后的回放阶段把合成交易按批POST到 /api/monitor/ingest，模拟实时写入
+
+用法（在API-cope目录下）:
+    python -m benchmarks.load_test --rows 100000 --requests 50 --concurrency 8 --output load_test.json
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.config.config import Config
+from benchmarks import synthetic_data
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# (方法, 路径, 请求体, 预期状态码)
+# 路径中的 {analysis_id} 在运行时替换为LOD分析的ID，请求体中的 '{alert_ids}' 替换为预警列表中真实的预警ID
+# （预警ID是交易内容的哈希）；#后缀只用于区分同一路径的不同请求体，不会发送
+ENDPOINTS = [
+    ('GET', '/api/health', None, 200),
+    ('GET', '/api/models/status', None, 200),
+    ('GET', '/metrics', None, 200),
+    # 使用不存在的模型名，只测路由与注册表查找的开销，不改变线上模型
+    ('POST', '/api/models/__benchmark__/reload', {}, 404),
+    ('GET', '/api/dashboard/stats', None, 200),
+    ('GET', '/api/dashboard/trends', None, 200),
+    ('GET', '/api/dashboard/risk-distribution', None, 200),
+    ('GET', '/api/analysis/trends?type=week', None, 200),
+    ('GET', '/api/analysis/trends?type=month', None, 200),
+    ('GET', '/api/alerts?page=1&pageSize=20', None, 200),
+    ('GET', '/api/alerts?page=2&pageSize=50&riskLevel=high', None, 200),
+    ('GET', '/api/alerts/facets?riskLevel=high', None, 200),
+    ('POST', '/api/alerts/batch-process', {'alertIds': '{alert_ids}', 'method': 'ignore', 'handler': 'benchmark'}, 200),
+    ('GET', '/api/group/heatmap', None, 200),
+    ('GET', '/api/group/behavior-radar', None, 200),
+    ('GET', '/api/group/random-accounts', None, 200),
+    ('GET', '/api/monitor/statistics?window=24h', None, 200),
+    ('GET', '/api/monitor/statistics?window=1m', None, 200),
+    ('GET', '/api/monitor/transactions', None, 200),
+    ('GET', '/api/monitor/alerts', None, 200),
+    ('GET', '/api/monitor/latest-alerts', None, 200),
+    ('GET', '/api/monitor/realtime-transactions', None, 200),
+    ('POST', '/api/graph/analysis/path', {'use_gnn': False}, 200),
+    ('POST', '/api/graph/analysis/path#gnn', {'use_gnn': True}, 200),
+    ('POST', '/api/graph/analysis/lod', {'use_gnn': False, 'chunk_size': 200}, 200),
+    ('GET', '/api/graph/analysis/lod/{analysis_id}/expand?community=0', None, 200),
+]
+
+# 每个接口的请求数系数：重量级接口少发一些，避免单次运行过长
+HEAVY_ENDPOINTS = {'/api/graph/analysis/path': 0.2, '/api/graph/analysis/lod': 0.2}
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB）；两种方式都不可用时返回None"""
+    if RESOURCE_AVAILABLE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux以KB为单位，macOS以字节为单位
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if PSUTIL_AVAILABLE:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024)
+    return None
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = np.asarray(latencies, dtype=np.float64)
+    if len(latencies) == 0:
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': int(len(latencies)),
+        'errors': errors,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'max_ms': float(latencies.max()),
+        'throughput_rps': float(len(latencies) / elapsed) if elapsed > 0 else None
+    }
+
+
+def endpoint_name(method, path):
+    return f"{method} {path}"
+
+
+class ClientDriver:
+    """通过Flask test client顺序发送请求"""
+
+    name = 'client'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        data = response.get_data()
+        return response.status_code, data
+
+    def run(self, method, path, body, count, concurrency):
+        latencies = []
+        statuses = []
+        start = time.perf_counter()
+        for _ in range(count):
+            begin = time.perf_counter()
+            status, _ = self.request(method, path, body)
+            latencies.append((time.perf_counter() - begin) * 1000)
+            statuses.append(status)
+        return latencies, statuses, time.perf_counter() - start
+
+    def close(self):
+        pass
+
+
+class HttpDriver:
+    """在临时端口启动多线程WSGI服务，用线程池并发发送HTTP请求"""
+
+    name = 'http'
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, body):
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+        try:
+            with urllib.request.urlopen(req, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def _timed(self, method, path, body):
+        begin = time.perf_counter()
+        try:
+            status, _ = self.request(method, path, body)
+        except Exception:
+            status = None
+        return (time.perf_counter() - begin) * 1000, status
+
+    def run(self, method, path, body, count, concurrency):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda _: self._timed(method, path, body), range(count)))
+        elapsed = time.perf_counter() - start
+        return [latency for latency, _ in results], [status for _, status in results], elapsed
+
+    def close(self):
+        self.server.shutdown()
+
+
+def response_json(data):
+    """解析响应体；http模式下较大的响应是gzip压缩的"""
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    return json.loads(data.decode('utf-8'))
+
+
+def resolve_body(driver, body):
+    """替换请求体中的 '{alert_ids}'：取预警列表第一页的前3个预警ID"""
+    if body is None or body.get('alertIds') != '{alert_ids}':
+        return body
+    status, data = driver.request('GET', '/api/alerts?page=1&pageSize=3', None)
+    if status != 200:
+        return None
+    alert_ids = [item['id'] for item in response_json(data)['items']]
+    return dict(body, alertIds=alert_ids) if alert_ids else None
+
+
+def resolve_path(driver, path):
+    """替换路径中的 {analysis_id}：先请求一次LOD分析，取其摘要中的ID"""
+    if '{analysis_id}' not in path:
+        return path
+    status, data = driver.request('POST', '/api/graph/analysis/lod', {'use_gnn': False, 'chunk_size': 200})
+    if status != 200:
+        return None
+    summary = json.loads(data.decode('utf-8').splitlines()[0])
+    return path.replace('{analysis_id}', summary['analysis_id'])
+
+
+def load_endpoints(driver, requests, concurrency):
+    results = {}
+    for method, path, body, expected in ENDPOINTS:
+        resolved = resolve_path(driver, path)
+        name = endpoint_name(method, path)
+        if resolved is None:
+            results[name] = {'requests': 0, 'errors': 1, 'skipped': 'analysis id unavailable'}
+            continue
+        resolved_body = resolve_body(driver, body)
+        if body is not None and resolved_body is None:
+            results[name] = {'requests': 0, 'errors': 1, 'skipped': 'alert ids unavailable'}
+            continue
+        count = max(1, int(requests * HEAVY_ENDPOINTS.get(path.split('#')[0], 1)))
+        latencies, statuses, elapsed = driver.run(method, resolved.split('#')[0], resolved_body, count, concurrency)
+        errors = sum(1 for status in statuses if status != expected)
+        results[name] = summarize(latencies, errors, elapsed)
+        results[name]['peak_rss_mb'] = peak_rss_mb()
+        entry = results[name]
+        print(f"  [{driver.name}] {name:<60} p50 {entry['p50_ms']:8.2f} ms  p99 {entry['p99_ms']:8.2f} ms  "
+              f"{entry['throughput_rps']:8.1f} req/s  errors {errors}")
+    return results
+
+
+def window_transaction_count(driver):
+    """/api/monitor/statistics 中24小时窗口的交易数"""
+    status, data = driver.request('GET', '/api/monitor/statistics?window=24h', None)
+    if status != 200:
+        raise RuntimeError(f'GET /api/monitor/statistics returned {status}')
+    return response_json(data)['transaction_count']
+
+
+def replay(driver, data_path, offset, batches, batch_size, concurrency):
+    """
+    回放：从合成CSV中跳过已加载的行，按批POST到 /api/monitor/ingest
+    统计每批写入的延迟和整体的交易吞吐量，并核对写入成功的交易都计入了24小时窗口的交易数
+    """
+    import pandas as pd
+    columns = ['type', 'amount', 'nameOrig', 'oldbalanceOrg', 'newbalanceOrig',
+               'nameDest', 'oldbalanceDest', 'newbalanceDest', 'isFraud', 'step']
+    rows = pd.read_csv(data_path, usecols=columns, skiprows=range(1, offset + 1), nrows=batches * batch_size)
+    payloads = [{'transactions': rows.iloc[i:i + batch_size].to_dict('records')}
+                for i in range(0, len(rows), batch_size)]
+    if not payloads:
+        return {'requests': 0, 'errors': 0}
+
+    def _post(payload):
+        begin = time.perf_counter()
+        try:
+            status, _ = driver.request('POST', '/api/monitor/ingest', payload)
+        except Exception:
+            status = None
+        return (time.perf_counter() - begin) * 1000, status
+
+    count_before = window_transaction_count(driver)
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_post, payloads))
+    else:
+        results = [_post(payload) for payload in payloads]
+    elapsed = time.perf_counter() - start
+    count_after = window_transaction_count(driver)
+
+    summary = summarize([latency for latency, _ in results],
+                        sum(1 for _, status in results if status != 200), elapsed)
+    summary['batch_size'] = batch_size
+    summary['transactions_per_second'] = float(len(rows) / elapsed) if elapsed > 0 else None
+    summary['peak_rss_mb'] = peak_rss_mb()
+    ingested = sum(len(payload['transactions']) for payload, (_, status) in zip(payloads, results) if status == 200)
+    summary['window_count_delta'] = count_after - count_before
+    summary['window_count_consistent'] = summary['window_count_delta'] == ingested
+    print(f"  [{driver.name}] replay {len(rows)} transactions in {len(payloads)} batches: "
+          f"p50 {summary['p50_ms']:.2f} ms/batch, {summary['transactions_per_second']:.0f} tx/s")
+    if not summary['window_count_consistent']:
+        print(f"  [{driver.name}] WARNING: 24h transaction_count grew by {summary['window_count_delta']}, "
+              f"expected {ingested}")
+    return summary
+
+
+def uncovered_routes(app):
+    """url_map中没有被ENDPOINTS覆盖的路由，新增路由时提醒补充负载配置"""
+    covered = {(method, path.split('?')[0].split('#')[0].replace('{analysis_id}', '<analysis_id>'))
+               for method, path, _, _ in ENDPOINTS}
+    covered.add(('POST', '/api/monitor/ingest'))  # 由回放阶段覆盖
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            concrete = rule.rule.replace('<name>', '__benchmark__')
+            if (method, concrete) not in covered:
+                missing.append(endpoint_name(method, rule.rule))
+    return missing
+
+
+def prepare_data(args):
+    if args.data:
+        return args.data, None
+    directory = tempfile.mkdtemp(prefix='api_cope_bench_')
+    path = os.path.join(directory, f'synthetic_{args.rows}.csv')
+    start = time.perf_counter()
+    # 多生成回放部分的行数，回放时从已加载的行之后开始读取
+    total = args.rows + args.replay_batches * args.replay_batch_size
+    rows, frauds = synthetic_data.write_csv(path, total, args.fraud_rate, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {rows} rows ({frauds} fraud) in {elapsed:.1f} s -> {path}")
+    return path, {'rows': rows, 'fraud_rows': frauds, 'generate_seconds': elapsed}
+
+
+def run(args):
+    data_path, generated = prepare_data(args)
+    Config.DATA_PATH = data_path
+    # load_data 读取 MAX_TRANSACTIONS * 2 行，这里让加载规模与 --rows 一致
+    Config.MAX_TRANSACTIONS = args.max_transactions or max(1, args.rows // 2)
+    Config.MODEL_WARMUP = False
+
+    from main import create_app
+    app, _ = create_app()
+
+    results = {
+        'rows': args.rows,
+        'fraud_rate': args.fraud_rate,
+        'max_transactions': Config.MAX_TRANSACTIONS,
+        'requests_per_endpoint': args.requests,
+        'concurrency': args.concurrency,
+        'generated': generated,
+        'uncovered_routes': uncovered_routes(app),
+        'modes': {}
+    }
+
+    # 首次请求触发数据加载与风险评分，单独计时
+    client = app.test_client()
+    start = time.perf_counter()
+    status = client.get('/api/dashboard/stats').status_code
+    results['cold_load'] = {'status': status, 'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+    print(f"Cold load: {results['cold_load']['seconds']:.2f} s (status {status})")
+
+    for mode in args.modes:
+        driver = ClientDriver(app) if mode == 'client' else HttpDriver(app)
+        concurrency = 1 if mode == 'client' else args.concurrency
+        try:
+            print(f"Mode {mode}:")
+            results['modes'][mode] = {'endpoints': load_endpoints(driver, args.requests, concurrency)}
+            if args.replay_batches:
+                results['modes'][mode]['replay'] = replay(
+                    driver, data_path, args.rows, args.replay_batches, args.replay_batch_size, concurrency)
+        finally:
+            driver.close()
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test and replay harness for the anti-fraud API')
+    parser.add_argument('--rows', type=int, default=10_000, help='synthetic rows loaded by the app (10k - 10M)')
+    parser.add_argument('--fraud-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data', help='use an existing CSV instead of generating one')
+    parser.add_argument('--max-transactions', type=int, help='override Config.MAX_TRANSACTIONS (default rows / 2)')
+    parser.add_argument('--modes', nargs='+', choices=['client', 'http'], default=['client', 'http'])
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='worker threads in http mode')
+    parser.add_argument('--replay-batches', type=int, default=20)
+    parser.add_argument('--replay-batch-size', type=int, default=100)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args)
+    if results['uncovered_routes']:
+        print(f"Routes without load configuration: {', '.join(results['uncovered_routes'])}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
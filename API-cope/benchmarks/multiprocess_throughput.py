@@ -0,0 +1,181 @@
+"""
+多进程吞吐与内存基准：比较两种部署方式在 1..N 个工作进程下的总吞吐量和内存占用
+  - local:  每个工作进程各自读取CSV、评分、建图（直接用多个gunicorn worker启动现有应用的情形）
+  - shared: 一个加载进程发布数据（DATA_PLANE=publish），工作进程只读挂载（DATA_PLANE=attach）
+每个工作进程用Flask test client循环请求一组只读接口；内存取 /proc/<pid>/smaps_rollup 中的RSS和PSS，
+PSS把共享页按共享的进程数均摊，所有进程PSS之和即实际占用的物理内存
+
+用法（在API-cope目录下）:
+    python -m benchmarks.multiprocess_throughput --rows 100000 --workers 1 2 4 --duration 10 --output mp.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from app.config.config import Config
+from benchmarks import synthetic_data
+from benchmarks.load_test import peak_rss_mb
+
+# 只读接口，轮流请求
+ENDPOINTS = [
+    '/api/dashboard/stats',
+    '/api/dashboard/risk-distribution',
+    '/api/analysis/trends?type=week',
+    '/api/alerts?page=1&pageSize=20',
+    '/api/alerts/facets?riskLevel=high',
+    '/api/group/heatmap',
+    '/api/group/behavior-radar',
+    '/api/monitor/statistics?window=24h',
+]
+
+
+def memory_mb(pid='self'):
+    """进程的RSS和PSS（MB）；不支持smaps_rollup的平台只返回峰值RSS"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', encoding='ascii') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return {name.lower(): int(fields[name].split()[0]) / 1024 for name in ('Rss', 'Pss')}
+    except (OSError, KeyError, ValueError):
+        return {'rss': peak_rss_mb(), 'pss': None}
+
+
+def configure(settings):
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def worker(settings, duration, barrier, results):
+    """工作进程：启动应用并加载/挂载数据，所有进程就绪后同时开始施压"""
+    configure(settings)
+    from main import create_app
+    app, _ = create_app()
+    logging.getLogger().setLevel(logging.WARNING)
+    client = app.test_client()
+
+    start = time.perf_counter()
+    status = client.get(ENDPOINTS[0]).status_code
+    load_seconds = time.perf_counter() - start
+    for path in ENDPOINTS:
+        client.get(path)
+
+    barrier.wait()
+    requests = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for path in ENDPOINTS:
+            errors += client.get(path).status_code != 200
+            requests += 1
+    results.put({'pid': os.getpid(), 'status': status, 'load_seconds': load_seconds,
+                 'requests': requests, 'errors': errors, 'memory_mb': memory_mb()})
+
+
+def publish(settings, directory):
+    """shared模式的加载进程：读取CSV并发布一代数据，返回后保持存活以计入其内存"""
+    configure(dict(settings, DATA_PLANE='local'))
+    from app.utils.data_cache import DataCache
+    from app.utils.data_plane import DataPlanePublisher
+    data_cache = DataCache()
+    start = time.perf_counter()
+    data_cache.load_data()
+    DataPlanePublisher(data_cache, directory).publish()
+    return data_cache, time.perf_counter() - start
+
+
+def run_mode(mode, num_workers, args, data_path, directory):
+    settings = {
+        'DATA_PATH': data_path,
+        'MAX_TRANSACTIONS': max(1, args.rows // 2),
+        'MODEL_WARMUP': False,
+        'DATA_PLANE': 'local',
+        'STORAGE_BACKEND': 'memory',
+        'SHARED_DATA_DIR': os.path.join(directory, 'shared'),
+        'TRANSACTION_DB_PATH': os.path.join(directory, 'transactions.db'),
+        'ALERT_DB_PATH': os.path.join(directory, 'alerts.db'),
+    }
+    report = {'mode': mode, 'workers': num_workers}
+    publisher_cache = None
+    if mode == 'shared':
+        settings['STORAGE_BACKEND'] = args.backend
+        publisher_cache, report['publish_seconds'] = publish(settings, settings['SHARED_DATA_DIR'])
+        report['publisher_memory_mb'] = memory_mb()
+        settings['DATA_PLANE'] = 'attach'
+
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(num_workers + 1)
+    results = context.Queue()
+    processes = []
+    for i in range(num_workers):
+        worker_settings = dict(settings)
+        if mode == 'local':
+            # 各进程独立加载时不能共用同一个预警数据库
+            worker_settings['ALERT_DB_PATH'] = os.path.join(directory, f'alerts_{num_workers}_{i}.db')
+        process = context.Process(target=worker, args=(worker_settings, args.duration, barrier, results))
+        process.start()
+        processes.append(process)
+
+    barrier.wait()
+    workers = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    report['throughput_rps'] = sum(item['requests'] for item in workers) / args.duration
+    report['errors'] = sum(item['errors'] for item in workers)
+    report['load_seconds_max'] = max(item['load_seconds'] for item in workers)
+    # 加载进程（部署时即负责写入和WebSocket推送的主进程）的内存单独报告，不计入工作进程合计
+    pss = [item['memory_mb']['pss'] for item in workers]
+    report['total_pss_mb'] = sum(pss) if None not in pss else None
+    report['worker_memory_mb'] = [item['memory_mb'] for item in workers]
+    del publisher_cache
+    return report
+
+
+def print_report(report):
+    total = f"{report['total_pss_mb']:8.1f} MB" if report['total_pss_mb'] is not None else '     n/a'
+    print(f"{report['mode']:<7} workers={report['workers']:<3} {report['throughput_rps']:9.1f} req/s  "
+          f"workers PSS {total}  load {report['load_seconds_max']:.2f} s  errors {report['errors']}")
+    if 'publisher_memory_mb' in report:
+        print(f"        publisher RSS {report['publisher_memory_mb']['rss']:.1f} MB, "
+              f"published in {report['publish_seconds']:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-process loading with the shared read-only data plane')
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--modes', nargs='+', choices=['local', 'shared'], default=['local', 'shared'])
+    parser.add_argument('--backend', default='sqlite', help='transaction storage backend in shared mode')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per run')
+    parser.add_argument('--fraud-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='api_cope_mp_')
+    try:
+        data_path = os.path.join(directory, f'synthetic_{args.rows}.csv')
+        synthetic_data.write_csv(data_path, args.rows, args.fraud_rate, args.seed)
+        reports = []
+        for mode in args.modes:
+            for num_workers in args.workers:
+                run_directory = os.path.join(directory, f'{mode}_{num_workers}')
+                os.makedirs(run_directory)
+                report = run_mode(mode, num_workers, args, data_path, run_directory)
+                reports.append(report)
+                print_report(report)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'duration': args.duration, 'cpu_count': os.cpu_count(),
+                       'runs': reports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+数据加载流水线的分阶段微基准：在多个数据规模下分别计时 load_data 的每个阶段
+  read_score（分块读取、时间戳、评分、风险类型，即 load_data 实际执行的 _scored_chunks）→ alerts → bitmap_index
+  → store → build_graph（建边和Louvain）
+每个阶段重复执行取中位数，另外单独运行一次并用 tracemalloc 记录峰值/净增内存
+（tracemalloc会显著拖慢执行，因此不与计时混在同一次运行中）；
+阶段内部的span（如 data_cache.risk_scores、data_cache.louvain）单独列出中位耗时，只用于查看构成，不计入总耗时
+
+与基线比较时，任一阶段的中位耗时或峰值内存超过基线的 (1 + 阈值) 倍即判定为回归，进程以状态码1退出
+
+用法（在API-cope目录下）:
+    python -m benchmarks.pipeline_stages --sizes 10000 50000 200000 --output stages.json
+    python -m benchmarks.pipeline_stages --sizes 10000 50000 200000 --baseline stages.json --threshold 0.25
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.config.config import Config
+from app.utils.data_cache import (ALERT_KEY_COLUMNS, DataCache, FrameTransactions, concat_chunks,
+                                  new_transaction_index, transaction_index_columns)
+from app.utils.tracing import span_listener
+from benchmarks import synthetic_data
+
+
+def _read_score(cache, path):
+    return concat_chunks(list(cache._scored_chunks(path)))
+
+
+def _set_frame(cache, df):
+    cache.df = df
+    cache.transactions = FrameTransactions(df)
+
+
+def _bitmap_index(cache, path):
+    index = new_transaction_index()
+    index.append(transaction_index_columns(cache.df))
+    return index
+
+
+def _set_transaction_index(cache, index):
+    cache.transaction_index = index
+
+
+# (阶段名, 执行函数(cache, path) -> 结果, 把结果写回cache供后续阶段使用, 单独列出的内部span)
+# 执行函数不修改cache（store阶段的全量写入是幂等的），可以重复计时；写回只在计时结束后做一次
+STAGES = [
+    ('read_score', _read_score, _set_frame, ('data_cache.read_csv', 'data_cache.risk_scores', 'data_cache.risk_type')),
+    ('alerts', lambda cache, path: cache.alert_store.replace_transactions(
+        cache.df.reset_index(), ALERT_KEY_COLUMNS, Config.HIGH_RISK_THRESHOLD), None, ()),
+    ('bitmap_index', _bitmap_index, _set_transaction_index, ()),
+    ('store', lambda cache, path: cache.transaction_store.replace(cache.df), None, ()),
+    ('build_graph', lambda cache, path: cache._build_graph(), None, ('data_cache.graph_edges', 'data_cache.louvain')),
+]
+
+
+def measure_stage(run, cache, path, repeats, span_names=()):
+    """返回 (结果, 每次耗时ms列表, {span: 每次耗时ms列表}, tracemalloc峰值MB, 净增MB)"""
+    latencies = []
+    span_latencies = {name: [] for name in span_names}
+    result = None
+    for _ in range(repeats):
+        totals = dict.fromkeys(span_names, 0.0)
+
+        def on_span(name, seconds):
+            if name in totals:
+                totals[name] += seconds * 1000
+
+        start = time.perf_counter()
+        with span_listener(on_span):
+            result = run(cache, path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        for name, milliseconds in totals.items():
+            span_latencies[name].append(milliseconds)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    traced = run(cache, path)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced
+    return result, latencies, span_latencies, (peak - before) / (1024 * 1024), (after - before) / (1024 * 1024)
+
+
+def run_size(num_rows, repeats, fraud_rate, seed, directory):
+    path = os.path.join(directory, f'synthetic_{num_rows}.csv')
+    synthetic_data.write_csv(path, num_rows, fraud_rate, seed)
+    cache = DataCache()
+    stages = {}
+    for name, run, apply, span_names in STAGES:
+        result, latencies, span_latencies, peak_mb, net_mb = measure_stage(run, cache, path, repeats, span_names)
+        if apply is not None:
+            apply(cache, result)
+        stages[name] = {
+            'median_ms': statistics.median(latencies),
+            'min_ms': min(latencies),
+            'max_ms': max(latencies),
+            'peak_alloc_mb': peak_mb,
+            'net_alloc_mb': net_mb,
+            'spans': {span_name: statistics.median(values) for span_name, values in span_latencies.items()}
+        }
+    total = sum(stage['median_ms'] for stage in stages.values())
+    for stage in stages.values():
+        stage['share'] = stage['median_ms'] / total if total else 0.0
+    os.remove(path)
+    return {'rows': num_rows, 'total_ms': total, 'stages': stages}
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """与基线逐阶段比较，返回回归列表"""
+    regressions = []
+    baseline_sizes = {entry['rows']: entry for entry in baseline.get('sizes', [])}
+    for entry in results['sizes']:
+        reference = baseline_sizes.get(entry['rows'])
+        if reference is None:
+            continue
+        for name, stage in entry['stages'].items():
+            base = reference['stages'].get(name)
+            if base is None:
+                continue
+            checks = [('median_ms', threshold), ('peak_alloc_mb', memory_threshold)]
+            for metric, limit in checks:
+                if limit is None or base[metric] <= 0:
+                    continue
+                ratio = stage[metric] / base[metric]
+                stage[f'{metric}_ratio'] = ratio
+                if ratio > 1 + limit:
+                    regressions.append({'rows': entry['rows'], 'stage': name, 'metric': metric,
+                                        'baseline': base[metric], 'current': stage[metric], 'ratio': ratio})
+    return regressions
+
+
+def print_report(entry):
+    print(f"{entry['rows']:>9} rows  total {entry['total_ms']:10.1f} ms")
+    for name, stage in entry['stages'].items():
+        print(f"    {name:<12} {stage['median_ms']:10.2f} ms  {stage['share'] * 100:5.1f}%  "
+              f"peak {stage['peak_alloc_mb']:8.2f} MB  net {stage['net_alloc_mb']:8.2f} MB")
+        for span_name, milliseconds in stage['spans'].items():
+            print(f"        {span_name:<24} {milliseconds:10.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time each load_data stage at several data sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000, 200_000])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--chunk-rows', type=int, default=Config.LOAD_CHUNK_ROWS,
+                        help='LOAD_CHUNK_ROWS used by the read_score stage')
+    parser.add_argument('--fraud-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', help='JSON report from a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative slowdown of a stage median before it counts as a regression')
+    parser.add_argument('--memory-threshold', type=float, default=0.5,
+                        help='allowed relative growth of a stage peak allocation')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    # 各阶段内部的INFO日志会干扰计时
+    logging.getLogger().setLevel(logging.WARNING)
+    Config.MODEL_WARMUP = False
+    Config.ALERT_DB_PATH = ':memory:'
+    Config.LOAD_CHUNK_ROWS = args.chunk_rows
+
+    results = {'repeats': args.repeats, 'fraud_rate': args.fraud_rate, 'chunk_rows': args.chunk_rows, 'sizes': []}
+    with tempfile.TemporaryDirectory(prefix='api_cope_stages_') as directory:
+        for num_rows in args.sizes:
+            entry = run_size(num_rows, args.repeats, args.fraud_rate, args.seed, directory)
+            results['sizes'].append(entry)
+            print_report(entry)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        results['baseline'] = args.baseline
+        results['regressions'] = regressions
+        for regression in regressions:
+            print(f"REGRESSION {regression['rows']} rows {regression['stage']} {regression['metric']}: "
+                  f"{regression['baseline']:.2f} -> {regression['current']:.2f} ({regression['ratio']:.2f}x)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
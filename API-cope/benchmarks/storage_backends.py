@@ -0,0 +1,185 @@
+"""
+交易存储后端基准：在同一份合成数据和同一组查询上比较 memory / sqlite / duckdb
+  replace（全量写入） → append（实时小批量写入） → 仪表盘/趋势/分布统计 → 按账户和深分页查询
+每个查询重复执行取中位数；未安装duckdb时跳过该后端
+
+风险分数用按isFraud和金额构造的近似分布代替完整的风险评分（后者与存储无关且耗时很长），
+风险类型按 DataCache.determine_risk_type 的阈值向量化计算
+
+用法（在API-cope目录下）:
+    python -m benchmarks.storage_backends --rows 200000 --output storage.json
+    python -m benchmarks.storage_backends --rows 1000000 --backends sqlite duckdb
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from app.utils.transaction_store import DUCKDB_AVAILABLE, create_transaction_store
+from benchmarks import synthetic_data
+
+DAY_US = 24 * 3600 * 1000000
+
+
+def build_frame(num_rows, fraud_rate, seed):
+    """生成带 timestamp / risk_score / risk_type 的交易DataFrame，与DataCache.df的字段一致"""
+    df = synthetic_data.generate_paysim(num_rows, fraud_rate, seed)
+    rng = np.random.default_rng(seed)
+    start_date = datetime.now() - timedelta(days=30)
+    df['timestamp'] = start_date + pd.to_timedelta(df['step'], unit='h')
+    amount = df['amount'].to_numpy()
+    base = np.maximum(df['isFraud'].to_numpy(float) * 0.9, np.minimum(amount / 2_000_000, 0.6))
+    df['risk_score'] = np.clip(base + rng.normal(0, 0.05, len(df)), 0, 1)
+    risk = df['risk_score'].to_numpy()
+    df['risk_type'] = np.select(
+        [(risk > 0.8) & (amount > 500000), risk > 0.8, risk > 0.7, risk > 0.5],
+        ['大额交易', '身份盗用', '洗钱行为', '可疑行为'], '正常交易')
+    return df
+
+
+def ingest_batches(df, batches, batch_size, seed):
+    """从已有交易中抽样构造实时写入批次，索引接在已有数据之后"""
+    rng = np.random.default_rng(seed + 1)
+    offset = len(df)
+    result = []
+    for _ in range(batches):
+        batch = df.iloc[rng.integers(0, len(df), batch_size)].copy()
+        batch['timestamp'] = pd.Timestamp(datetime.now())
+        batch.index = pd.RangeIndex(offset, offset + batch_size)
+        offset += batch_size
+        result.append(batch)
+    return result
+
+
+def workload(df):
+    """(名称, 查询函数(store))，参数与各服务实际使用的一致"""
+    timestamps = pd.to_datetime(df['timestamp'])
+    last = int(timestamps.max().value // 1000)
+    today_start = int(pd.Timestamp(datetime.now().date()).value // 1000)
+    yesterday_start = today_start - DAY_US
+    window_start = int(pd.Timestamp(timestamps.min() + pd.Timedelta(days=10)).value // 1000)
+    account = str(df['nameOrig'].value_counts().index[0])
+    return [
+        ('count_today_high_risk',
+         lambda store: store.count(start_us=today_start, end_us=today_start + DAY_US - 1, risk_above=0.7)),
+        ('fraud_agreement', lambda store: store.fraud_agreement(yesterday_start, threshold=0.7)),
+        ('clustered_high_risk', lambda store: store.clustered_high_risk(yesterday_start, risk_above=0.8, min_count=5)),
+        ('trend_last_week',
+         lambda store: store.risk_trend('day', high=0.7, low=0.5, start_us=last - 6 * DAY_US, end_us=last)),
+        ('trend_daily', lambda store: store.risk_trend('day', high=0.8, low=0.6)),
+        ('trend_monthly', lambda store: store.risk_trend('month', high=0.8, low=0.6)),
+        ('trend_window', lambda store: store.risk_trend(
+            'day', high=0.8, low=0.6, start_us=window_start, end_us=window_start + 10 * DAY_US)),
+        ('risk_type_counts', lambda store: store.risk_type_counts()),
+        ('account_page', lambda store: store.query(limit=20, account=account)),
+        ('high_risk_first_page', lambda store: store.query(limit=20, risk_above=0.7)),
+        ('high_risk_deep_page', lambda store: store.query(limit=20, offset=5000, risk_above=0.7)),
+    ]
+
+
+def timed(func, repeats):
+    latencies = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, latencies
+
+
+def summarize(latencies):
+    return {'median_ms': statistics.median(latencies), 'min_ms': min(latencies), 'max_ms': max(latencies)}
+
+
+def run_backend(backend, df, batches, repeats, directory):
+    path = os.path.join(directory, f'transactions_{backend}.db')
+    store = create_transaction_store(backend, path)
+    report = {'backend': store.name}
+
+    start = time.perf_counter()
+    store.replace(df)
+    report['replace_ms'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for batch in batches:
+        store.append(batch)
+    report['append_ms_per_batch'] = (time.perf_counter() - start) * 1000 / max(len(batches), 1)
+
+    queries = {}
+    results = {}
+    for name, query in workload(df):
+        # 第一次执行包含内存存储合并暂存批次等一次性开销，单独记录
+        first, first_latency = timed(lambda: query(store), 1)
+        _, latencies = timed(lambda: query(store), repeats)
+        queries[name] = dict(summarize(latencies), first_ms=first_latency[0])
+        results[name] = first
+    report['queries'] = queries
+    store.close()
+    return report, results
+
+
+def check_consistency(results):
+    """各后端的查询结果应一致（分页结果按记录比较，浮点统计按值比较）"""
+    mismatches = []
+    reference_backend, reference = next(iter(results.items()))
+    for backend, backend_results in results.items():
+        for name, value in backend_results.items():
+            if json.dumps(value, default=str, sort_keys=True) != json.dumps(reference[name], default=str, sort_keys=True):
+                mismatches.append({'query': name, 'backend': backend, 'reference': reference_backend})
+    return mismatches
+
+
+def print_report(report):
+    print(f"{report['backend']:<8} replace {report['replace_ms']:10.1f} ms  "
+          f"append {report['append_ms_per_batch']:8.2f} ms/batch")
+    for name, query in report['queries'].items():
+        print(f"    {name:<24} {query['median_ms']:10.2f} ms  (first {query['first_ms']:.2f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark transaction storage backends on the same workload')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--backends', nargs='+', default=['memory', 'sqlite', 'duckdb'])
+    parser.add_argument('--batches', type=int, default=20, help='number of ingest batches appended after the load')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--fraud-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    backends = [backend for backend in args.backends if backend != 'duckdb' or DUCKDB_AVAILABLE]
+    if len(backends) < len(args.backends):
+        print("duckdb is not installed, skipping the duckdb backend")
+
+    df = build_frame(args.rows, args.fraud_rate, args.seed)
+    batches = ingest_batches(df, args.batches, args.batch_size, args.seed)
+    reports = []
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='api_cope_storage_') as directory:
+        for backend in backends:
+            report, backend_results = run_backend(backend, df, batches, args.repeats, directory)
+            reports.append(report)
+            results[report['backend']] = backend_results
+            print_report(report)
+
+    mismatches = check_consistency(results)
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch['query']}: {mismatch['backend']} differs from {mismatch['reference']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'batches': args.batches, 'batch_size': args.batch_size,
+                       'repeats': args.repeats, 'backends': reports, 'mismatches': mismatches}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
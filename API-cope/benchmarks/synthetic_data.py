@@ -0,0 +1,202 @@
+"""
+PaySim风格的合成交易数据：列结构与 data/balanced_data.csv 一致，规模可从1万行到1000万行
+在正常交易中注入三类欺诈模式：
+  - 转账-提现链：受害账户的余额被全额TRANSFER到中间账户，中间账户随即CASH_OUT
+  - 资金环路：3~5个账户之间首尾相连的TRANSFER
+  - 突发转账：同一账户在同一个step内向多个账户连续小额TRANSFER
+
+用法（在API-cope目录下）:
+    python -m benchmarks.synthetic_data --rows 1000000 --fraud-rate 0.1 --output data/synthetic_1m.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['step', 'type', 'amount', 'nameOrig', 'oldbalanceOrg', 'newbalanceOrig',
+           'nameDest', 'oldbalanceDest', 'newbalanceDest', 'isFraud', 'isFlaggedFraud']
+
+TRANSACTION_TYPES = np.array(['CASH_OUT', 'PAYMENT', 'CASH_IN', 'TRANSFER', 'DEBIT'], dtype=object)
+TYPE_PROBABILITIES = [0.35, 0.34, 0.22, 0.08, 0.01]
+# 各交易类型金额的对数正态均值（与PaySim的金额分布量级相当）
+TYPE_AMOUNT_MEANS = np.array([11.5, 8.5, 11.5, 12.5, 8.0])
+
+MAX_STEP = 744  # 1 step = 1小时，共30天
+MAX_TRANSFER = 10_000_000  # PaySim中单笔转账上限
+FLAGGED_AMOUNT = 200_000  # isFlaggedFraud：单笔转账超过20万
+
+# 欺诈行数在三类模式之间的分配
+PATTERN_SHARES = {'chain': 0.6, 'cycle': 0.2, 'burst': 0.2}
+
+
+def _account_pool(rng, prefix, size):
+    ids = np.unique(rng.integers(10 ** 8, 10 ** 10, size))
+    return np.char.add(prefix, ids.astype(str)).astype(object)
+
+
+def _normal_transactions(rng, n, steps, customers, merchants):
+    """按PaySim的类型比例生成正常交易，余额字段与交易方向一致"""
+    types = rng.choice(len(TRANSACTION_TYPES), size=n, p=TYPE_PROBABILITIES)
+    amount = np.round(rng.lognormal(TYPE_AMOUNT_MEANS[types], 1.2), 2)
+    is_payment = TRANSACTION_TYPES[types] == 'PAYMENT'
+    is_cash_in = TRANSACTION_TYPES[types] == 'CASH_IN'
+    is_debit = TRANSACTION_TYPES[types] == 'DEBIT'
+
+    old_org = np.round(np.where(rng.random(n) < 0.3, 0, rng.lognormal(11, 2, n)), 2)
+    new_org = np.where(is_cash_in, old_org + amount, np.maximum(old_org - amount, 0))
+    # 商户账户（M开头）没有余额信息
+    old_dest = np.round(np.where(is_payment | is_debit, 0, rng.lognormal(12, 2, n)), 2)
+    new_dest = np.where(is_payment | is_debit, 0,
+                        np.where(is_cash_in, np.maximum(old_dest - amount, 0), old_dest + amount))
+
+    return pd.DataFrame({
+        'step': steps,
+        'type': TRANSACTION_TYPES[types],
+        'amount': amount,
+        'nameOrig': customers[rng.integers(0, len(customers), n)],
+        'oldbalanceOrg': old_org,
+        'newbalanceOrig': np.round(new_org, 2),
+        'nameDest': np.where(is_payment, merchants[rng.integers(0, len(merchants), n)],
+                             customers[rng.integers(0, len(customers), n)]),
+        'oldbalanceDest': old_dest,
+        'newbalanceDest': np.round(new_dest, 2),
+        'isFraud': np.zeros(n, dtype=np.int8)
+    })
+
+
+def _chain_transactions(rng, count, steps, customers):
+    """转账-提现链：每条链两笔交易，受害账户余额被清空"""
+    pairs = count // 2
+    if pairs == 0:
+        return []
+    victims = customers[rng.integers(0, len(customers), pairs)]
+    mules = customers[rng.integers(0, len(customers), pairs)]
+    cash_dest = customers[rng.integers(0, len(customers), pairs)]
+    balance = np.round(np.minimum(rng.lognormal(12, 1.5, pairs), MAX_TRANSFER), 2)
+    step = rng.choice(steps, pairs)
+    zeros = np.zeros(pairs)
+    transfer = pd.DataFrame({
+        'step': step, 'type': 'TRANSFER', 'amount': balance,
+        'nameOrig': victims, 'oldbalanceOrg': balance, 'newbalanceOrig': zeros,
+        'nameDest': mules, 'oldbalanceDest': zeros, 'newbalanceDest': zeros
+    })
+    cash_out = pd.DataFrame({
+        'step': step, 'type': 'CASH_OUT', 'amount': balance,
+        'nameOrig': mules, 'oldbalanceOrg': balance, 'newbalanceOrig': zeros,
+        'nameDest': cash_dest, 'oldbalanceDest': np.round(rng.lognormal(11, 2, pairs), 2), 'newbalanceDest': zeros
+    })
+    cash_out['newbalanceDest'] = cash_out['oldbalanceDest'] + balance
+    return [transfer, cash_out]
+
+
+def _cycle_transactions(rng, count, steps, customers):
+    """资金环路：A→B→…→A，每一跳扣除少量手续费"""
+    rows = []
+    remaining = count
+    while remaining >= 3:
+        length = int(min(rng.integers(3, 6), remaining))
+        members = customers[rng.integers(0, len(customers), length)]
+        amount = float(np.round(rng.lognormal(12, 1), 2))
+        step = int(rng.choice(steps))
+        for hop in range(length):
+            hop_amount = round(amount * (0.98 ** hop), 2)
+            old_org = round(hop_amount * (1 + rng.random()), 2)
+            old_dest = round(float(rng.lognormal(10, 2)), 2)
+            rows.append((step, 'TRANSFER', hop_amount, members[hop], old_org, round(old_org - hop_amount, 2),
+                         members[(hop + 1) % length], old_dest, round(old_dest + hop_amount, 2)))
+        remaining -= length
+    return [pd.DataFrame(rows, columns=COLUMNS[:9])] if rows else []
+
+
+def _burst_transactions(rng, count, steps, customers):
+    """突发转账：同一账户在同一step内向5~10个不同账户转出，合计清空余额"""
+    rows = []
+    remaining = count
+    while remaining >= 5:
+        length = int(min(rng.integers(5, 11), remaining))
+        source = customers[rng.integers(0, len(customers))]
+        targets = customers[rng.integers(0, len(customers), length)]
+        amounts = np.round(rng.lognormal(9, 0.5, length), 2)
+        balance = float(amounts.sum())
+        step = int(rng.choice(steps))
+        for amount, target in zip(amounts, targets):
+            old_dest = round(float(rng.lognormal(10, 2)), 2)
+            rows.append((step, 'TRANSFER', float(amount), source, round(balance, 2),
+                         round(max(balance - amount, 0), 2), target, old_dest, round(old_dest + amount, 2)))
+            balance -= amount
+        remaining -= length
+    return [pd.DataFrame(rows, columns=COLUMNS[:9])] if rows else []
+
+
+def _fraud_transactions(rng, n, steps, customers):
+    parts = []
+    parts += _chain_transactions(rng, int(n * PATTERN_SHARES['chain']), steps, customers)
+    parts += _cycle_transactions(rng, int(n * PATTERN_SHARES['cycle']), steps, customers)
+    parts += _burst_transactions(rng, int(n * PATTERN_SHARES['burst']), steps, customers)
+    if not parts:
+        return None
+    fraud = pd.concat(parts, ignore_index=True)
+    fraud['isFraud'] = np.int8(1)
+    return fraud
+
+
+def iter_chunks(num_rows, fraud_rate=0.1, seed=42, chunk_size=500_000):
+    """
+    按块生成数据，每块是按step排序的DataFrame，块之间的step递增
+    账户池在各块之间共享，保证同一账户会跨块出现，形成可分析的交易图
+    """
+    rng = np.random.default_rng(seed)
+    customers = _account_pool(rng, 'C', max(1000, num_rows // 4))
+    merchants = _account_pool(rng, 'M', max(100, num_rows // 20))
+    num_chunks = max(1, -(-num_rows // chunk_size))
+
+    produced = 0
+    for chunk in range(num_chunks):
+        n = min(chunk_size, num_rows - produced)
+        first_step = 1 + chunk * MAX_STEP // num_chunks
+        last_step = max(first_step, (chunk + 1) * MAX_STEP // num_chunks)
+        steps = np.arange(first_step, last_step + 1)
+
+        fraud = _fraud_transactions(rng, int(n * fraud_rate), steps, customers)
+        num_fraud = 0 if fraud is None else len(fraud)
+        normal = _normal_transactions(rng, n - num_fraud, rng.choice(steps, n - num_fraud), customers, merchants)
+        df = normal if fraud is None else pd.concat([normal, fraud], ignore_index=True)
+        df = df.sort_values('step', kind='stable').reset_index(drop=True)
+        df['isFlaggedFraud'] = ((df['isFraud'] == 1) & (df['type'] == 'TRANSFER')
+                                & (df['amount'] > FLAGGED_AMOUNT)).astype(np.int8)
+        produced += n
+        yield df[COLUMNS]
+
+
+def generate_paysim(num_rows, fraud_rate=0.1, seed=42, chunk_size=500_000):
+    """生成完整的DataFrame（适合百万行以内；更大规模请使用 write_csv 分块写盘）"""
+    return pd.concat(iter_chunks(num_rows, fraud_rate, seed, chunk_size), ignore_index=True)
+
+
+def write_csv(path, num_rows, fraud_rate=0.1, seed=42, chunk_size=500_000):
+    """分块写入CSV，内存占用只与chunk_size有关；返回 (行数, 欺诈行数)"""
+    rows = frauds = 0
+    for i, chunk in enumerate(iter_chunks(num_rows, fraud_rate, seed, chunk_size)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(chunk)
+        frauds += int(chunk['isFraud'].sum())
+    return rows, frauds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic PaySim-style transactions')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--fraud-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=500_000)
+    parser.add_argument('--output', required=True, help='CSV file to write')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows, frauds = write_csv(args.output, args.rows, args.fraud_rate, args.seed, args.chunk_size)
+    print(f"{rows} rows ({frauds} fraud) written to {args.output} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
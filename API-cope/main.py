@@ -1,27 +1,55 @@
+from app.config.config import Config
+from app.utils.import_profiler import ImportProfiler
+
+# 必须在导入Flask等依赖之前启动，才能统计到完整的启动导入耗时
+import_profiler = ImportProfiler().start() if Config.PROFILE_IMPORTS else None
+
 from flask import Flask
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from app.utils.logger import setup_logger
+from app.utils.logger import setup_logger, logger
+from app.models import configure_torch_threads
 from app.routes import register_routes
 from app.utils.data_cache import DataCache
+from app.utils.serialization import register_serialization
+from app.utils.tracing import register_tracing
 
 def create_app():
     app = Flask(__name__)
     CORS(app, resources={r"/api/*": {"origins": "*"}})
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=True, engineio_logger=True)
+    register_serialization(app)
+    register_tracing(app)
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading',
+                        logger=Config.SOCKETIO_LOGGING, engineio_logger=Config.SOCKETIO_LOGGING)
     
     # Initialize logger
     setup_logger()
+    configure_torch_threads()
     
     # Initialize data cache
     data_cache = DataCache()
     
     # Register routes
     register_routes(app, socketio, data_cache)
+
+    if import_profiler is not None:
+        import_profiler.stop()
+        logger.info(import_profiler.report())
     
     return app, socketio
 
+def create_wsgi_app():
+    """
+    多进程WSGI服务器的入口，只返回Flask应用，例如：
+        DATA_PLANE=attach gunicorn -w 4 --threads 8 "main:create_wsgi_app()"
+    工作进程只读挂载共享数据；WebSocket推送和交易写入由 DATA_PLANE=publish 的主进程（python main.py）负责
+    """
+    app, _ = create_app()
+    return app
+
 if __name__ == '__main__':
     print("Starting server with WebSocket support...")
     app, socketio = create_app()
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True) 
\ No newline at end of file
+    # 调试重载器会在子进程中再创建一次应用，publish模式下会出现两个发布者
+    socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True,
+                 use_reloader=Config.DATA_PLANE != 'publish') 